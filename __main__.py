@@ -2,15 +2,58 @@
 Entry point for running the Yandex Tracker Telegram Bot
 """
 
-from main_bot import bot
+from main_bot import bot, get_dispatcher, get_outbound, router
+from models.tracker_integration import YandexTrackerClient
+from models.registry import (
+    get_employee_index, get_local_mirror, get_reference_data, get_tracker_client, get_write_journal
+)
+from models.reference_data import REFERENCE_PRELOAD
+from models.issue_cache import get_shared_issue_cache
+import asyncio
 import logging
+import os
+import sys
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def prepare_tracker():
+    """Warm up Tracker connections and the employee index before serving users"""
+    # Open Tracker connections before the first users arrive
+    try:
+        warmed = YandexTrackerClient().warm_up()
+        logging.info(f"Warmed up {warmed} Yandex Tracker connections")
+    except Exception as e:
+        logging.warning(f"Could not warm up Yandex Tracker connections: {e}")
+    
+    # Build the Telegram ID index once, then keep it fresh in the background
+    employee_index = get_employee_index()
+    try:
+        employee_index.sync()
+    except Exception as e:
+        logging.warning(f"Could not bootstrap the employee index: {e}")
+    employee_index.start_background_sync()
+    
+    # Cities, warehouses and companies are served from memory; otherwise loaded on first lookup
+    reference_data = get_reference_data()
+    if REFERENCE_PRELOAD:
+        reference_data.load_all()
+    reference_data.start_background_refresh()
+    
+    # Opening the journal starts its flusher; writes left unsent by the previous run go out first
+    get_write_journal()
+    
+    # Employee search reads the local mirror once its first sync has finished
+    mirror = get_local_mirror()
+    if mirror is not None:
+        mirror.start_background_sync()
+
 def main():
     """Main entry point"""
     print("Starting the Yandex Tracker Telegram Bot...")
+    prepare_tracker()
+    get_dispatcher()
+    get_outbound()
     print("Bot is running. Press Ctrl+C to stop.")
     
     try:
@@ -20,5 +63,74 @@ def main():
     except Exception as e:
         logging.error(f"Error running bot: {e}")
 
+def main_webhook():
+    """Entry point for webhook mode: local HTTP server feeding the per-chat dispatcher"""
+    from utils.webhook_server import WebhookServer
+    from utils.dispatcher import chat_id_of
+    from utils.message_utils import rendered_messages
+    
+    webhook_url = os.getenv('WEBHOOK_URL')
+    if not webhook_url:
+        raise ValueError("WEBHOOK_URL must be set in environment variables for webhook mode")
+    path = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+    # Without a secret anyone reaching the port could post updates as any user, the admin included
+    secret_token = os.getenv('WEBHOOK_SECRET')
+    if not secret_token:
+        raise ValueError("WEBHOOK_SECRET must be set in environment variables for webhook mode")
+    
+    print("Starting the Yandex Tracker Telegram Bot in webhook mode...")
+    prepare_tracker()
+    dispatcher = get_dispatcher()
+    outbound = get_outbound()
+    journal = get_write_journal()
+    mirror = get_local_mirror()
+    
+    # The handlers' own dispatcher.submit() runs inline since the worker already owns the chat
+    server = WebhookServer(
+        submit_update=lambda update: dispatcher.submit(chat_id_of(update), bot.process_new_updates, [update]),
+        host=os.getenv('WEBHOOK_HOST', '0.0.0.0'),
+        port=int(os.getenv('WEBHOOK_PORT', '8443')),
+        path=path,
+        secret_token=secret_token,
+        stats_provider=lambda: {**dispatcher.stats(), **rendered_messages.stats(),
+                                'outbound': outbound.stats(), 'callbacks': router.stats(),
+                                'issue_cache': get_shared_issue_cache().stats(),
+                                'reference_data': get_reference_data().stats(),
+                                'write_journal': journal.stats() if journal else None,
+                                'mirror': mirror.stats() if mirror else None,
+                                'tracker_writes': get_tracker_client().write_stats()}
+    )
+    
+    bot.remove_webhook()
+    bot.set_webhook(url=webhook_url.rstrip('/') + path, secret_token=secret_token)
+    print("Bot is running. Press Ctrl+C to stop.")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping the bot...")
+    finally:
+        server.server_close()
+        dispatcher.shutdown(wait=False)
+
+def main_async():
+    """Entry point for the asyncio mode (AsyncTeleBot + async Tracker client)"""
+    from async_bot import run
+    
+    print("Starting the Yandex Tracker Telegram Bot in asyncio mode...")
+    print("Bot is running. Press Ctrl+C to stop.")
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nStopping the bot...")
+    except Exception as e:
+        logging.error(f"Error running bot: {e}")
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if '--async' in sys.argv or os.getenv('BOT_MODE') == 'async':
+        main_async()
+    elif '--webhook' in sys.argv or os.getenv('BOT_MODE') == 'webhook':
+        main_webhook()
+    else:
+        main()
\ No newline at end of file
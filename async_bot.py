@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Asyncio variant of the Telegram bot
+Runs on AsyncTeleBot: /start, role resolution and every menu screen are served on one event
+loop. Routes implemented by the handlers package are blocking (sync TeleBot and Tracker
+client) and run in the loop's default thread pool, which bounds how many of them overlap.
+The async Tracker client only keeps the employee index in sync; Tracker reads made by those
+routes still go through the blocking client, so this mode does not speed them up.
+"""
+
+import asyncio
+import logging
+
+from telebot.async_telebot import AsyncTeleBot
+
+from config.settings import TELEGRAM_BOT_TOKEN
+from models.async_tracker import AsyncYandexTrackerClient
+from models.employee_index import EMPLOYEE_INDEX_SYNC_INTERVAL
+from models.registry import get_employee_index
+from models.resilience import TrackerUnavailableError
+from models.slot_reservation import NoSlotsAvailableError
+from utils.callback_router import CallbackNotAllowed
+from utils.user_auth import get_user_role_from_tracker
+from utils.message_utils import update_user_state, rendered_messages
+from main_bot import get_welcome_text, get_main_menu_keyboard, handle_specific_callback, screens
+
+logger = logging.getLogger(__name__)
+
+async_bot = AsyncTeleBot(TELEGRAM_BOT_TOKEN)
+tracker = AsyncYandexTrackerClient()
+
+
+async def resolve_role(telegram_id: str) -> str:
+    """
+    Resolve a user's role without blocking the event loop
+    The employee index never loads on the caller's thread, so this is an in-memory lookup
+    """
+    return get_user_role_from_tracker(telegram_id)
+
+
+@async_bot.message_handler(commands=['start'])
+async def send_welcome(message):
+    """Handle /start command"""
+    try:
+        user_role = await resolve_role(str(message.from_user.id))
+        text, keyboard = get_welcome_text(user_role), get_main_menu_keyboard(user_role)
+        msg = await async_bot.send_message(message.chat.id, text, reply_markup=keyboard)
+        rendered_messages.remember(message.chat.id, msg.message_id, text, keyboard)
+
+        # Store message ID for editing later
+        update_user_state(message.chat.id, msg.message_id, {'role': user_role})
+    except Exception as e:
+        logger.error(f"Error in send_welcome: {e}")
+        await async_bot.reply_to(message, "Произошла ошибка при обработке команды")
+
+
+@async_bot.callback_query_handler(func=lambda call: True)
+async def handle_callback(call):
+    """Handle inline keyboard callbacks"""
+    try:
+        chat_id = call.message.chat.id
+        message_id = call.message.message_id
+
+        # Never trust the role kept in session state; it would outlive a demotion
+        user_role = await resolve_role(str(call.from_user.id))
+        update_user_state(chat_id, message_id, {'role': user_role})
+
+        matched = screens.match(call, chat_id, message_id, user_role)
+        if matched is not None:
+            builder, ctx, params = matched
+            text, keyboard = builder(ctx, **params)
+            await rendered_messages.edit_async(async_bot, chat_id, message_id, text, keyboard)
+        else:
+            # Routes of the handlers package are blocking; run them off the event loop
+            # (run_in_executor rather than asyncio.to_thread, which needs Python 3.9)
+            await asyncio.get_running_loop().run_in_executor(
+                None, handle_specific_callback, call, chat_id, message_id, user_role)
+
+        await async_bot.answer_callback_query(call.id)
+    except CallbackNotAllowed as e:
+        logger.warning(f"Rejected callback from {call.from_user.id}: {e}")
+        await notify_callback_error(call, "Недостаточно прав для этого действия")
+    except NoSlotsAvailableError as e:
+        # A request filled up between showing it and the press
+        logger.info(f"Callback from {call.from_user.id} refused: {e}")
+        await notify_callback_error(call, "В заявке не осталось свободных мест")
+    except TrackerUnavailableError as e:
+        logger.warning(f"Yandex Tracker unavailable in handle_callback: {e}")
+        await notify_callback_error(call, "Yandex Tracker временно недоступен. Попробуйте позже.")
+    except Exception as e:
+        logger.error(f"Error in handle_callback: {e}")
+        await notify_callback_error(call, "Произошла ошибка при обработке запроса")
+
+
+async def notify_callback_error(call, text):
+    """Tell the user that their button press failed instead of failing silently"""
+    try:
+        await async_bot.answer_callback_query(call.id, text=text, show_alert=True)
+    except Exception as e:
+        logger.error(f"Could not answer callback {call.id}: {e}")
+
+
+async def sync_employee_index_forever(interval: float = EMPLOYEE_INDEX_SYNC_INTERVAL):
+    """Keep the Telegram ID index fresh from the event loop instead of a thread"""
+    index = get_employee_index()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await index.sync_async(tracker)
+        except Exception as e:
+            logger.error(f"Employee index sync failed: {e}")
+
+
+async def run():
+    """Bootstrap shared state and poll Telegram until cancelled"""
+    try:
+        await get_employee_index().sync_async(tracker)
+    except Exception as e:
+        logger.warning(f"Could not bootstrap the employee index: {e}")
+
+    sync_task = asyncio.create_task(sync_employee_index_forever())
+    try:
+        await async_bot.infinity_polling()
+    finally:
+        sync_task.cancel()
+        await tracker.close()
+        await async_bot.close_session()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.info("Starting the Telegram bot in asyncio mode...")
+    asyncio.run(run())
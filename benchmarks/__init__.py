@@ -0,0 +1,11 @@
+"""
+Micro-benchmarks for the Telegram bot hot paths
+Run a benchmark from the project root, e.g. `python -m benchmarks.bench_callback_overhead`
+"""
+
+import os
+
+# The tracker client refuses to start without credentials; benchmarks never reach the network
+os.environ.setdefault('YT_ORG_ID', 'benchmark-org')
+os.environ.setdefault('YT_TOKEN', 'benchmark-token')
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:benchmark')
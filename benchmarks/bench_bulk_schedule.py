@@ -0,0 +1,49 @@
+"""
+Creating a 500-shift schedule: one blocking create_shift per shift vs create_shifts_bulk
+
+The tracker stand-in sleeps for a fixed round-trip time per request.
+"""
+
+import time
+
+from fakes import FakeResponse, FakeTrackerSession
+
+from models.resilience import TokenBucket
+from models.tracker_integration import ShiftManager, YandexTrackerClient
+
+SHIFTS = 500
+ROUND_TRIP = 0.02
+
+
+def tracker(method, path, kwargs):
+    return FakeResponse(payload={'key': 'SHIFT-1'})
+
+
+def schedule():
+    return [{'date': f'2024-06-{day % 7 + 1:02d}', 'employee': f'EMP-{n}', 'employee_name': f'Сотрудник {n}'}
+            for n, day in enumerate(range(SHIFTS))]
+
+
+def main():
+    # No client-side rate limit here: this measures request overlap, not quota
+    client = YandexTrackerClient(session=FakeTrackerSession(tracker, latency=ROUND_TRIP),
+                                 rate_limiter=TokenBucket(rate=0))
+    manager = ShiftManager(client)
+    shifts = schedule()
+
+    started = time.perf_counter()
+    for shift in shifts:
+        manager.create_shift(shift)
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = manager.create_shifts_bulk(shifts)
+    bulk = time.perf_counter() - started
+
+    print(f"{SHIFTS} shifts at {ROUND_TRIP * 1000:.0f} ms per request")
+    print(f"sequential create_shift: {sequential:.2f} s")
+    print(f"create_shifts_bulk:      {bulk:.2f} s ({sum(r['ok'] for r in results)} ok)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Per-callback overhead of resolving the user's role
+
+"before" rebuilds UserRoleManager -> EmployeeManager -> YandexTrackerClient on every
+callback, the way get_user_role_from_tracker used to, with no shared index, issue cache
+or role cache, so each callback pays for a Tracker search; "after" goes through the registry.
+The stand-in answers instantly and the baseline's limiter never throttles, so the
+speed-up counts only client work, not the network round trip.
+"""
+
+from benchmarks.common import measure, report
+from fakes import FakeResponse, FakeTrackerSession
+
+from models.employee_index import EmployeeIndex
+from models.http_pool import set_shared_session
+from models.issue_cache import IssueCache
+from models.registry import reset_registry
+from models.resilience import TokenBucket
+from models.tracker_integration import EmployeeManager, YandexTrackerClient
+from utils.role_cache import RoleCache
+from utils.user_auth import UserRoleManager, get_user_role_from_tracker
+
+TELEGRAM_ID = '100500'
+
+
+def per_call_construction():
+    tracker_client = YandexTrackerClient(rate_limiter=TokenBucket(rate=1e9, capacity=1e9),
+                                         issue_cache=IssueCache())
+    return UserRoleManager(EmployeeManager(tracker_client), RoleCache(),
+                           EmployeeIndex(tracker_client)).get_user_role(TELEGRAM_ID)
+
+
+def registry_lookup():
+    return get_user_role_from_tracker(TELEGRAM_ID)
+
+
+def tracker(method, path, kwargs):
+    # One page of the EMP queue containing the benchmark user
+    employee = {'key': 'EMP-1', 'updated': '2024-01-01T00:00:00.000+0000',
+                'customFields': {'telegram': TELEGRAM_ID, 'role': 'manager'}}
+    return FakeResponse(payload=[employee])
+
+
+def main():
+    set_shared_session(FakeTrackerSession(tracker))
+    reset_registry()
+    before = measure(per_call_construction, iterations=2000)
+    after = measure(registry_lookup)
+    report('before: construct per callback', before)
+    report('after: registry singletons', after)
+    print(f"speed-up: {before['mean_us'] / after['mean_us']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Callback routing cost across every route registered in main_bot
+
+"before" scans the routes in order with startswith, the way the old prefix/elif chains did;
+"after" resolves through the compiled CallbackRouter tables. The spread between the fastest
+and slowest route shows whether dispatch cost depends on where a route sits in the table.
+"""
+
+from benchmarks.common import measure, report
+
+from main_bot import router
+
+
+def sample_data(pattern: str) -> str:
+    # Fill the trailing parameter of a route with a representative value
+    head, brace, _ = pattern.partition('{')
+    return head + ('REQ-1' if brace else '')
+
+
+def linear_scan(patterns, data):
+    for pattern in patterns:
+        if data == pattern or (pattern.endswith('}') and data.startswith(pattern[:pattern.index('{')])):
+            return pattern
+    return None
+
+
+def summarize(name: str, per_route):
+    means = sorted(stats['mean_us'] for stats in per_route)
+    report(name, {
+        'routes': len(means),
+        'mean_us': sum(means) / len(means),
+        'fastest_us': means[0],
+        'slowest_us': means[-1]
+    })
+
+
+def main():
+    patterns = router.routes()
+    samples = [sample_data(pattern) for pattern in patterns]
+    assert all(router.resolve(data) is not None for data in samples)
+
+    before = [measure(lambda data=data: linear_scan(patterns, data), iterations=2000) for data in samples]
+    after = [measure(lambda data=data: router.resolve(data), iterations=2000) for data in samples]
+    summarize('before: ordered prefix scan', before)
+    summarize('after: compiled router', after)
+
+
+if __name__ == '__main__':
+    main()
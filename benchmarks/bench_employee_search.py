@@ -0,0 +1,94 @@
+"""
+Employee search over 50k employees: local SQLite mirror against a Tracker summary query
+
+The tracker stand-in serves synthetic EMP and COMP issues from memory, so the initial sync
+measures only the mirror's own writes. Tracker search is represented by its round trip alone.
+"""
+
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import measure, report
+
+from models.employee_index import tracker_timestamp
+from models.local_mirror import LocalMirror, MIRRORED_SCHEMAS
+
+EMPLOYEES = 50000
+COMPANIES = 200
+TRACKER_ROUND_TRIP = 0.25
+
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов',
+              'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов']
+FIRST_NAMES = ['Иван', 'Пётр', 'Алексей', 'Сергей', 'Андрей', 'Дмитрий', 'Никита', 'Олег', 'Артём']
+
+
+class SyntheticTracker:
+    """
+    Streams generated issues for the queried queue
+    """
+
+    def __init__(self, employees: int, companies: int):
+        rng = random.Random(7)
+        self.issues = {'COMP': [
+            {'key': f'COMP-{n}', 'updated': '2024-01-01T00:00:00.000+0000',
+             'customFields': {'fullName': f'ООО Компания {n}', 'shortName': f'Компания {n}'}}
+            for n in range(1, companies + 1)
+        ], 'EMP': []}
+        for n in range(1, employees + 1):
+            self.issues['EMP'].append({
+                'key': f'EMP-{n}',
+                'updated': f'2024-01-{1 + n % 28:02d}T00:00:00.000+0000',
+                'customFields': {
+                    'lastName': rng.choice(LAST_NAMES) + rng.choice(['', 'а']),
+                    'firstName': rng.choice(FIRST_NAMES),
+                    'phone': f'+7 9{rng.randrange(10 ** 9):09d}',
+                    'telegram': f'@user{n}',
+                    'company': f'COMP-{rng.randint(1, companies)}'
+                }
+            })
+        self.issues['EMP'].sort(key=lambda issue: issue['updated'])
+
+    def iter_issues(self, query, fields=None, per_page=None):
+        issues = self.issues.get(query.split()[1], [])
+        if 'Updated: >=' in query:
+            since = query.split('"')[1]
+            issues = [issue for issue in issues if tracker_timestamp(issue['updated']) >= since]
+        return iter(issues)
+
+
+def main():
+    tracker = SyntheticTracker(EMPLOYEES, COMPANIES)
+    with tempfile.TemporaryDirectory() as directory:
+        mirror = LocalMirror(tracker, os.path.join(directory, 'mirror.db'),
+                             schemas={queue: MIRRORED_SCHEMAS[queue] for queue in tracker.issues})
+        started = time.perf_counter()
+        mirror.sync()
+        print(f"initial sync of {EMPLOYEES} employees and {COMPANIES} companies: "
+              f"{time.perf_counter() - started:.2f} s, "
+              f"{os.path.getsize(os.path.join(directory, 'mirror.db')) / 2 ** 20:.1f} MiB")
+
+        started = time.perf_counter()
+        counts = mirror.sync()
+        print(f"incremental sync with no changes: {counts['EMP']} employees re-read (same-second), "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+        rng = random.Random(11)
+        queries = {
+            'partial last name': lambda: rng.choice(LAST_NAMES)[:5],
+            'last + first name': lambda: f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)[:3]}",
+            'phone fragment': lambda: f"{rng.randrange(1000, 10000)}",
+            'telegram handle': lambda: f"@user{rng.randint(1, EMPLOYEES)}",
+            'company name': lambda: f"компания {rng.randint(1, COMPANIES)}",
+            'two-letter word': lambda: rng.choice(FIRST_NAMES)[:2],
+        }
+        for name, make_query in queries.items():
+            stats = measure(lambda: mirror.search_employees(make_query()), iterations=500, warmup=20)
+            report(f"mirror search: {name}", stats)
+        print(f"tracker summary search: one round trip, ~{TRACKER_ROUND_TRIP * 1e6:.0f} us, names only")
+        mirror.close()
+
+
+if __name__ == '__main__':
+    main()
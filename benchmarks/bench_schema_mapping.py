@@ -0,0 +1,98 @@
+"""
+Converting 10k employee records: hand-written dict.get mapping vs the compiled schema
+
+Covers creating issues from data, patches from partial data, the full reverse mapping and the
+card-fields-only reader used by format_employee_info.
+"""
+
+import time
+
+from models.schemas import EMPLOYEE_SCHEMA
+from utils.message_utils import format_employee_info
+
+RECORDS = 10000
+
+
+def records():
+    return [{'last_name': f'Фамилия{n}', 'first_name': f'Имя{n}', 'middle_name': 'Отчество',
+             'birth_date': '1990-01-01', 'phone': f'+7900{n:07d}', 'telegram': str(100000 + n),
+             'company': 'COMP-1', 'objects': ['WH-1'], 'passport_number': '123456', 'role': 'employee'}
+            for n in range(RECORDS)]
+
+
+def hand_written_issue(employee_data):
+    # The mapping EmployeeManager used to spell out for every create and update
+    return {
+        "queue": "EMP",
+        "summary": f"Сотрудник: {employee_data.get('first_name', '')} {employee_data.get('last_name', '')}",
+        "description": "Карточка сотрудника",
+        "type": "task",
+        "customFields": {
+            "lastName": employee_data.get('last_name', ''),
+            "firstName": employee_data.get('first_name', ''),
+            "middleName": employee_data.get('middle_name', ''),
+            "birthDate": employee_data.get('birth_date', ''),
+            "phone": employee_data.get('phone', ''),
+            "telegram": employee_data.get('telegram', ''),
+            "company": employee_data.get('company', ''),
+            "objects": employee_data.get('objects', []),
+            "workEmail": employee_data.get('work_email', ''),
+            "passportSeries": employee_data.get('passport_series', ''),
+            "passportNumber": employee_data.get('passport_number', ''),
+            "passportDivision": employee_data.get('passport_division', ''),
+            "passportIssueDate": employee_data.get('passport_issue_date', ''),
+            "passportIssuedBy": employee_data.get('passport_issued_by', ''),
+            "birthCity": employee_data.get('birth_city', ''),
+            "registrationAddress": employee_data.get('registration_address', ''),
+            "registrationDate": employee_data.get('registration_date', ''),
+            "education": employee_data.get('education', ''),
+            "bank": employee_data.get('bank', ''),
+            "accountNumber": employee_data.get('account_number', ''),
+            "bic": employee_data.get('bic', ''),
+            "corrAccount": employee_data.get('corr_account', ''),
+            "bankInn": employee_data.get('bank_inn', ''),
+            "role": employee_data.get('role', 'employee'),
+            "status": employee_data.get('status', 'active')
+        }
+    }
+
+
+# Table-driven alternative: the same schema interpreted per record instead of compiled
+FIELD_TABLE = [(field.name, field.tracker_name) for field in EMPLOYEE_SCHEMA.fields]
+
+
+def interpreted_patch(employee_data):
+    return {tracker_name: employee_data[name] for name, tracker_name in FIELD_TABLE if name in employee_data}
+
+
+def interpreted_reverse(custom_fields):
+    return {field.name: custom_fields.get(field.tracker_name, field.empty) for field in EMPLOYEE_SCHEMA.fields}
+
+
+def timed(convert, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        convert(item)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    data = records()
+    issues = [EMPLOYEE_SCHEMA.build_issue(item)['customFields'] for item in data]
+    assert [hand_written_issue(item) for item in data[:100]] == [EMPLOYEE_SCHEMA.build_issue(item) for item in data[:100]]
+
+    print(f"{RECORDS} employee records, ms per batch")
+    print(f"create issue, hand-written:    {timed(hand_written_issue, data):7.1f}")
+    print(f"create issue, compiled schema: {timed(EMPLOYEE_SCHEMA.build_issue, data):7.1f}")
+    print(f"patch, interpreted table:      {timed(interpreted_patch, data):7.1f}")
+    print(f"patch, compiled schema:        {timed(EMPLOYEE_SCHEMA.to_fields, data):7.1f}")
+    print(f"reverse, interpreted table:    {timed(interpreted_reverse, issues):7.1f}")
+    print(f"reverse, compiled schema:      {timed(EMPLOYEE_SCHEMA.from_fields, issues):7.1f}")
+    card_reader = EMPLOYEE_SCHEMA.reader(['last_name', 'first_name', 'middle_name', 'birth_date', 'phone',
+                                          'telegram', 'company', 'role', 'status'])
+    print(f"reverse, card fields only:     {timed(card_reader, issues):7.1f}")
+    print(f"format_employee_info:          {timed(format_employee_info, issues):7.1f}")
+
+
+if __name__ == '__main__':
+    main()
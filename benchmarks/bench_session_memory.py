@@ -0,0 +1,47 @@
+"""
+Memory per chat: state dicts vs ChatSession records
+
+Roles are decoded from JSON per chat, as they arrive from Tracker, so the dict layout holds
+one role string per chat while ChatSession keeps only the small-int level.
+"""
+
+import json
+import tracemalloc
+
+from utils.session import ChatSession
+
+CHATS = 50000
+ROLES = ['employee', 'manager', 'brigadier', 'outs_employee', 'shift_supervisor']
+
+
+def tracker_role(n: int) -> str:
+    return json.loads(json.dumps({'role': ROLES[n % len(ROLES)]}))['role']
+
+
+def dict_layout():
+    return {n: {'last_message_id': 1000 + n, 'role': tracker_role(n)} for n in range(CHATS)}
+
+
+def session_layout():
+    return {n: ChatSession(1000 + n, tracker_role(n)) for n in range(CHATS)}
+
+
+def footprint(build) -> int:
+    tracemalloc.start()
+    states = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del states
+    return size
+
+
+def main():
+    before = footprint(dict_layout)
+    after = footprint(session_layout)
+    print(f"before: dict per chat     {before / CHATS:.0f} B/chat, {before / 2 ** 20:.1f} MiB for {CHATS} chats")
+    print(f"after: ChatSession        {after / CHATS:.0f} B/chat, {after / 2 ** 20:.1f} MiB for {CHATS} chats")
+    print(f"saved: {100 * (1 - after / before):.0f}%")
+
+
+if __name__ == '__main__':
+    main()
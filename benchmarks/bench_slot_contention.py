@@ -0,0 +1,105 @@
+"""
+100 brigadiers submitting employees to one hot request at the same time
+
+The tracker stand-in keeps one REQ issue, honours ?version= on PATCH with a 409 like Tracker,
+and sleeps for a fixed round-trip time per request. Submitters are split across two
+RequestManagers with separate locks, as two bot processes would be. The old read-modify-write
+is run against the same stand-in for comparison.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import FakeResponse, FakeTrackerSession
+
+from models.issue_cache import IssueCache
+from models.resilience import TokenBucket
+from models.slot_reservation import NoSlotsAvailableError
+from models.tracker_integration import RequestManager, YandexTrackerClient
+
+SUBMITTERS = 100
+SLOTS = 30
+ROUND_TRIP = 0.005
+
+
+class VersionedRequest:
+    """
+    One request issue with Tracker's optimistic version check
+    """
+
+    def __init__(self, slots: int):
+        self.lock = threading.Lock()
+        self.issue = {'key': 'REQ-1', 'version': 1,
+                      'customFields': {'availableSlots': slots, 'appliedEmployees': []}}
+
+    def __call__(self, method, path, kwargs):
+        with self.lock:
+            if method == 'PATCH':
+                version = (kwargs.get('params') or {}).get('version')
+                if version is not None and version != self.issue['version']:
+                    return FakeResponse(status_code=409, payload={'errors': {}})
+                self.issue['customFields'].update(kwargs['json']['customFields'])
+                self.issue['version'] += 1
+            return FakeResponse(payload=json.loads(json.dumps(self.issue)))
+
+
+def make_manager(tracker: VersionedRequest) -> RequestManager:
+    client = YandexTrackerClient(session=FakeTrackerSession(tracker, latency=ROUND_TRIP),
+                                 rate_limiter=TokenBucket(rate=0), issue_cache=IssueCache())
+    return RequestManager(client)
+
+
+def naive_add(manager: RequestManager, request_id: str, employee_id: str):
+    """
+    The previous add_employee_to_request: unversioned read-modify-write
+    """
+    request = manager.tracker.get_issue(request_id, cached=False)
+    custom_fields = request['customFields']
+    applied = custom_fields['appliedEmployees']
+    if employee_id not in applied:
+        manager.tracker.update_issue(request_id, {"customFields": {
+            "appliedEmployees": applied + [employee_id],
+            "availableSlots": max(0, custom_fields['availableSlots'] - 1)
+        }})
+
+
+def run(submit) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=SUBMITTERS) as executor:
+        list(executor.map(submit, range(SUBMITTERS)))
+    return time.perf_counter() - started
+
+
+def main():
+    tracker = VersionedRequest(SLOTS)
+    managers = [make_manager(tracker), make_manager(tracker)]
+    refused = []
+
+    def submit(n):
+        try:
+            managers[n % 2].add_employee_to_request('REQ-1', f'EMP-{n}')
+        except NoSlotsAvailableError:
+            refused.append(n)
+
+    elapsed = run(submit)
+    applied = tracker.issue['customFields']['appliedEmployees']
+    conflicts = sum(manager.reservations.stats()['conflicts'] for manager in managers)
+    print(f"{SUBMITTERS} submitters, {SLOTS} slots, {ROUND_TRIP * 1000:.0f} ms per request")
+    print(f"slot reservation: {len(applied)} applied, {len(refused)} refused, "
+          f"{tracker.issue['customFields']['availableSlots']} slots left, {conflicts} conflicts retried, "
+          f"{elapsed:.2f} s")
+    assert len(applied) == len(set(applied)) == SLOTS, "overbooked or lost an update"
+    assert len(refused) == SUBMITTERS - SLOTS
+
+    tracker = VersionedRequest(SLOTS)
+    naive = make_manager(tracker)
+    elapsed = run(lambda n: naive_add(naive, 'REQ-1', f'EMP-{n}'))
+    print(f"read-modify-write: {len(tracker.issue['customFields']['appliedEmployees'])} applied, "
+          f"{tracker.issue['version'] - 1} writes, "
+          f"{tracker.issue['customFields']['availableSlots']} slots left, {elapsed:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
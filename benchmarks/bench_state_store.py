@@ -0,0 +1,70 @@
+"""
+User state stores with 100k chats: memory footprint and get/update latency
+
+"before" is the old unbounded module-level dict; the memory store's footprint is measured
+with tracemalloc, the SQLite store's as the size of its database file.
+"""
+
+import os
+import random
+import tempfile
+import tracemalloc
+
+from benchmarks.common import measure, report
+
+from utils.state_store import MemoryStateStore, SQLiteStateStore
+
+CHATS = 100000
+
+
+def state(chat_id: int):
+    return {'last_message_id': chat_id * 7, 'role': 'employee'}
+
+
+def fill_dict():
+    states = {}
+    for chat_id in range(CHATS):
+        states.setdefault(chat_id, {}).update(state(chat_id))
+    return states
+
+
+def fill(store):
+    for chat_id in range(CHATS):
+        store.update(chat_id, state(chat_id))
+    return store
+
+
+def traced(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def latency(name, get, update):
+    chats = [random.randrange(CHATS) for _ in range(5000)]
+    reads, writes = iter(chats * 2), iter(chats * 2)
+    report(f"{name}: get", measure(lambda: get(next(reads)), iterations=5000, warmup=100))
+    report(f"{name}: update", measure(lambda: update(next(writes), {'role': 'manager'}), iterations=5000, warmup=100))
+
+
+def main():
+    states, size = traced(fill_dict)
+    print(f"before: dict            {size / 2 ** 20:.1f} MiB for {len(states)} chats")
+    latency('before: dict', lambda chat_id: states.get(chat_id, {}), lambda chat_id, data: states[chat_id].update(data))
+
+    memory, size = traced(lambda: fill(MemoryStateStore(max_size=CHATS)))
+    print(f"after: memory LRU+TTL   {size / 2 ** 20:.1f} MiB for {len(memory)} chats")
+    latency('after: memory', memory.get, memory.update)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'state.db')
+        sqlite = fill(SQLiteStateStore(path))
+        print(f"after: sqlite WAL       {os.path.getsize(path) / 2 ** 20:.1f} MiB on disk for {len(sqlite)} chats")
+        latency('after: sqlite', sqlite.get, sqlite.update)
+        sqlite.close()
+
+
+if __name__ == '__main__':
+    main()
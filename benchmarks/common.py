@@ -0,0 +1,50 @@
+"""
+Shared helpers for the benchmarks: timing and reporting; the tracker stand-in lives in fakes
+"""
+
+import time
+from typing import Callable, Dict
+
+
+def percentile(samples: list, pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def measure(fn: Callable[[], object], iterations: int = 10000, warmup: int = 100) -> Dict[str, float]:
+    """
+    Time fn per call and return mean/p50/p99 in microseconds
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    clock = time.perf_counter
+    for _ in range(iterations):
+        started = clock()
+        fn()
+        samples.append((clock() - started) * 1e6)
+
+    return {
+        'iterations': iterations,
+        'mean_us': sum(samples) / len(samples),
+        'p50_us': percentile(samples, 50),
+        'p99_us': percentile(samples, 99)
+    }
+
+
+def report(name: str, stats: Dict[str, float]):
+    """
+    Print one benchmark result line
+    """
+    details = ', '.join(
+        f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+        for key, value in stats.items()
+    )
+    print(f"{name:<40} {details}")
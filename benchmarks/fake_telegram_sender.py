@@ -0,0 +1,45 @@
+"""
+Fake Telegram sender for the webhook endpoint
+
+Posts synthetic callback-query updates the way Telegram delivers them and reports how many
+were accepted or shed. Usage:
+    python -m benchmarks.fake_telegram_sender http://127.0.0.1:8443/telegram/webhook 1000 --secret change_me
+"""
+
+import argparse
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentile
+from fakes import callback_update, send_update
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('url')
+    parser.add_argument('count', type=int)
+    parser.add_argument('--chats', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--secret')
+    args = parser.parse_args()
+
+    def one(n):
+        started = time.perf_counter()
+        status = send_update(args.url, callback_update(1000 + n % args.chats), args.secret)
+        return status, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(one, range(args.count)))
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for status, _ in results)
+    latencies = [latency for _, latency in results]
+    print(f"sent {args.count} updates in {elapsed:.2f} s ({args.count / elapsed:.0f}/s)")
+    print(f"statuses: {dict(statuses)}")
+    print(f"latency ms: p50={percentile(latencies, 50):.1f} p99={percentile(latencies, 99):.1f}")
+
+
+if __name__ == '__main__':
+    main()
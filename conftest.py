@@ -0,0 +1,9 @@
+"""
+Test defaults: placeholder credentials so the clients can be built; tests never reach the network
+"""
+
+import os
+
+os.environ.setdefault('YT_ORG_ID', 'test-org')
+os.environ.setdefault('YT_TOKEN', 'test-token')
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', '0:test')
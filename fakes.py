@@ -0,0 +1,97 @@
+"""
+In-process stand-ins shared by the tests and the benchmarks: a Yandex Tracker session
+and a Telegram update sender
+"""
+
+import itertools
+import json
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class FakeResponse:
+    """
+    Just enough of requests.Response for YandexTrackerClient
+    """
+
+    def __init__(self, status_code: int = 200, payload=None, headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self._payload = payload if payload is not None else {}
+        self.content = json.dumps(self._payload).encode()
+        self.headers = CaseInsensitiveDict(headers or {})
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+
+class FakeTrackerSession:
+    """
+    Stand-in for requests.Session that answers tracker calls from a handler function
+    handler(method, path, kwargs) -> FakeResponse
+    """
+
+    def __init__(self, handler: Callable[[str, str, dict], FakeResponse], latency: float = 0.0):
+        self.handler = handler
+        self.latency = latency
+        self.calls = 0
+
+    def request(self, method: str, url: str, **kwargs) -> FakeResponse:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        path = url.split('/v2', 1)[-1]
+        return self.handler(method, path, kwargs)
+
+    def close(self):
+        pass
+
+
+_update_ids = itertools.count(1)
+
+
+def callback_update(chat_id: int, data: str = 'back_to_main', message_id: int = 1) -> Dict:
+    """
+    Build a callback_query update as Telegram would send it
+    """
+    update_id = next(_update_ids)
+    user = {'id': chat_id, 'is_bot': False, 'first_name': 'Load'}
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': user,
+            'chat_instance': str(chat_id),
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': 1, 'is_bot': True, 'first_name': 'Bot'},
+                'text': 'menu'
+            }
+        }
+    }
+
+
+def send_update(url: str, update: Dict, secret: Optional[str] = None, timeout: float = 5) -> int:
+    """
+    POST one update and return the HTTP status code
+    """
+    request = urllib.request.Request(url, data=json.dumps(update).encode(), method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    if secret:
+        request.add_header('X-Telegram-Bot-Api-Secret-Token', secret)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
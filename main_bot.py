@@ -7,11 +7,16 @@ This bot manages employees, shifts, requests and other tasks using Yandex Tracke
 """
 
 import telebot
-from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config.settings import TELEGRAM_BOT_TOKEN
 from utils.user_auth import get_user_role_from_tracker
-from utils.message_utils import update_user_state, get_user_state, create_back_button_keyboard
-from models import tracker_integration
+from utils.message_utils import update_user_state, edit_message, rendered_messages
+from utils.keyboards import navigation_keyboard
+from models.registry import get_or_create
+from models.resilience import TrackerUnavailableError
+from models.slot_reservation import NoSlotsAvailableError
+from utils.dispatcher import ChatDispatcher
+from utils.callback_router import CallbackRouter, CallbackNotAllowed
+from utils.outbound_queue import OutboundQueue
 from handlers.employee_handlers import handle_employee_creation, handle_employee_list, handle_employee_search, handle_employee_details
 from handlers.shift_handlers import handle_start_shift, handle_end_shift, handle_submit_to_request, handle_view_requests, handle_create_request
 import logging
@@ -24,74 +29,101 @@ logger = logging.getLogger(__name__)
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN is not set in environment variables")
 
-bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN)
+# Handlers run on the dispatcher's workers, not on telebot's own thread pool
+bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN, threaded=False)
 
-# Store user states
-user_states = {}
+# Both start worker threads, so they are created on first use rather than at import
+
+def get_dispatcher() -> ChatDispatcher:
+    """Dispatcher that keeps updates of one chat in order while different chats run in parallel"""
+    return get_or_create('chat_dispatcher', ChatDispatcher)
+
+def get_outbound() -> OutboundQueue:
+    """Queue keeping outgoing messages and edits within Telegram's global and per-chat limits"""
+    return get_or_create('outbound_queue', lambda: OutboundQueue(bot))
+
+def get_welcome_text(user_role):
+    """Main menu greeting for the given role"""
+    return f"Добро пожаловать в систему управления персоналом!\nВаша роль: {user_role}\n\nВыберите действие из меню ниже:"
+
+# Main menu rows per role; every menu gets the common back button
+MAIN_MENU_ROWS = {
+    'admin': [
+        ("Управление сотрудниками", "admin_employees"),
+        ("Управление городами", "admin_cities"),
+        ("Управление складами", "admin_warehouses"),
+        ("Управление компаниями", "admin_companies"),
+        ("Тарифы", "admin_rates"),
+        ("Уведомления", "admin_notifications"),
+        ("Графики", "admin_schedules"),
+        ("Согласование", "admin_approval")
+    ],
+    'manager': [
+        ("Смена", "manager_shift"),
+        ("Согласование", "manager_approval"),
+        ("Заявки", "manager_requests"),
+        ("Сотрудники", "manager_employees"),
+        ("Графики", "manager_schedules"),
+        ("Отсутствие", "manager_absence")
+    ],
+    'shift_supervisor': [
+        ("Смена", "supervisor_shift"),
+        ("Согласование", "supervisor_approval"),
+        ("Заявки", "supervisor_requests"),
+        ("Графики", "supervisor_schedules"),
+        ("Отсутствие", "supervisor_absence")
+    ],
+    'employee': [
+        ("Смена", "employee_shift"),
+        ("Отсутствие", "employee_absence")
+    ],
+    'outs_staff_manager': [
+        ("Смена", "outs_manager_shift"),
+        ("Заявки", "outs_manager_requests"),
+        ("Тарифы", "outs_manager_rates"),
+        ("Сотрудники", "outs_manager_employees")
+    ],
+    'brigadier': [
+        ("Смена", "brigadier_shift"),
+        ("Заявки", "brigadier_requests")
+    ],
+    'outs_employee': [
+        ("Смена", "outs_employee_shift")
+    ]
+}
+
+# Built and serialised once; main menus are identical for everyone with the same role
+MAIN_MENUS = {role: navigation_keyboard(rows) for role, rows in MAIN_MENU_ROWS.items()}
+UNKNOWN_ROLE_MENU = navigation_keyboard([])
 
 def get_main_menu_keyboard(user_role):
-    """Create main menu keyboard based on user role"""
-    keyboard = InlineKeyboardMarkup()
-    
-    if user_role == 'admin':
-        # Admin menu
-        keyboard.row(InlineKeyboardButton("Управление сотрудниками", callback_data="admin_employees"))
-        keyboard.row(InlineKeyboardButton("Управление городами", callback_data="admin_cities"))
-        keyboard.row(InlineKeyboardButton("Управление складами", callback_data="admin_warehouses"))
-        keyboard.row(InlineKeyboardButton("Управление компаниями", callback_data="admin_companies"))
-        keyboard.row(InlineKeyboardButton("Тарифы", callback_data="admin_rates"))
-        keyboard.row(InlineKeyboardButton("Уведомления", callback_data="admin_notifications"))
-        keyboard.row(InlineKeyboardButton("Графики", callback_data="admin_schedules"))
-        keyboard.row(InlineKeyboardButton("Согласование", callback_data="admin_approval"))
-    elif user_role == 'manager':
-        # Manager menu
-        keyboard.row(InlineKeyboardButton("Смена", callback_data="manager_shift"))
-        keyboard.row(InlineKeyboardButton("Согласование", callback_data="manager_approval"))
-        keyboard.row(InlineKeyboardButton("Заявки", callback_data="manager_requests"))
-        keyboard.row(InlineKeyboardButton("Сотрудники", callback_data="manager_employees"))
-        keyboard.row(InlineKeyboardButton("Графики", callback_data="manager_schedules"))
-        keyboard.row(InlineKeyboardButton("Отсутствие", callback_data="manager_absence"))
-    elif user_role == 'shift_supervisor':
-        # Shift supervisor menu
-        keyboard.row(InlineKeyboardButton("Смена", callback_data="supervisor_shift"))
-        keyboard.row(InlineKeyboardButton("Согласование", callback_data="supervisor_approval"))
-        keyboard.row(InlineKeyboardButton("Заявки", callback_data="supervisor_requests"))
-        keyboard.row(InlineKeyboardButton("Графики", callback_data="supervisor_schedules"))
-        keyboard.row(InlineKeyboardButton("Отсутствие", callback_data="supervisor_absence"))
-    elif user_role == 'employee':
-        # Employee menu
-        keyboard.row(InlineKeyboardButton("Смена", callback_data="employee_shift"))
-        keyboard.row(InlineKeyboardButton("Отсутствие", callback_data="employee_absence"))
-    elif user_role == 'outs_staff_manager':
-        # Outsourced staff manager menu
-        keyboard.row(InlineKeyboardButton("Смена", callback_data="outs_manager_shift"))
-        keyboard.row(InlineKeyboardButton("Заявки", callback_data="outs_manager_requests"))
-        keyboard.row(InlineKeyboardButton("Тарифы", callback_data="outs_manager_rates"))
-        keyboard.row(InlineKeyboardButton("Сотрудники", callback_data="outs_manager_employees"))
-    elif user_role == 'brigadier':
-        # Brigadier menu
-        keyboard.row(InlineKeyboardButton("Смена", callback_data="brigadier_shift"))
-        keyboard.row(InlineKeyboardButton("Заявки", callback_data="brigadier_requests"))
-    elif user_role == 'outs_employee':
-        # Outsourced employee menu
-        keyboard.row(InlineKeyboardButton("Смена", callback_data="outs_employee_shift"))
-    
-    # Common back button
-    keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-    
-    return keyboard
+    """Main menu keyboard for the user's role"""
+    return MAIN_MENUS.get(user_role, UNKNOWN_ROLE_MENU)
 
 @bot.message_handler(commands=['start'])
+def on_start(message):
+    """Queue /start behind earlier updates from the same chat"""
+    if not get_dispatcher().submit(message.chat.id, send_welcome, message):
+        logger.warning(f"Dispatcher is full, dropping /start from chat {message.chat.id}")
+
+@bot.callback_query_handler(func=lambda call: True)
+def on_callback(call):
+    """Queue a button press behind earlier updates from the same chat"""
+    if not get_dispatcher().submit(call.message.chat.id, handle_callback, call):
+        logger.warning(f"Dispatcher is full, dropping callback from chat {call.message.chat.id}")
+        notify_callback_error(call, "Бот перегружен. Попробуйте ещё раз через несколько секунд.")
+
 def send_welcome(message):
     """Handle /start command"""
     try:
         # Determine user role from tracker based on Telegram ID
         user_role = get_user_role_from_tracker(str(message.from_user.id))
         
-        welcome_text = f"Добро пожаловать в систему управления персоналом!\nВаша роль: {user_role}\n\nВыберите действие из меню ниже:"
+        welcome_text = get_welcome_text(user_role)
         
         keyboard = get_main_menu_keyboard(user_role)
-        msg = bot.send_message(message.chat.id, welcome_text, reply_markup=keyboard)
+        msg = get_outbound().send_message(message.chat.id, welcome_text, reply_markup=keyboard)
+        rendered_messages.remember(message.chat.id, msg.message_id, welcome_text, keyboard)
         
         # Store message ID for editing later
         update_user_state(message.chat.id, msg.message_id, {'role': user_role})
@@ -99,536 +131,267 @@ def send_welcome(message):
         logger.error(f"Error in send_welcome: {e}")
         bot.reply_to(message, "Произошла ошибка при обработке команды")
 
-@bot.callback_query_handler(func=lambda call: True)
 def handle_callback(call):
     """Handle inline keyboard callbacks"""
     try:
         chat_id = call.message.chat.id
         message_id = call.message.message_id
         
-        # Get user role from state or tracker
-        user_data = get_user_state(chat_id)
-        user_role = user_data.get('role', get_user_role_from_tracker(str(call.from_user.id)))
+        # Resolve the role on every press: the role cache and employee index follow demotions
+        # and dismissals, while the copy kept in session state would outlive them
+        user_role = get_user_role_from_tracker(str(call.from_user.id))
         
         # Update user state with new message
         update_user_state(chat_id, message_id, {'role': user_role})
         
-        # Process different callback data
-        if call.data == 'back_to_main':
-            # Return to main menu
-            welcome_text = f"Добро пожаловать в систему управления персоналом!\nВаша роль: {user_role}\n\nВыберите действие из меню ниже:"
-            keyboard = get_main_menu_keyboard(user_role)
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=welcome_text, reply_markup=keyboard)
-        else:
-            # Handle other callbacks
-            handle_specific_callback(call, chat_id, message_id, user_role)
+        # Process callback data
+        handle_specific_callback(call, chat_id, message_id, user_role)
         
         # Always answer callback
         bot.answer_callback_query(call.id)
+    except CallbackNotAllowed as e:
+        logger.warning(f"Rejected callback from {call.from_user.id}: {e}")
+        notify_callback_error(call, "Недостаточно прав для этого действия")
+    except NoSlotsAvailableError as e:
+        # A request filled up between showing it and the press
+        logger.info(f"Callback from {call.from_user.id} refused: {e}")
+        notify_callback_error(call, "В заявке не осталось свободных мест")
+    except TrackerUnavailableError as e:
+        logger.warning(f"Yandex Tracker unavailable in handle_callback: {e}")
+        notify_callback_error(call, "Yandex Tracker временно недоступен. Попробуйте позже.")
     except Exception as e:
         logger.error(f"Error in handle_callback: {e}")
+        notify_callback_error(call, "Произошла ошибка при обработке запроса")
+
+def notify_callback_error(call, text):
+    """Tell the user that their button press failed instead of failing silently"""
+    try:
+        bot.answer_callback_query(call.id, text=text, show_alert=True)
+    except Exception as e:
+        logger.error(f"Could not answer callback {call.id}: {e}")
 
 def handle_specific_callback(call, chat_id, message_id, user_role):
-    """Handle specific callback data"""
-    # This function will be expanded to handle different callbacks
-    if call.data.startswith('admin_'):
-        handle_admin_callback(call, chat_id, message_id, user_role)
-    elif call.data.startswith('manager_'):
-        handle_manager_callback(call, chat_id, message_id, user_role)
-    elif call.data.startswith('supervisor_'):
-        handle_supervisor_callback(call, chat_id, message_id, user_role)
-    elif call.data.startswith('employee_'):
-        handle_employee_callback(call, chat_id, message_id, user_role)
-    elif call.data.startswith('outs_manager_'):
-        handle_outs_manager_callback(call, chat_id, message_id, user_role)
-    elif call.data.startswith('brigadier_'):
-        handle_brigadier_callback(call, chat_id, message_id, user_role)
-    elif call.data.startswith('outs_employee_'):
-        handle_outs_employee_callback(call, chat_id, message_id, user_role)
-
-def handle_admin_callback(call, chat_id, message_id, user_role):
-    """Handle admin-specific callbacks"""
-    action = call.data.split('_')[1]
-    
-    if action == 'employees':
-        handle_employee_list(chat_id, message_id, bot)
-    elif action == 'add':
-        # This handles the "add employee" callback for admin
-        handle_employee_creation(chat_id, message_id, bot)
-    elif action == 'search':
-        # This handles the "search employee" callback for admin
-        handle_employee_search(chat_id, message_id, bot)
-    elif action.startswith('edit'):
-        # This handles the "edit employee" callback for admin
-        # Extract employee ID from callback data
-        parts = call.data.split('_')
-        if len(parts) >= 4:
-            employee_id = parts[3]
-            handle_employee_details(chat_id, message_id, employee_id, bot)
-    elif action.startswith('block'):
-        # This handles the "block employee" callback for admin
-        text = "Сотрудник заблокирован."
-        keyboard = create_navigation_keyboard([
-            ("Назад", "admin_employees")
-        ], "admin_employees")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'cities':
-        text = "Управление городами:\n- Добавить город\n- Редактировать город"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Добавить", callback_data="admin_add_city"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'warehouses':
-        text = "Управление складами:\n- Добавить склад\n- Редактировать склад"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Добавить", callback_data="admin_add_warehouse"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'companies':
-        text = "Управление компаниями:\n- Добавить компанию\n- Редактировать компанию"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Добавить", callback_data="admin_add_company"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'rates':
-        text = "Управление тарифами:\n- Добавить тариф\n- Редактировать тариф"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Добавить", callback_data="admin_add_rate"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'notifications':
-        text = "Управление уведомлениями:\n- Отправить уведомление\n- Настроить рассылку"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Отправить", callback_data="admin_send_notification"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'schedules':
-        text = "Управление графиками:\n- Создать график\n- Редактировать график"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Создать", callback_data="admin_create_schedule"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'approval':
-        text = "Согласование:\n- Смены\n- Переработки\n- Не профильные часы\n- Отпуска"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Смены", callback_data="admin_approve_shifts"))
-        keyboard.row(InlineKeyboardButton("Переработки", callback_data="admin_approve_overtime"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-
-def handle_manager_callback(call, chat_id, message_id, user_role):
-    """Handle manager-specific callbacks"""
-    action = call.data.split('_')[1]
-    
-    if action == 'shift':
-        text = "Управление сменой:\n- Выйти в смену\n- Закрыть смену\n- Взять оборудование\n- Сдать оборудование\n- Указать номер жилета\n- Указать переработку\n- Указать не профильные часы"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Выйти в смену", callback_data="manager_start_shift"))
-        keyboard.row(InlineKeyboardButton("Закрыть смену", callback_data="manager_end_shift"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'start':
-        handle_start_shift(chat_id, message_id, user_role, bot)
-    elif action == 'end':
-        handle_end_shift(chat_id, message_id, user_role, bot)
-    elif action == 'confirm':
-        # Handle shift confirmation
-        if 'start' in call.data:
-            text = "Смена успешно начата. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Закрыть смену", "manager_end_shift")
-            ], "manager_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-        elif 'end' in call.data:
-            text = "Смена успешно завершена. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Назад", "manager_shift")
-            ], "manager_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'approval':
-        text = "Согласование:\n- Смены\n- Переработки\n- Не профильные часы\n- Отпуска"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Смены", callback_data="manager_approve_shifts"))
-        keyboard.row(InlineKeyboardButton("Переработки", callback_data="manager_approve_overtime"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'requests':
-        handle_view_requests(chat_id, message_id, user_role, bot)
-    elif action == 'create':
-        handle_create_request(chat_id, message_id, user_role, bot)
-    elif action == 'view':
-        handle_view_requests(chat_id, message_id, user_role, bot)
-    elif action.startswith('request'):
-        # Handle request details
-        parts = call.data.split('_')
-        if len(parts) >= 3:
-            request_id = parts[2]
-            handle_submit_to_request(chat_id, message_id, request_id, user_role, bot)
-    elif action.startswith('confirm') and 'create' in call.data:
-        # Handle request creation confirmation
-        text = "Заявка успешно создана. Информация зафиксирована в Yandex Tracker."
-        keyboard = create_navigation_keyboard([
-            ("Посмотреть заявки", "manager_view_requests")
-        ], "manager_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action.startswith('select') or action.startswith('submit'):
-        # Handle employee selection for requests
-        text = "Выберите сотрудника для заявки:"
-        keyboard = create_navigation_keyboard([
-            ("Сотрудник 1", f"manager_confirm_submit_1"),
-            ("Сотрудник 2", f"manager_confirm_submit_2")
-        ], f"{user_role}_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action.startswith('confirm') and 'submit' in call.data:
-        # Handle submission confirmation
-        text = "Сотрудник успешно заявлен на смену. Информация зафиксирована в Yandex Tracker."
-        keyboard = create_navigation_keyboard([
-            ("Посмотреть заявки", f"{user_role}_view_requests")
-        ], f"{user_role}_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'employees':
-        handle_employee_list(chat_id, message_id, bot)
-    elif action == 'add':
-        # This handles the "add employee" callback
-        handle_employee_creation(chat_id, message_id, bot)
-    elif action == 'search':
-        # This handles the "search employee" callback
-        handle_employee_search(chat_id, message_id, bot)
-    elif action.startswith('edit'):
-        # This handles the "edit employee" callback
-        # Extract employee ID from callback data
-        parts = call.data.split('_')
-        if len(parts) >= 4:
-            employee_id = parts[3]
-            handle_employee_details(chat_id, message_id, employee_id, bot)
-    elif action.startswith('block'):
-        # This handles the "block employee" callback
-        text = "Сотрудник заблокирован."
-        keyboard = create_navigation_keyboard([
-            ("Назад", "manager_employees")
-        ], "manager_employees")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'schedules':
-        text = "Управление графиками:\n- Просмотр по дням\n- Редактировать график сотрудника\n- Добавить смену вне графика"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Просмотр", callback_data="manager_view_schedule"))
-        keyboard.row(InlineKeyboardButton("Добавить", callback_data="manager_add_schedule"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'absence':
-        text = "Отсутствие:\n- Запланировать отсутствие\n- Просмотреть отсутствие\n- Отправить на согласование"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Запланировать", callback_data="manager_plan_absence"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-
-def handle_supervisor_callback(call, chat_id, message_id, user_role):
-    """Handle shift supervisor-specific callbacks"""
-    action = call.data.split('_')[1]
-    
-    if action == 'shift':
-        text = "Управление сменой:\n- Выйти в смену\n- Закрыть смену\n- Взять оборудование\n- Сдать оборудование\n- Указать номер жилета\n- Указать переработку\n- Указать не профильные часы"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Выйти в смену", callback_data="supervisor_start_shift"))
-        keyboard.row(InlineKeyboardButton("Закрыть смену", callback_data="supervisor_end_shift"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'start':
-        handle_start_shift(chat_id, message_id, user_role, bot)
-    elif action == 'end':
-        handle_end_shift(chat_id, message_id, user_role, bot)
-    elif action == 'confirm':
-        # Handle shift confirmation
-        if 'start' in call.data:
-            text = "Смена успешно начата. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Закрыть смену", "supervisor_end_shift")
-            ], "supervisor_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-        elif 'end' in call.data:
-            text = "Смена успешно завершена. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Назад", "supervisor_shift")
-            ], "supervisor_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'approval':
-        text = "Согласование:\n- Смены\n- Переработки\n- Не профильные часы\n- Отпуска"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Смены", callback_data="supervisor_approve_shifts"))
-        keyboard.row(InlineKeyboardButton("Переработки", callback_data="supervisor_approve_overtime"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'requests':
-        handle_view_requests(chat_id, message_id, user_role, bot)
-    elif action == 'create':
-        handle_create_request(chat_id, message_id, user_role, bot)
-    elif action == 'view':
-        handle_view_requests(chat_id, message_id, user_role, bot)
-    elif action.startswith('request'):
-        # Handle request details
-        parts = call.data.split('_')
-        if len(parts) >= 3:
-            request_id = parts[2]
-            handle_submit_to_request(chat_id, message_id, request_id, user_role, bot)
-    elif action.startswith('confirm') and 'create' in call.data:
-        # Handle request creation confirmation
-        text = "Заявка успешно создана. Информация зафиксирована в Yandex Tracker."
-        keyboard = create_navigation_keyboard([
-            ("Посмотреть заявки", "supervisor_view_requests")
-        ], "supervisor_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action.startswith('select') or action.startswith('submit'):
-        # Handle employee selection for requests
-        text = "Выберите сотрудника для заявки:"
-        keyboard = create_navigation_keyboard([
-            ("Сотрудник 1", f"supervisor_confirm_submit_1"),
-            ("Сотрудник 2", f"supervisor_confirm_submit_2")
-        ], f"{user_role}_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action.startswith('confirm') and 'submit' in call.data:
-        # Handle submission confirmation
-        text = "Сотрудник успешно заявлен на смену. Информация зафиксирована в Yandex Tracker."
-        keyboard = create_navigation_keyboard([
-            ("Посмотреть заявки", f"{user_role}_view_requests")
-        ], f"{user_role}_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'schedules':
-        text = "Управление графиками:\n- Просмотр по дням\n- Редактировать график сотрудника\n- Добавить смену вне графика"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Просмотр", callback_data="supervisor_view_schedule"))
-        keyboard.row(InlineKeyboardButton("Добавить", callback_data="supervisor_add_schedule"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'absence':
-        text = "Отсутствие:\n- Запланировать отсутствие\n- Просмотреть отсутствие\n- Отправить на согласование"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Запланировать", callback_data="supervisor_plan_absence"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-
-def handle_employee_callback(call, chat_id, message_id, user_role):
-    """Handle employee-specific callbacks"""
-    action = call.data.split('_')[1]
-    
-    if action == 'shift':
-        text = "Управление сменой:\n- Выйти в смену\n- Закрыть смену\n- Взять оборудование\n- Сдать оборудование\n- Указать номер жилета\n- Указать переработку\n- Указать не профильные часы"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Выйти в смену", callback_data="employee_start_shift"))
-        keyboard.row(InlineKeyboardButton("Закрыть смену", callback_data="employee_end_shift"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'start':
-        handle_start_shift(chat_id, message_id, user_role, bot)
-    elif action == 'end':
-        handle_end_shift(chat_id, message_id, user_role, bot)
-    elif action == 'confirm':
-        # Handle shift confirmation
-        if 'start' in call.data:
-            text = "Смена успешно начата. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Закрыть смену", "employee_end_shift")
-            ], "employee_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-        elif 'end' in call.data:
-            text = "Смена успешно завершена. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Назад", "employee_shift")
-            ], "employee_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'absence':
-        text = "Отсутствие:\n- Запланировать отсутствие\n- Просмотреть отсутствие\n- Отправить на согласование"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Запланировать", callback_data="employee_plan_absence"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-
-def handle_outs_manager_callback(call, chat_id, message_id, user_role):
-    """Handle outsourced manager-specific callbacks"""
-    action = call.data.split('_')[1]
-    
-    if action == 'shift':
-        text = "Управление сменой:\n- Выйти в смену\n- Закрыть смену\n- Взать оборудование\n- Сдать оборудование\n- Указать номер жилета\n- Указать переработку\n- Указать не профильные часы"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Выйти в смену", callback_data="outs_manager_start_shift"))
-        keyboard.row(InlineKeyboardButton("Закрыть смену", callback_data="outs_manager_end_shift"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'start':
-        handle_start_shift(chat_id, message_id, user_role, bot)
-    elif action == 'end':
-        handle_end_shift(chat_id, message_id, user_role, bot)
-    elif action == 'confirm':
-        # Handle shift confirmation
-        if 'start' in call.data:
-            text = "Смена успешно начата. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Закрыть смену", "outs_manager_end_shift")
-            ], "outs_manager_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-        elif 'end' in call.data:
-            text = "Смена успешно завершена. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Назад", "outs_manager_shift")
-            ], "outs_manager_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'requests':
-        handle_view_requests(chat_id, message_id, user_role, bot)
-    elif action == 'create':
-        handle_create_request(chat_id, message_id, user_role, bot)
-    elif action == 'view':
-        handle_view_requests(chat_id, message_id, user_role, bot)
-    elif action.startswith('request'):
-        # Handle request details
-        parts = call.data.split('_')
-        if len(parts) >= 3:
-            request_id = parts[2]
-            handle_submit_to_request(chat_id, message_id, request_id, user_role, bot)
-    elif action.startswith('confirm') and 'create' in call.data:
-        # Handle request creation confirmation
-        text = "Заявка успешно создана. Информация зафиксирована в Yandex Tracker."
-        keyboard = create_navigation_keyboard([
-            ("Посмотреть заявки", "outs_manager_view_requests")
-        ], "outs_manager_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action.startswith('select') or action.startswith('submit'):
-        # Handle employee selection for requests
-        text = "Выберите сотрудника для заявки:"
-        keyboard = create_navigation_keyboard([
-            ("Сотрудник 1", f"outs_manager_confirm_submit_1"),
-            ("Сотрудник 2", f"outs_manager_confirm_submit_2")
-        ], f"{user_role}_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action.startswith('confirm') and 'submit' in call.data:
-        # Handle submission confirmation
-        text = "Сотрудник успешно заявлен на смену. Информация зафиксирована в Yandex Tracker."
-        keyboard = create_navigation_keyboard([
-            ("Посмотреть заявки", f"{user_role}_view_requests")
-        ], f"{user_role}_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'rates':
-        text = "Тарифы:\n- Создать заявку на тариф\n- Просмотреть заявки\n- Просмотр текущих тарифов"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Создать", callback_data="outs_manager_create_rate"))
-        keyboard.row(InlineKeyboardButton("Просмотр", callback_data="outs_manager_view_rates"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'employees':
-        handle_employee_list(chat_id, message_id, bot)
-    elif action == 'add':
-        # This handles the "add employee" callback for outsourced manager
-        handle_employee_creation(chat_id, message_id, bot)
-    elif action == 'search':
-        # This handles the "search employee" callback for outsourced manager
-        handle_employee_search(chat_id, message_id, bot)
-    elif action.startswith('edit'):
-        # This handles the "edit employee" callback for outsourced manager
-        # Extract employee ID from callback data
-        parts = call.data.split('_')
-        if len(parts) >= 4:
-            employee_id = parts[3]
-            handle_employee_details(chat_id, message_id, employee_id, bot)
-    elif action.startswith('block'):
-        # This handles the "block employee" callback for outsourced manager
-        text = "Сотрудник заблокирован."
-        keyboard = create_navigation_keyboard([
-            ("Назад", "outs_manager_employees")
-        ], "outs_manager_employees")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-
-def handle_brigadier_callback(call, chat_id, message_id, user_role):
-    """Handle brigadier-specific callbacks"""
-    action = call.data.split('_')[1]
-    
-    if action == 'shift':
-        text = "Управление сменой:\n- Выйти в смену\n- Закрыть смену\n- Взять оборудование\n- Сдать оборудование\n- Указать номер жилета\n- Указать переработку\n- Указать не профильные часы"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Выйти в смену", callback_data="brigadier_start_shift"))
-        keyboard.row(InlineKeyboardButton("Закрыть смену", callback_data="brigadier_end_shift"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'start':
-        handle_start_shift(chat_id, message_id, user_role, bot)
-    elif action == 'end':
-        handle_end_shift(chat_id, message_id, user_role, bot)
-    elif action == 'confirm':
-        # Handle shift confirmation
-        if 'start' in call.data:
-            text = "Смена успешно начата. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Закрыть смену", "brigadier_end_shift")
-            ], "brigadier_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-        elif 'end' in call.data:
-            text = "Смена успешно завершена. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Назад", "brigadier_shift")
-            ], "brigadier_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'requests':
-        handle_view_requests(chat_id, message_id, user_role, bot)
-    elif action == 'create':
-        handle_create_request(chat_id, message_id, user_role, bot)
-    elif action == 'view':
-        handle_view_requests(chat_id, message_id, user_role, bot)
-    elif action.startswith('request'):
-        # Handle request details
-        parts = call.data.split('_')
-        if len(parts) >= 3:
-            request_id = parts[2]
-            handle_submit_to_request(chat_id, message_id, request_id, user_role, bot)
-    elif action.startswith('confirm') and 'create' in call.data:
-        # Handle request creation confirmation
-        text = "Заявка успешно создана. Информация зафиксирована в Yandex Tracker."
-        keyboard = create_navigation_keyboard([
-            ("Посмотреть заявки", "brigadier_view_requests")
-        ], "brigadier_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action.startswith('select') or action.startswith('submit'):
-        # Handle employee selection for requests
-        text = "Выберите сотрудника для заявки:"
-        keyboard = create_navigation_keyboard([
-            ("Сотрудник 1", f"brigadier_confirm_submit_1"),
-            ("Сотрудник 2", f"brigadier_confirm_submit_2")
-        ], f"{user_role}_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action.startswith('confirm') and 'submit' in call.data:
-        # Handle submission confirmation
-        text = "Сотрудник успешно заявлен на смену. Информация зафиксирована в Yandex Tracker."
-        keyboard = create_navigation_keyboard([
-            ("Посмотреть заявки", f"{user_role}_view_requests")
-        ], f"{user_role}_requests")
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-
-def handle_outs_employee_callback(call, chat_id, message_id, user_role):
-    """Handle outsourced employee-specific callbacks"""
-    action = call.data.split('_')[1]
-    
-    if action == 'shift':
-        text = "Управление сменой:\n- Выйти в смену\n- Закрыть смену\n- Взять оборудование\n- Сдать оборудование\n- Указать номер жилета\n- Указать переработку\n- Указать не профильные часы"
-        keyboard = InlineKeyboardMarkup()
-        keyboard.row(InlineKeyboardButton("Выйти в смену", callback_data="outs_employee_start_shift"))
-        keyboard.row(InlineKeyboardButton("Закрыть смену", callback_data="outs_employee_end_shift"))
-        keyboard.row(InlineKeyboardButton("Назад", callback_data="back_to_main"))
-        bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-    elif action == 'start':
-        handle_start_shift(chat_id, message_id, user_role, bot)
-    elif action == 'end':
-        handle_end_shift(chat_id, message_id, user_role, bot)
-    elif action == 'confirm':
-        # Handle shift confirmation
-        if 'start' in call.data:
-            text = "Смена успешно начата. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Закрыть смену", "outs_employee_end_shift")
-            ], "outs_employee_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
-        elif 'end' in call.data:
-            text = "Смена успешно завершена. Информация зафиксирована в Yandex Tracker."
-            keyboard = create_navigation_keyboard([
-                ("Назад", "outs_employee_shift")
-            ], "outs_employee_shift")
-            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=keyboard)
+    """Handle specific callback data through the routing table"""
+    if not router.dispatch(call, chat_id, message_id, user_role):
+        logger.warning(f"Unknown callback data: {call.data}")
+
+def show(ctx, text, keyboard):
+    """Replace the pressed message with a new screen, skipping the call if nothing changes"""
+    edit_message(get_outbound(), ctx.chat_id, ctx.message_id, text, keyboard)
+
+def hand_off(ctx):
+    """The handlers package edits messages itself, so the rendered-message cache must not trust its entry"""
+    rendered_messages.forget(ctx.chat_id, ctx.message_id)
+
+# Role prefixes used in callback data, grouped by the menus each role has
+SHIFT_PREFIXES = ('manager', 'supervisor', 'employee', 'outs_manager', 'brigadier', 'outs_employee')
+REQUEST_PREFIXES = ('manager', 'supervisor', 'outs_manager', 'brigadier')
+EMPLOYEE_ADMIN_PREFIXES = ('admin', 'manager', 'outs_manager')
+APPROVAL_PREFIXES = ('admin', 'manager', 'supervisor')
+SCHEDULE_PREFIXES = ('manager', 'supervisor')
+ABSENCE_PREFIXES = ('manager', 'supervisor', 'employee')
+
+# Role that owns each callback prefix; a route needs at least that role's level
+PREFIX_ROLES = {
+    'admin': 'admin',
+    'manager': 'manager',
+    'supervisor': 'shift_supervisor',
+    'employee': 'employee',
+    'outs_manager': 'outs_staff_manager',
+    'brigadier': 'brigadier',
+    'outs_employee': 'outs_employee'
+}
+
+router = CallbackRouter(prefix_roles=PREFIX_ROLES)
+
+# Screens only build (text, keyboard); the async bot renders the same screens on its event loop
+screens = CallbackRouter(prefix_roles=PREFIX_ROLES)
+
+def screen(pattern, prefixes=(), min_role=None):
+    """Register a screen builder, and a route that shows what it builds; may be stacked for aliases"""
+    def decorator(builder):
+        screens.add(pattern, builder, prefixes, min_role)
+        router.add(pattern, lambda ctx, **params: show(ctx, *builder(ctx, **params)), prefixes, min_role)
+        return builder
+    return decorator
+
+@screen('back_to_main')
+def show_main_menu(ctx):
+    """Return to main menu"""
+    return get_welcome_text(ctx.user_role), get_main_menu_keyboard(ctx.user_role)
+
+# Shifts
+
+@screen('{prefix}_shift', prefixes=SHIFT_PREFIXES)
+def show_shift_menu(ctx):
+    text = "Управление сменой:\n- Выйти в смену\n- Закрыть смену\n- Взять оборудование\n- Сдать оборудование\n- Указать номер жилета\n- Указать переработку\n- Указать не профильные часы"
+    return (text, navigation_keyboard([
+        ("Выйти в смену", f"{ctx.prefix}_start_shift"),
+        ("Закрыть смену", f"{ctx.prefix}_end_shift")
+    ]))
+
+@router.route('{prefix}_start_shift', prefixes=SHIFT_PREFIXES)
+def start_shift(ctx):
+    hand_off(ctx)
+    handle_start_shift(ctx.chat_id, ctx.message_id, ctx.user_role, bot)
+
+@router.route('{prefix}_end_shift', prefixes=SHIFT_PREFIXES)
+def end_shift(ctx):
+    hand_off(ctx)
+    handle_end_shift(ctx.chat_id, ctx.message_id, ctx.user_role, bot)
+
+@screen('{prefix}_confirm_start_shift', prefixes=SHIFT_PREFIXES)
+def confirm_start_shift(ctx):
+    text = "Смена успешно начата. Информация зафиксирована в Yandex Tracker."
+    return (text, navigation_keyboard([
+        ("Закрыть смену", f"{ctx.prefix}_end_shift")
+    ], f"{ctx.prefix}_shift"))
+
+@screen('{prefix}_confirm_end_shift', prefixes=SHIFT_PREFIXES)
+def confirm_end_shift(ctx):
+    text = "Смена успешно завершена. Информация зафиксирована в Yandex Tracker."
+    return (text, navigation_keyboard([
+        ("Назад", f"{ctx.prefix}_shift")
+    ], f"{ctx.prefix}_shift"))
+
+# Requests
+
+@router.route('{prefix}_requests', prefixes=REQUEST_PREFIXES)
+@router.route('{prefix}_view_requests', prefixes=REQUEST_PREFIXES)
+def view_requests(ctx):
+    hand_off(ctx)
+    handle_view_requests(ctx.chat_id, ctx.message_id, ctx.user_role, bot)
+
+@router.route('{prefix}_create_request', prefixes=REQUEST_PREFIXES)
+def create_request(ctx):
+    hand_off(ctx)
+    handle_create_request(ctx.chat_id, ctx.message_id, ctx.user_role, bot)
+
+@router.route('{prefix}_request_{request_id}', prefixes=REQUEST_PREFIXES)
+def submit_to_request(ctx, request_id):
+    hand_off(ctx)
+    handle_submit_to_request(ctx.chat_id, ctx.message_id, request_id, ctx.user_role, bot)
+
+@screen('{prefix}_confirm_create_request', prefixes=REQUEST_PREFIXES)
+def confirm_create_request(ctx):
+    text = "Заявка успешно создана. Информация зафиксирована в Yandex Tracker."
+    return (text, navigation_keyboard([
+        ("Посмотреть заявки", f"{ctx.prefix}_view_requests")
+    ], f"{ctx.prefix}_requests"))
+
+@screen('{prefix}_select_employee', prefixes=REQUEST_PREFIXES)
+@screen('{prefix}_submit_employee', prefixes=REQUEST_PREFIXES)
+def select_request_employee(ctx):
+    text = "Выберите сотрудника для заявки:"
+    return (text, navigation_keyboard([
+        ("Сотрудник 1", f"{ctx.prefix}_confirm_submit_1"),
+        ("Сотрудник 2", f"{ctx.prefix}_confirm_submit_2")
+    ], f"{ctx.prefix}_requests"))
+
+@screen('{prefix}_confirm_submit_{employee_id}', prefixes=REQUEST_PREFIXES)
+def confirm_submit(ctx, employee_id):
+    text = "Сотрудник успешно заявлен на смену. Информация зафиксирована в Yandex Tracker."
+    return (text, navigation_keyboard([
+        ("Посмотреть заявки", f"{ctx.prefix}_view_requests")
+    ], f"{ctx.prefix}_requests"))
+
+# Employees
+
+@router.route('{prefix}_employees', prefixes=EMPLOYEE_ADMIN_PREFIXES)
+def list_employees(ctx):
+    hand_off(ctx)
+    handle_employee_list(ctx.chat_id, ctx.message_id, bot)
+
+@router.route('{prefix}_add', prefixes=EMPLOYEE_ADMIN_PREFIXES)
+@router.route('{prefix}_add_employee', prefixes=EMPLOYEE_ADMIN_PREFIXES)
+def add_employee(ctx):
+    hand_off(ctx)
+    handle_employee_creation(ctx.chat_id, ctx.message_id, bot)
+
+@router.route('{prefix}_search', prefixes=EMPLOYEE_ADMIN_PREFIXES)
+@router.route('{prefix}_search_employee', prefixes=EMPLOYEE_ADMIN_PREFIXES)
+def search_employee(ctx):
+    hand_off(ctx)
+    handle_employee_search(ctx.chat_id, ctx.message_id, bot)
+
+@router.route('{prefix}_edit_employee_{employee_id}', prefixes=EMPLOYEE_ADMIN_PREFIXES)
+def edit_employee(ctx, employee_id):
+    hand_off(ctx)
+    handle_employee_details(ctx.chat_id, ctx.message_id, employee_id, bot)
+
+@screen('{prefix}_block_employee_{employee_id}', prefixes=EMPLOYEE_ADMIN_PREFIXES)
+def block_employee(ctx, employee_id):
+    return ("Сотрудник заблокирован.", navigation_keyboard([
+        ("Назад", f"{ctx.prefix}_employees")
+    ], f"{ctx.prefix}_employees"))
+
+# Approval, schedules and absence
+
+@screen('{prefix}_approval', prefixes=APPROVAL_PREFIXES)
+def show_approval_menu(ctx):
+    text = "Согласование:\n- Смены\n- Переработки\n- Не профильные часы\n- Отпуска"
+    return (text, navigation_keyboard([
+        ("Смены", f"{ctx.prefix}_approve_shifts"),
+        ("Переработки", f"{ctx.prefix}_approve_overtime")
+    ]))
+
+@screen('{prefix}_schedules', prefixes=SCHEDULE_PREFIXES)
+def show_schedule_menu(ctx):
+    text = "Управление графиками:\n- Просмотр по дням\n- Редактировать график сотрудника\n- Добавить смену вне графика"
+    return (text, navigation_keyboard([
+        ("Просмотр", f"{ctx.prefix}_view_schedule"),
+        ("Добавить", f"{ctx.prefix}_add_schedule")
+    ]))
+
+@screen('{prefix}_absence', prefixes=ABSENCE_PREFIXES)
+def show_absence_menu(ctx):
+    text = "Отсутствие:\n- Запланировать отсутствие\n- Просмотреть отсутствие\n- Отправить на согласование"
+    return (text, navigation_keyboard([
+        ("Запланировать", f"{ctx.prefix}_plan_absence")
+    ]))
+
+# Admin reference data
+
+@screen('admin_cities', min_role='admin')
+def show_cities_menu(ctx):
+    text = "Управление городами:\n- Добавить город\n- Редактировать город"
+    return (text, navigation_keyboard([("Добавить", "admin_add_city")]))
+
+@screen('admin_warehouses', min_role='admin')
+def show_warehouses_menu(ctx):
+    text = "Управление складами:\n- Добавить склад\n- Редактировать склад"
+    return (text, navigation_keyboard([("Добавить", "admin_add_warehouse")]))
+
+@screen('admin_companies', min_role='admin')
+def show_companies_menu(ctx):
+    text = "Управление компаниями:\n- Добавить компанию\n- Редактировать компанию"
+    return (text, navigation_keyboard([("Добавить", "admin_add_company")]))
+
+@screen('admin_rates', min_role='admin')
+def show_admin_rates_menu(ctx):
+    text = "Управление тарифами:\n- Добавить тариф\n- Редактировать тариф"
+    return (text, navigation_keyboard([("Добавить", "admin_add_rate")]))
+
+@screen('admin_notifications', min_role='admin')
+def show_notifications_menu(ctx):
+    text = "Управление уведомлениями:\n- Отправить уведомление\n- Настроить рассылку"
+    return (text, navigation_keyboard([("Отправить", "admin_send_notification")]))
+
+@screen('admin_schedules', min_role='admin')
+def show_admin_schedule_menu(ctx):
+    text = "Управление графиками:\n- Создать график\n- Редактировать график"
+    return (text, navigation_keyboard([("Создать", "admin_create_schedule")]))
+
+@screen('outs_manager_rates', min_role='outs_staff_manager')
+def show_outs_manager_rates_menu(ctx):
+    text = "Тарифы:\n- Создать заявку на тариф\n- Просмотреть заявки\n- Просмотр текущих тарифов"
+    return (text, navigation_keyboard([
+        ("Создать", "outs_manager_create_rate"),
+        ("Просмотр", "outs_manager_view_rates")
+    ]))
 
 if __name__ == '__main__':
     logger.info("Starting the Telegram bot...")
+    get_dispatcher()
+    get_outbound()
     bot.polling(none_stop=True)
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Asyncio-native Yandex Tracker client
+Same API surface as YandexTrackerClient, so coroutine handlers can overlap their Tracker I/O
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from config.settings import YT_ORG_ID, YT_TOKEN, YT_PROJECT_ID
+from models.http_pool import POOL_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT
+from models.resilience import (
+    TokenBucket, CircuitBreaker, TrackerUnavailableError, MAX_RETRIES,
+    backoff_delay, parse_retry_after, get_shared_rate_limiter, get_shared_circuit_breaker
+)
+from models.tracker_integration import (
+    DEFAULT_SEARCH_FIELDS, IDEMPOTENT_METHODS, SEARCH_PAGE_SIZE, SCROLL_TTL_MILLIS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncYandexTrackerClient:
+    """
+    Client for interacting with Yandex Tracker API from coroutines
+    Shares the process-wide rate limiter and circuit breaker with the synchronous client
+    """
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = MAX_RETRIES):
+        if not YT_ORG_ID or not YT_TOKEN:
+            raise ValueError("YT_ORG_ID and YT_TOKEN must be set in environment variables")
+
+        self.org_id = YT_ORG_ID
+        self.token = YT_TOKEN
+        self.project_id = YT_PROJECT_ID
+        self.base_url = "https://api.tracker.yandex.net/v2"
+        self.headers = {
+            "Authorization": f"OAuth {self.token}",
+            "X-Org-ID": self.org_id,
+            "Content-Type": "application/json"
+        }
+        self._session = session
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.circuit_breaker = circuit_breaker or get_shared_circuit_breaker()
+        self.max_retries = max_retries
+        self.retries = 0
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Create the keep-alive session lazily, inside the running event loop
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=POOL_SIZE)
+            timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers)
+        return self._session
+
+    async def close(self):
+        """
+        Close the underlying HTTP session
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _acquire_token(self):
+        while True:
+            delay = self.rate_limiter.try_acquire()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _request(self, method: str, path: str, idempotent: Optional[bool] = None,
+                       **kwargs) -> Tuple[object, Dict[str, str]]:
+        """
+        Send a request and return (decoded JSON, response headers)
+        Retry rules match YandexTrackerClient._request
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        session = await self._get_session()
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow():
+                raise TrackerUnavailableError("Yandex Tracker circuit is open")
+            await self._acquire_token()
+
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    if response.status == 429:
+                        self.circuit_breaker.record_success()
+                        delay = self._retry_delay(response.headers, attempt)
+                        self.rate_limiter.pause(delay)
+                        if attempt >= self.max_retries:
+                            raise TrackerUnavailableError(f"Yandex Tracker is throttling {method} {path}")
+                        delay = 0
+                    elif response.status >= 500:
+                        self.circuit_breaker.record_failure()
+                        if not idempotent or attempt >= self.max_retries:
+                            response.raise_for_status()
+                        delay = self._retry_delay(response.headers, attempt)
+                        logger.warning(f"{method} {path} returned {response.status}, retrying in {delay:.2f}s")
+                    else:
+                        self.circuit_breaker.record_success()
+                        response.raise_for_status()
+                        return await response.json(), response.headers.copy()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.circuit_breaker.record_failure()
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"{method} {path} failed ({e}), retrying in {delay:.2f}s")
+
+            attempt += 1
+            self.retries += 1
+            if delay:
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _retry_delay(headers, attempt: int) -> float:
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        return retry_after if retry_after is not None else backoff_delay(attempt)
+
+    async def create_issue(self, issue_data: Dict) -> Dict:
+        """
+        Create a new issue in Yandex Tracker
+        """
+        payload, _ = await self._request("POST", "/issues", json=issue_data)
+        return payload
+
+    async def get_issue(self, issue_key: str) -> Dict:
+        """
+        Get issue by key from Yandex Tracker
+        """
+        payload, _ = await self._request("GET", f"/issues/{issue_key}")
+        return payload
+
+    async def update_issue(self, issue_key: str, issue_data: Dict) -> Dict:
+        """
+        Update an existing issue in Yandex Tracker
+        """
+        payload, _ = await self._request("PATCH", f"/issues/{issue_key}", json=issue_data)
+        return payload
+
+    async def add_comment(self, issue_key: str, comment: str) -> Dict:
+        """
+        Add a comment to an issue
+        """
+        payload, _ = await self._request("POST", f"/issues/{issue_key}/comments", json={"text": comment})
+        return payload
+
+    async def search_issues(self, query: str, fields: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Search issues in Yandex Tracker (single request)
+        """
+        payload, _ = await self._search(query, fields, {})
+        return payload
+
+    async def iter_issues(self, query: str, fields: Optional[List[str]] = None,
+                          per_page: int = SEARCH_PAGE_SIZE, limit: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Stream search results with Tracker scrolling, one page in memory at a time
+        """
+        params = {
+            "scrollType": "sorted" if "Sort By" in query else "unsorted",
+            "perScroll": per_page,
+            "scrollTTLMillis": SCROLL_TTL_MILLIS
+        }
+        yielded = 0
+        while limit is None or yielded < limit:
+            issues, headers = await self._search(query, fields, params)
+            for issue in issues:
+                yield issue
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+            scroll_id = headers.get("X-Scroll-Id")
+            if not issues or not scroll_id or len(issues) < per_page:
+                return
+            params = {"scrollId": scroll_id, "scrollTTLMillis": SCROLL_TTL_MILLIS}
+            if headers.get("X-Scroll-Token"):
+                params["scrollToken"] = headers["X-Scroll-Token"]
+
+    async def _search(self, query: str, fields: Optional[List[str]], params: Dict):
+        search_data = {
+            "query": query,
+            "fields": fields or DEFAULT_SEARCH_FIELDS
+        }
+        return await self._request("POST", "/issues/_search", idempotent=True, json=search_data, params=params)
@@ -0,0 +1,217 @@
+"""
+Local Telegram ID -> employee index over the EMP queue
+Bootstrapped once by paging through the queue and kept fresh by incremental syncs
+"""
+
+import os
+import threading
+import logging
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_INDEX_PAGE_SIZE = int(os.getenv('EMPLOYEE_INDEX_PAGE_SIZE', '100'))
+EMPLOYEE_INDEX_SYNC_INTERVAL = float(os.getenv('EMPLOYEE_INDEX_SYNC_INTERVAL', '60'))
+
+EMPLOYEE_QUEUE = "EMP"
+# Only what the index needs: the key, the sync cursor and three custom fields
+INDEX_FIELDS = ["key", "updated", "customFields.telegram", "customFields.role", "customFields.status"]
+
+
+def normalize_telegram(value) -> str:
+    """
+    Normalize a Telegram ID or @handle for use as an index key
+    """
+    return str(value).strip().lstrip('@').lower()
+
+
+def tracker_timestamp(updated: str) -> str:
+    """
+    Convert an issue 'updated' value into the date format the query language accepts
+    """
+    return updated[:19].replace('T', ' ')
+
+
+class EmployeeIndex:
+    """
+    In-memory index from the employee 'telegram' custom field to issue key, role and status
+    """
+
+    def __init__(self, tracker, page_size: int = EMPLOYEE_INDEX_PAGE_SIZE):
+        self.tracker = tracker
+        self.page_size = page_size
+        self._by_telegram: Dict[str, Dict] = {}
+        self._telegram_by_key: Dict[str, str] = {}
+        self._last_updated: Optional[str] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loader: Optional[threading.Thread] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def lookup(self, telegram_id) -> Optional[Dict]:
+        """
+        Find the employee with this Telegram ID
+        Returns {'key', 'role', 'status'}, or None if unknown or while the index is still loading;
+        a lookup before the first sync starts the bootstrap in the background, never on the caller
+        """
+        if not self._loaded:
+            self.load_in_background()
+            return None
+        return self._by_telegram.get(normalize_telegram(telegram_id))
+
+    def load_in_background(self):
+        """
+        Bootstrap the index on a daemon thread unless it is loaded or already loading
+        """
+        with self._lock:
+            if self._loaded or (self._loader and self._loader.is_alive()):
+                return
+            self._loader = threading.Thread(target=self._load, name="employee-index-bootstrap", daemon=True)
+            self._loader.start()
+
+    def sync(self) -> int:
+        """
+        Bootstrap the index or apply changes made since the last sync
+        Returns the number of employee issues processed
+        """
+        with self._sync_lock:
+            if not self._loaded:
+                return self._bootstrap()
+            return self._apply(self._fetch(self._incremental_query()))
+
+    async def sync_async(self, client) -> int:
+        """
+        Same as sync(), but reads the queue through an AsyncYandexTrackerClient
+        Meant for the asyncio entry point, which runs it instead of the background thread
+        """
+        bootstrapping = not self._loaded
+        if bootstrapping:
+            self._reset()
+            query = f'Queue: {EMPLOYEE_QUEUE} "Sort By": Updated ASC'
+        else:
+            query = self._incremental_query()
+        
+        processed = 0
+        batch = []
+        async for issue in client.iter_issues(query, fields=INDEX_FIELDS, per_page=self.page_size):
+            batch.append(issue)
+            if len(batch) >= self.page_size:
+                processed += self._apply(batch)
+                batch = []
+        processed += self._apply(batch)
+        
+        if bootstrapping:
+            self._loaded = True
+            logger.info(f"Employee index bootstrapped with {len(self)} Telegram IDs")
+        return processed
+
+    def on_employee_updated(self, employee_id: str, employee_data: Dict):
+        """
+        EmployeeManager update listener: apply a local change without waiting for a sync
+        """
+        if 'telegram' not in employee_data and 'role' not in employee_data and 'status' not in employee_data:
+            return
+        with self._lock:
+            current_telegram = self._telegram_by_key.get(employee_id)
+            current = self._by_telegram.get(current_telegram, {}) if current_telegram else {}
+            telegram = employee_data.get('telegram', current_telegram)
+            entry = {
+                'key': employee_id,
+                'role': employee_data.get('role', current.get('role', 'employee')),
+                'status': employee_data.get('status', current.get('status', 'active'))
+            }
+            self._put(telegram, entry)
+
+    def start_background_sync(self, interval: float = EMPLOYEE_INDEX_SYNC_INTERVAL):
+        """
+        Run incremental syncs on a daemon thread every interval seconds
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.error(f"Employee index sync failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="employee-index-sync", daemon=True)
+        self._thread.start()
+
+    def stop_background_sync(self):
+        """
+        Stop the background sync thread
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __len__(self) -> int:
+        return len(self._by_telegram)
+
+    def _reset(self):
+        with self._lock:
+            self._by_telegram = {}
+            self._telegram_by_key = {}
+            self._last_updated = None
+
+    def _load(self):
+        try:
+            self.sync()
+        except Exception as e:
+            logger.error(f"Employee index bootstrap failed: {e}")
+
+    def _bootstrap(self) -> int:
+        query = f'Queue: {EMPLOYEE_QUEUE} "Sort By": Updated ASC'
+        self._reset()
+        processed = self._apply(self._fetch(query))
+        self._loaded = True
+        logger.info(f"Employee index bootstrapped with {len(self)} Telegram IDs")
+        return processed
+
+    def _incremental_query(self) -> str:
+        if not self._last_updated:
+            return f'Queue: {EMPLOYEE_QUEUE} "Sort By": Updated ASC'
+        # >= rather than > so that same-second updates are not skipped; re-applying is harmless
+        return (f'Queue: {EMPLOYEE_QUEUE} Updated: >= "{tracker_timestamp(self._last_updated)}" '
+                f'"Sort By": Updated ASC')
+
+    def _fetch(self, query: str) -> Iterable[Dict]:
+        return self.tracker.iter_issues(query, fields=INDEX_FIELDS, per_page=self.page_size)
+
+    def _apply(self, issues: Iterable[Dict]) -> int:
+        processed = 0
+        for issue in issues:
+            processed += 1
+            custom_fields = issue.get('customFields', {})
+            entry = {
+                'key': issue.get('key'),
+                'role': custom_fields.get('role') or 'employee',
+                'status': custom_fields.get('status') or 'active'
+            }
+            with self._lock:
+                self._put(custom_fields.get('telegram'), entry)
+                updated = issue.get('updated')
+                if updated and (self._last_updated is None or updated > self._last_updated):
+                    self._last_updated = updated
+        return processed
+
+    def _put(self, telegram, entry: Dict):
+        # Drop the old mapping in case the employee's telegram field changed
+        previous = self._telegram_by_key.pop(entry['key'], None)
+        if previous is not None:
+            self._by_telegram.pop(previous, None)
+        if not telegram:
+            return
+        telegram = normalize_telegram(telegram)
+        self._by_telegram[telegram] = entry
+        self._telegram_by_key[entry['key']] = telegram
@@ -0,0 +1,104 @@
+"""
+HTTP connection pooling for Yandex Tracker API calls
+Keeps one keep-alive session per process that all tracker clients share
+"""
+
+import os
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Pool tuning, overridable from the environment
+POOL_SIZE = int(os.getenv('YT_POOL_SIZE', '20'))
+CONNECT_TIMEOUT = float(os.getenv('YT_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.getenv('YT_READ_TIMEOUT', '15'))
+WARM_UP_CONNECTIONS = int(os.getenv('YT_WARM_UP_CONNECTIONS', '4'))
+
+_shared_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def default_timeout() -> Tuple[float, float]:
+    """
+    (connect, read) timeout pair used for every tracker request
+    """
+    return (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+def create_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """
+    Create a session with a keep-alive connection pool sized for concurrent handlers
+    """
+    session = requests.Session()
+    # We only ever talk to one host, so a couple of host pools is plenty;
+    # pool_maxsize is what bounds the number of kept-alive connections.
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_shared_session() -> requests.Session:
+    """
+    Get the process-wide session, creating it on first use
+    """
+    global _shared_session
+    if _shared_session is None:
+        with _session_lock:
+            if _shared_session is None:
+                _shared_session = create_session()
+    return _shared_session
+
+
+def set_shared_session(session: requests.Session):
+    """
+    Replace the process-wide session (e.g. with a differently tuned one or a test double)
+    """
+    global _shared_session
+    with _session_lock:
+        _shared_session = session
+
+
+def close_shared_session():
+    """
+    Close the process-wide session and drop its pooled connections
+    """
+    global _shared_session
+    with _session_lock:
+        if _shared_session is not None:
+            _shared_session.close()
+            _shared_session = None
+
+
+def connection_stats(session: Optional[requests.Session] = None) -> Dict[str, float]:
+    """
+    Report how many requests were served over reused keep-alive connections
+    """
+    session = session or get_shared_session()
+    requests_made = 0
+    connections_opened = 0
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_made += pool.num_requests
+            connections_opened += pool.num_connections
+
+    reused = max(0, requests_made - connections_opened)
+    return {
+        'requests': requests_made,
+        'connections': connections_opened,
+        'reused': reused,
+        'reuse_ratio': reused / requests_made if requests_made else 0.0
+    }
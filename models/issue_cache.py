@@ -0,0 +1,167 @@
+"""
+Read-through cache for single issues fetched from Yandex Tracker
+Entries live for a per-queue TTL and are revalidated rather than refetched when Tracker
+can tell us they have not changed
+"""
+
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ISSUE_CACHE_SIZE = int(os.getenv('YT_ISSUE_CACHE_SIZE', '5000'))
+DEFAULT_ISSUE_TTL = float(os.getenv('YT_ISSUE_TTL', '60'))
+
+# Seconds an issue is served without asking Tracker; reference queues change rarely,
+# requests and shifts change under users' feet. Override with YT_ISSUE_TTL_<QUEUE>.
+QUEUE_TTLS: Dict[str, float] = {
+    queue: float(os.getenv(f'YT_ISSUE_TTL_{queue}', default))
+    for queue, default in (
+        ('CITY', '3600'),
+        ('WH', '3600'),
+        ('COMP', '3600'),
+        ('EMP', '300'),
+        ('REQ', '15'),
+        ('SHIFT', '15')
+    )
+}
+
+
+def queue_of(issue_key: str) -> str:
+    """
+    Queue part of an issue key ("REQ-12" -> "REQ")
+    """
+    return issue_key.rpartition('-')[0]
+
+
+class CachedIssue:
+    """
+    Raw issue body plus what is needed to revalidate it
+    The body is stored as received and decoded per hit, so callers never share mutable dicts.
+    """
+
+    __slots__ = ('body', 'etag', 'updated', 'expires_at')
+
+    def __init__(self, body: bytes, etag: Optional[str], updated: Optional[str], expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.updated = updated
+        self.expires_at = expires_at
+
+    def issue(self) -> Dict:
+        return json.loads(self.body)
+
+
+class IssueCache:
+    """
+    LRU of issue bodies keyed by issue key, with a TTL per queue
+    """
+
+    def __init__(self, max_size: int = ISSUE_CACHE_SIZE, queue_ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = DEFAULT_ISSUE_TTL, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.queue_ttls = QUEUE_TTLS if queue_ttls is None else queue_ttls
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, CachedIssue]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.invalidations = 0
+
+    def ttl(self, issue_key: str) -> float:
+        return self.queue_ttls.get(queue_of(issue_key), self.default_ttl)
+
+    def lookup(self, issue_key: str) -> Optional[CachedIssue]:
+        """
+        Entry for the key, fresh or stale; None if the issue is not cached
+        Counts a hit only for fresh entries.
+        """
+        with self._lock:
+            entry = self._entries.get(issue_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(issue_key)
+            if entry.expires_at > self._clock():
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def is_fresh(self, entry: CachedIssue) -> bool:
+        return entry.expires_at > self._clock()
+
+    def put(self, issue_key: str, body: bytes, etag: Optional[str] = None, updated: Optional[str] = None):
+        """
+        Cache an issue body as received from Tracker
+        """
+        if updated is None:
+            try:
+                updated = json.loads(body).get('updated')
+            except (ValueError, AttributeError):
+                return
+        entry = CachedIssue(body, etag, updated, self._clock() + self.ttl(issue_key))
+        with self._lock:
+            self._entries[issue_key] = entry
+            self._entries.move_to_end(issue_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def refresh(self, issue_key: str):
+        """
+        Tracker confirmed the cached version is current; serve it for another TTL
+        """
+        with self._lock:
+            entry = self._entries.get(issue_key)
+            if entry is not None:
+                entry.expires_at = self._clock() + self.ttl(issue_key)
+                self.revalidated += 1
+
+    def invalidate(self, issue_key: str):
+        """
+        Drop an issue after it was changed
+        """
+        with self._lock:
+            if self._entries.pop(issue_key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Size, hit ratio and revalidation counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+
+_shared_issue_cache: Optional[IssueCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_issue_cache() -> IssueCache:
+    """
+    Get the process-wide issue cache
+    """
+    global _shared_issue_cache
+    with _shared_lock:
+        if _shared_issue_cache is None:
+            _shared_issue_cache = IssueCache()
+        return _shared_issue_cache
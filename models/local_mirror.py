@@ -0,0 +1,305 @@
+"""
+Local read replica of Tracker queues in SQLite
+Issues of the mirrored queues are copied into a WAL-mode database and kept current by
+incremental syncs on their 'updated' timestamp; employees are additionally indexed in an
+FTS5 trigram table so that partial names, phones and Telegram handles are found locally
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from models.employee_index import normalize_telegram, tracker_timestamp
+from models.schemas import (
+    Schema, EMPLOYEE_SCHEMA, COMPANY_SCHEMA, WAREHOUSE_SCHEMA, SHIFT_SCHEMA, REQUEST_SCHEMA
+)
+
+logger = logging.getLogger(__name__)
+
+# Keep a local replica of the queues and search employees in it
+LOCAL_MIRROR = os.getenv('LOCAL_MIRROR', '0') == '1'
+MIRROR_DB_PATH = os.getenv('MIRROR_DB_PATH', 'tracker_mirror.db')
+MIRROR_SYNC_INTERVAL = float(os.getenv('MIRROR_SYNC_INTERVAL', '60'))
+MIRROR_PAGE_SIZE = int(os.getenv('MIRROR_PAGE_SIZE', '500'))
+
+MIRRORED_SCHEMAS: Dict[str, Schema] = {
+    schema.queue: schema
+    for schema in (EMPLOYEE_SCHEMA, COMPANY_SCHEMA, WAREHOUSE_SCHEMA, SHIFT_SCHEMA, REQUEST_SCHEMA)
+}
+
+# Shortest fragment the trigram index can look up; shorter terms fall back to a scan
+TRIGRAM = 3
+_NON_DIGITS = re.compile(r'\D')
+
+
+def _phone_digits(value) -> str:
+    return _NON_DIGITS.sub('', str(value or ''))
+
+
+def _search_term(term: str) -> str:
+    """
+    Normalize a search word the way the indexed columns are: phones to digits, handles without '@'
+    A word without letters ("+7", "(999)", "12-34") is part of a phone and keeps only its digits.
+    """
+    if not any(char.isalpha() for char in term):
+        return _phone_digits(term)
+    return term.lstrip('@').lower()
+
+
+class LocalMirror:
+    """
+    SQLite replica of the EMP, COMP, WH, SHIFT and REQ queues
+
+    sync() copies every issue changed since the previous sync of each queue (all issues the
+    first time). Issues deleted in Tracker are not noticed. Each thread reads through its own
+    connection; WAL lets searches run while a sync writes.
+    """
+
+    def __init__(self, tracker, path: str = MIRROR_DB_PATH, schemas: Optional[Dict[str, Schema]] = None,
+                 page_size: int = MIRROR_PAGE_SIZE):
+        self.tracker = tracker
+        self.path = path
+        self.schemas = MIRRORED_SCHEMAS if schemas is None else schemas
+        self.page_size = page_size
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_sync_seconds = 0.0
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(
+            # id is stable across updates and doubles as the employee's rowid in employee_search
+            "CREATE TABLE IF NOT EXISTS issues ("
+            " id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, queue TEXT NOT NULL, updated TEXT,"
+            " company TEXT, data TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS issues_company ON issues (company);"
+            # complete is set once a whole pass over the queue has been stored, not per batch
+            "CREATE TABLE IF NOT EXISTS sync_state ("
+            " queue TEXT PRIMARY KEY, last_updated TEXT, synced_at REAL, complete INTEGER NOT NULL DEFAULT 0);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS employee_search USING fts5("
+            " name, phone, telegram, company, tokenize='trigram');"
+        )
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Mirrored issue (key, summary, updated, customFields) or None
+        """
+        row = self._connection().execute("SELECT data FROM issues WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def ready(self, queue: str) -> bool:
+        """
+        Whether a full sync of the queue has finished, so that the mirror holds all of it
+        """
+        return self._connection().execute(
+            "SELECT 1 FROM sync_state WHERE queue = ? AND complete", (queue,)
+        ).fetchone() is not None
+
+    def search_employees(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Employees whose name, phone, Telegram handle or company name contain every word of query
+        Results come in index order, which lets LIMIT stop early on common names instead of
+        ranking every hit; words shorter than three characters are matched by a slower scan.
+        """
+        terms = [_search_term(term) for term in query.split()]
+        terms = [term for term in terms if term]
+        if not terms:
+            return []
+        indexed = [term for term in terms if len(term) >= TRIGRAM]
+        short = [term for term in terms if len(term) < TRIGRAM]
+
+        sql = "SELECT issues.data FROM employee_search JOIN issues ON issues.id = employee_search.rowid"
+        conditions, params = [], []
+        if indexed:
+            conditions.append("employee_search MATCH ?")
+            params.append(' AND '.join('"' + term.replace('"', '""') + '"' for term in indexed))
+        for term in short:
+            conditions.append("(employee_search.name LIKE ? OR employee_search.phone LIKE ?"
+                              " OR employee_search.telegram LIKE ? OR employee_search.company LIKE ?)")
+            params.extend([f"%{term}%"] * 4)
+        sql += " WHERE " + " AND ".join(conditions) + " LIMIT ?"
+        params.append(limit)
+        return [json.loads(row[0]) for row in self._connection().execute(sql, params)]
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Bring every mirrored queue up to date; returns the number of issues copied per queue
+        """
+        with self._sync_lock:
+            started = time.perf_counter()
+            counts = {}
+            # Companies first, so employees are indexed under current company names
+            for queue in sorted(self.schemas, key=lambda queue: queue != COMPANY_SCHEMA.queue):
+                try:
+                    counts[queue] = self._sync_queue(queue)
+                except Exception as e:
+                    logger.error(f"Mirror sync of {queue} failed: {e}")
+            self.last_sync_seconds = time.perf_counter() - started
+            return counts
+
+    def start_background_sync(self, interval: float = MIRROR_SYNC_INTERVAL):
+        """
+        Sync now and then every interval seconds on a daemon thread
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def run():
+            while True:
+                self.sync()
+                if self._stop_event.wait(interval):
+                    return
+
+        self._thread = threading.Thread(target=run, name="tracker-mirror-sync", daemon=True)
+        self._thread.start()
+
+    def stop_background_sync(self):
+        """
+        Stop the background sync thread
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Mirrored issues per queue, their newest updated timestamp and the last sync duration
+        """
+        connection = self._connection()
+        counts = dict(connection.execute("SELECT queue, COUNT(*) FROM issues GROUP BY queue").fetchall())
+        synced = {queue: last_updated for queue, last_updated
+                  in connection.execute("SELECT queue, last_updated FROM sync_state")}
+        return {
+            'queues': {queue: {'issues': counts.get(queue, 0), 'last_updated': synced.get(queue)}
+                       for queue in self.schemas},
+            'last_sync_seconds': self.last_sync_seconds
+        }
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _sync_queue(self, queue: str) -> int:
+        row = self._connection().execute(
+            "SELECT last_updated FROM sync_state WHERE queue = ?", (queue,)
+        ).fetchone()
+        last_updated = row[0] if row else None
+        if last_updated:
+            # >= rather than > so that same-second updates are not skipped; rewriting is harmless
+            query = f'Queue: {queue} Updated: >= "{tracker_timestamp(last_updated)}" "Sort By": Updated ASC'
+        else:
+            query = f'Queue: {queue} "Sort By": Updated ASC'
+        fields = ["key", "summary", "updated"] + [f"customFields.{field.tracker_name}"
+                                                  for field in self.schemas[queue].fields]
+
+        copied = 0
+        batch = []
+        for issue in self.tracker.iter_issues(query, fields=fields, per_page=self.page_size):
+            batch.append(issue)
+            if len(batch) >= self.page_size:
+                last_updated = self._store(queue, batch, last_updated)
+                copied += len(batch)
+                batch = []
+        last_updated = self._store(queue, batch, last_updated)
+        copied += len(batch)
+        self._connection().execute("UPDATE sync_state SET complete = 1 WHERE queue = ?", (queue,))
+        if copied:
+            logger.info(f"Mirrored {copied} {queue} issues")
+        return copied
+
+    def _store(self, queue: str, issues: List[Dict], last_updated: Optional[str]) -> Optional[str]:
+        """
+        Upsert one batch of issues and advance the queue's sync cursor in the same transaction
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if queue == COMPANY_SCHEMA.queue:
+                previous_names = {issue['key']: self._company_name(connection, issue['key']) for issue in issues}
+            for issue in issues:
+                updated = issue.get('updated')
+                company = (issue.get('customFields') or {}).get('company') if queue == EMPLOYEE_SCHEMA.queue else None
+                connection.execute(
+                    "INSERT INTO issues (key, queue, updated, company, data) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET updated = excluded.updated, company = excluded.company, "
+                    "data = excluded.data",
+                    (issue['key'], queue, updated, company, json.dumps(issue, ensure_ascii=False))
+                )
+                if updated and (last_updated is None or updated > last_updated):
+                    last_updated = updated
+            if queue == EMPLOYEE_SCHEMA.queue:
+                self._index_employees(connection, issues)
+            elif queue == COMPANY_SCHEMA.queue:
+                self._reindex_company_employees(connection, [
+                    key for key, name in previous_names.items() if self._company_name(connection, key) != name
+                ])
+            connection.execute(
+                "INSERT INTO sync_state (queue, last_updated, synced_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (queue) DO UPDATE SET last_updated = excluded.last_updated, "
+                "synced_at = excluded.synced_at",
+                (queue, last_updated, time.time())
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return last_updated
+
+    def _index_employees(self, connection: sqlite3.Connection, issues: Iterable[Dict]):
+        company_names: Dict[str, str] = {}
+        rows = []
+        for issue in issues:
+            custom_fields = issue.get('customFields') or {}
+            company_key = custom_fields.get('company') or ''
+            if company_key not in company_names:
+                company_names[company_key] = self._company_name(connection, company_key)
+            name = ' '.join(filter(None, (custom_fields.get('lastName'), custom_fields.get('firstName'),
+                                          custom_fields.get('middleName'))))
+            telegram = custom_fields.get('telegram')
+            rows.append((issue['key'], name.lower(), _phone_digits(custom_fields.get('phone')),
+                         normalize_telegram(telegram) if telegram else '', company_names[company_key]))
+        # Stored lowercased for the LIKE scan of short words, which only folds ASCII case.
+        # FTS5 has no upsert; replacing by rowid keeps one row per employee
+        connection.executemany(
+            "INSERT OR REPLACE INTO employee_search (rowid, name, phone, telegram, company) "
+            "SELECT id, ?, ?, ?, ? FROM issues WHERE key = ?",
+            [(name, phone, telegram, company, key) for key, name, phone, telegram, company in rows]
+        )
+
+    def _reindex_company_employees(self, connection: sqlite3.Connection, company_keys: List[str]):
+        for company_key in company_keys:
+            connection.execute(
+                "UPDATE employee_search SET company = ? WHERE rowid IN (SELECT id FROM issues WHERE company = ?)",
+                (self._company_name(connection, company_key), company_key)
+            )
+
+    @staticmethod
+    def _company_name(connection: sqlite3.Connection, company_key: str) -> str:
+        """
+        Searchable text for an employee's company: the mirrored company's names, or the raw value
+        """
+        row = connection.execute("SELECT data FROM issues WHERE key = ?", (company_key,)).fetchone() if company_key else None
+        if row is None:
+            return (company_key or '').lower()
+        custom_fields = json.loads(row[0]).get('customFields') or {}
+        names = ' '.join(filter(None, (custom_fields.get('shortName'), custom_fields.get('fullName'))))
+        return (names or company_key).lower()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit; writes manage their own transactions
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
@@ -0,0 +1,295 @@
+"""
+In-memory reference data for the CITY, WH and COMP queues
+These queues are small and rarely change, so they are loaded whole (at startup or on first
+use), served from memory by key and by name, and reloaded on a schedule
+"""
+
+import os
+import sys
+import threading
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models.issue_cache import queue_of
+from models.schemas import CITY_SCHEMA, COMPANY_SCHEMA, WAREHOUSE_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_PAGE_SIZE = int(os.getenv('REFERENCE_PAGE_SIZE', '100'))
+REFERENCE_REFRESH_INTERVAL = float(os.getenv('REFERENCE_REFRESH_INTERVAL', '900'))
+# Load every reference queue at startup instead of on first lookup
+REFERENCE_PRELOAD = os.getenv('REFERENCE_PRELOAD', '1') == '1'
+
+# Custom fields kept per queue, and which of them a record can be found by. Every schema field
+# is kept so that the managers' get_city/get_warehouse/get_company can be answered from memory;
+# a company's workflow status is not a schema field but is kept for screens that list only
+# active companies.
+REFERENCE_QUEUES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    'CITY': (tuple(CITY_SCHEMA.tracker_names.values()), ('name',)),
+    'WH': (tuple(WAREHOUSE_SCHEMA.tracker_names.values()), ('name', 'synonyms')),
+    'COMP': (tuple(COMPANY_SCHEMA.tracker_names.values()) + ('status',), ('fullName', 'shortName', 'inn'))
+}
+
+
+def normalize_name(value) -> str:
+    """
+    Normalize a name for lookups: case-insensitive, surrounding and repeated spaces ignored
+    """
+    return ' '.join(str(value).split()).casefold()
+
+
+def deep_sizeof(obj) -> int:
+    """
+    Approximate memory held by nested dicts, lists and strings
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key) + deep_sizeof(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(item) for item in obj)
+    return size
+
+
+class _ReferenceTable:
+    """
+    One queue's records by key and by normalized name; replaced whole on reload
+    """
+
+    __slots__ = ('by_key', 'by_name', 'loaded_at', 'load_seconds')
+
+    def __init__(self, loaded_at: float = 0.0, load_seconds: float = 0.0):
+        self.by_key: Dict[str, Dict] = {}
+        self.by_name: Dict[str, str] = {}
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+
+
+class ReferenceData:
+    """
+    Cities, warehouses and companies held in memory
+
+    Lookups load their queue on first use; reload() or the background refresh replaces a
+    queue's records in one step, so readers never see a half-loaded queue. Records have the
+    shape of a Tracker issue reduced to key, summary, updated and the queue's reference fields.
+    An issue put while its queue is being loaded is applied again on top of the loaded snapshot
+    unless the snapshot already has that issue at the same or a later 'updated'.
+    """
+
+    def __init__(self, tracker, queues: Optional[Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]]] = None,
+                 page_size: int = REFERENCE_PAGE_SIZE):
+        self.tracker = tracker
+        self.queues = REFERENCE_QUEUES if queues is None else queues
+        self.page_size = page_size
+        self._tables: Dict[str, _ReferenceTable] = {}
+        # Records put during a queue's load, by queue and key
+        self._puts_during_load: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Record for an issue key ("WH-3"), or None if the queue has no such issue
+        """
+        table = self._table(queue_of(key))
+        return table.by_key.get(key) if table is not None else None
+
+    def find(self, queue: str, name: str) -> Optional[Dict]:
+        """
+        Record whose name (or synonym, short name, INN) matches, or None
+        """
+        table = self._table(queue)
+        if table is None:
+            return None
+        key = table.by_name.get(normalize_name(name))
+        return table.by_key.get(key) if key else None
+
+    def name_of(self, key: str, default: str = '') -> str:
+        """
+        Display name for an issue key, e.g. to label a warehouse or company on a screen
+        """
+        record = self.get(key)
+        if record is None:
+            return default
+        custom_fields = record['customFields']
+        return (custom_fields.get('name') or custom_fields.get('shortName') or custom_fields.get('fullName')
+                or record.get('summary') or default)
+
+    def all(self, queue: str) -> List[Dict]:
+        """
+        Every record of a queue, ordered by key
+        """
+        table = self._table(queue)
+        if table is None:
+            return []
+        return sorted(table.by_key.values(), key=lambda record: _key_order(record['key']))
+
+    def record(self, issue: Dict) -> Dict:
+        """
+        The issue reduced to the record shape lookups return; other queues' issues are returned as they are
+        """
+        queue = queue_of(issue['key']) if issue.get('key') else None
+        if queue not in self.queues:
+            return issue
+        return _record(issue, self.queues[queue][0])
+
+    def load_all(self) -> Dict[str, int]:
+        """
+        Load every reference queue; returns the record count per queue
+        Queues that fail to load are logged and left as they were.
+        """
+        counts = {}
+        for queue in self.queues:
+            try:
+                counts[queue] = self.reload(queue)
+            except Exception as e:
+                logger.error(f"Could not load reference queue {queue}: {e}")
+        return counts
+
+    def reload(self, queue: str) -> int:
+        """
+        Fetch a queue from Tracker and swap it in; returns the number of records
+        """
+        with self._load_lock:
+            return self._load(queue)
+
+    def put(self, issue: Dict):
+        """
+        Apply a created or updated issue without waiting for the next reload
+        Not kept for queues that are neither loaded nor loading, since their first load will include it.
+        """
+        key = issue.get('key')
+        queue = queue_of(key) if key else None
+        if queue not in self.queues:
+            return
+        fields, name_fields = self.queues[queue]
+        record = _record(issue, fields)
+        with self._lock:
+            pending = self._puts_during_load.get(queue)
+            if pending is not None:
+                pending[key] = record
+            table = self._tables.get(queue)
+            if table is not None:
+                _replace(table, record, name_fields)
+
+    def start_background_refresh(self, interval: float = REFERENCE_REFRESH_INTERVAL):
+        """
+        Reload every reference queue on a daemon thread every interval seconds
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.wait(interval):
+                self.load_all()
+
+        self._thread = threading.Thread(target=run, name="reference-data-refresh", daemon=True)
+        self._thread.start()
+
+    def stop_background_refresh(self):
+        """
+        Stop the background refresh thread
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per loaded queue: record count, last load time and duration, approximate memory size
+        """
+        with self._lock:
+            tables = dict(self._tables)
+        return {
+            queue: {
+                'records': len(table.by_key),
+                'loaded_at': table.loaded_at,
+                'load_seconds': table.load_seconds,
+                'size_bytes': deep_sizeof(table.by_key) + deep_sizeof(table.by_name)
+            }
+            for queue, table in tables.items()
+        }
+
+    def _table(self, queue: str) -> Optional[_ReferenceTable]:
+        if queue not in self.queues:
+            return None
+        table = self._tables.get(queue)
+        if table is None:
+            with self._load_lock:
+                # Another thread may have loaded the queue while this one waited
+                if queue not in self._tables:
+                    self._load(queue)
+            table = self._tables.get(queue)
+        return table
+
+    def _load(self, queue: str) -> int:
+        fields, name_fields = self.queues[queue]
+        started = time.perf_counter()
+        table = _ReferenceTable()
+        query = f'Queue: {queue} "Sort By": Key ASC'
+        search_fields = ["key", "summary", "updated"] + [f"customFields.{name}" for name in fields]
+        with self._lock:
+            self._puts_during_load[queue] = {}
+        try:
+            for issue in self.tracker.iter_issues(query, fields=search_fields, per_page=self.page_size):
+                _index(table, _record(issue, fields), name_fields)
+        except BaseException:
+            with self._lock:
+                self._puts_during_load.pop(queue, None)
+            raise
+        table.loaded_at = time.time()
+        table.load_seconds = time.perf_counter() - started
+        with self._lock:
+            # The snapshot may predate writes made while it was being read
+            for key, record in self._puts_during_load.pop(queue).items():
+                loaded = table.by_key.get(key)
+                if loaded is None or (loaded.get('updated') or '') <= (record.get('updated') or ''):
+                    _replace(table, record, name_fields)
+            self._tables[queue] = table
+        logger.info(f"Loaded {len(table.by_key)} {queue} records in {table.load_seconds:.2f} s")
+        return len(table.by_key)
+
+def _record(issue: Dict, fields: Iterable[str]) -> Dict:
+    custom_fields = issue.get('customFields') or {}
+    return {
+        'key': issue.get('key'),
+        'summary': issue.get('summary', ''),
+        'updated': issue.get('updated'),
+        'customFields': {name: custom_fields[name] for name in fields if name in custom_fields}
+    }
+
+
+def _names(record: Dict, name_fields: Iterable[str]) -> List[str]:
+    names = []
+    for field in name_fields:
+        value = record['customFields'].get(field)
+        for name in (value if isinstance(value, list) else [value]):
+            if name:
+                names.append(normalize_name(name))
+    return names
+
+
+def _index(table: _ReferenceTable, record: Dict, name_fields: Iterable[str]):
+    table.by_key[record['key']] = record
+    for name in _names(record, name_fields):
+        # The first record keeps an ambiguous name, so lookups do not flip between reloads
+        table.by_name.setdefault(name, record['key'])
+
+
+def _replace(table: _ReferenceTable, record: Dict, name_fields: Iterable[str]):
+    key = record['key']
+    previous = table.by_key.get(key)
+    if previous is not None:
+        for name in _names(previous, name_fields):
+            if table.by_name.get(name) == key:
+                del table.by_name[name]
+    _index(table, record, name_fields)
+
+
+def _key_order(key: str) -> Tuple[str, int]:
+    queue, _, number = key.rpartition('-')
+    return queue, int(number) if number.isdigit() else 0
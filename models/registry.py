@@ -0,0 +1,144 @@
+"""
+Process-wide registry for the tracker client and managers
+Instances are created lazily on first use and then shared by all handlers
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from models.tracker_integration import (
+    YandexTrackerClient,
+    EmployeeManager,
+    CompanyManager,
+    CityManager,
+    WarehouseManager,
+    ShiftManager,
+    RequestManager
+)
+from models.employee_index import EmployeeIndex
+from models.local_mirror import LocalMirror, LOCAL_MIRROR
+from models.reference_data import ReferenceData
+from models.write_journal import WriteJournal, WRITE_BEHIND
+
+_instances: Dict[str, Any] = {}
+# Re-entrant so that factories can pull their own dependencies from the registry
+_lock = threading.RLock()
+
+
+def get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    """
+    Return the instance registered under name, building it with factory on first use
+    """
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = factory()
+                _instances[name] = instance
+    return instance
+
+
+def reset_registry():
+    """
+    Forget all registered instances (used by tests and after configuration changes)
+    """
+    with _lock:
+        _instances.clear()
+
+
+def get_tracker_client() -> YandexTrackerClient:
+    """
+    Get the shared Yandex Tracker client
+    """
+    return get_or_create('tracker_client', YandexTrackerClient)
+
+
+def get_write_journal() -> Optional[WriteJournal]:
+    """
+    Get the shared write-behind journal, or None when WRITE_BEHIND is off
+    The flusher starts with the journal, so every entry point that hands out journal-backed
+    managers also sends their writes (and replays the ones a previous run left unsent).
+    """
+    if not WRITE_BEHIND:
+        return None
+    return get_or_create('write_journal', _start_write_journal)
+
+
+def _start_write_journal() -> WriteJournal:
+    journal = WriteJournal(get_tracker_client())
+    journal.start_background_flush()
+    return journal
+
+
+def get_employee_manager() -> EmployeeManager:
+    """
+    Get the shared employee manager
+    """
+    return get_or_create('employee_manager', lambda: EmployeeManager(get_tracker_client(), journal=get_write_journal(),
+                                                                     mirror=get_local_mirror()))
+
+
+def get_local_mirror() -> Optional[LocalMirror]:
+    """
+    Get the shared local mirror of the Tracker queues, or None when LOCAL_MIRROR is off
+    """
+    if not LOCAL_MIRROR:
+        return None
+    return get_or_create('local_mirror', lambda: LocalMirror(get_tracker_client()))
+
+
+def get_reference_data() -> ReferenceData:
+    """
+    Get the shared city, warehouse and company reference data
+    """
+    return get_or_create('reference_data', lambda: ReferenceData(get_tracker_client()))
+
+
+def get_company_manager() -> CompanyManager:
+    """
+    Get the shared company manager
+    """
+    return get_or_create('company_manager', lambda: CompanyManager(get_tracker_client(), get_reference_data()))
+
+
+def get_city_manager() -> CityManager:
+    """
+    Get the shared city manager
+    """
+    return get_or_create('city_manager', lambda: CityManager(get_tracker_client(), get_reference_data()))
+
+
+def get_warehouse_manager() -> WarehouseManager:
+    """
+    Get the shared warehouse manager
+    """
+    return get_or_create('warehouse_manager', lambda: WarehouseManager(get_tracker_client(), get_reference_data()))
+
+
+def get_shift_manager() -> ShiftManager:
+    """
+    Get the shared shift manager
+    """
+    return get_or_create('shift_manager', lambda: ShiftManager(get_tracker_client(), journal=get_write_journal()))
+
+
+def get_request_manager() -> RequestManager:
+    """
+    Get the shared request manager
+    """
+    return get_or_create('request_manager', lambda: RequestManager(get_tracker_client(), journal=get_write_journal()))
+
+
+def _build_employee_index() -> EmployeeIndex:
+    index = EmployeeIndex(get_tracker_client())
+    # Local edits reach the index immediately instead of at the next sync
+    get_employee_manager().add_update_listener(index.on_employee_updated)
+    return index
+
+
+def get_employee_index() -> EmployeeIndex:
+    """
+    Get the shared Telegram ID -> employee index
+    """
+    return get_or_create('employee_index', _build_employee_index)
@@ -0,0 +1,204 @@
+"""
+Rate limiting, retries and circuit breaking for Yandex Tracker API calls
+One limiter and one breaker are shared per process, since the API quota is per organization
+"""
+
+import os
+import random
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Requests per second allowed by the organization's API quota (0 disables the limiter)
+RATE_LIMIT = float(os.getenv('YT_RATE_LIMIT', '20'))
+RATE_BURST = float(os.getenv('YT_RATE_BURST', '0')) or max(1.0, RATE_LIMIT)
+MAX_RETRIES = int(os.getenv('YT_MAX_RETRIES', '3'))
+BACKOFF_BASE = float(os.getenv('YT_BACKOFF_BASE', '0.5'))
+BACKOFF_CAP = float(os.getenv('YT_BACKOFF_CAP', '8'))
+BREAKER_THRESHOLD = int(os.getenv('YT_BREAKER_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT = float(os.getenv('YT_BREAKER_RESET_TIMEOUT', '30'))
+
+
+class TrackerUnavailableError(requests.RequestException):
+    """
+    Raised when Yandex Tracker is considered down (circuit open) or keeps throttling us
+    """
+
+
+class IssueConflictError(requests.HTTPError):
+    """
+    Raised when a versioned update is refused (409) because the issue changed since it was read
+    """
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """
+    Exponential backoff with full jitter for the given retry attempt (0-based)
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket limiter: rate tokens per second, up to capacity saved for bursts
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT, capacity: float = RATE_BURST,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available; otherwise return how long to wait before retrying
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """
+        Block until a token is available
+        """
+        while True:
+            delay = self.try_acquire()
+            if delay <= 0:
+                return
+            self.waited += delay
+            self._sleep(delay)
+
+    def pause(self, seconds: float):
+        """
+        Hand out no tokens for the given time (used to honour Retry-After)
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self._tokens = 0
+
+
+class CircuitBreaker:
+    """
+    Opens after threshold consecutive failures and lets one trial call through after reset_timeout
+    A trial whose outcome is never recorded (cancelled, or failed in a way the caller does not
+    report) expires after another reset_timeout, so the breaker cannot stay half-open for good
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Whether a call may be attempted now
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN and (
+                    not self._trial_in_flight or self._clock() - self._trial_started >= self.reset_timeout):
+                self._trial_in_flight = True
+                self._trial_started = self._clock()
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Yandex Tracker circuit opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+
+
+_shared_rate_limiter: Optional[TokenBucket] = None
+_shared_circuit_breaker: Optional[CircuitBreaker] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_rate_limiter() -> TokenBucket:
+    """
+    Get the process-wide tracker rate limiter
+    """
+    global _shared_rate_limiter
+    with _shared_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = TokenBucket()
+        return _shared_rate_limiter
+
+
+def get_shared_circuit_breaker() -> CircuitBreaker:
+    """
+    Get the process-wide tracker circuit breaker
+    """
+    global _shared_circuit_breaker
+    with _shared_lock:
+        if _shared_circuit_breaker is None:
+            _shared_circuit_breaker = CircuitBreaker()
+        return _shared_circuit_breaker
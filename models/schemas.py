@@ -0,0 +1,204 @@
+"""
+Declarative schemas for the issues each manager stores in Tracker
+A schema lists the entity's snake_case data keys, the customFields they live in and their
+defaults once; at import time it is compiled into plain functions that build issues, patches
+and the reverse (customFields -> data) mapping without looping over the field list
+"""
+
+from string import Formatter
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+
+class Field:
+    """
+    One entity attribute: data key, Tracker custom field and the value used when creating
+    """
+
+    __slots__ = ('name', 'tracker_name', 'default')
+
+    def __init__(self, name: str, tracker_name: str, default: Any = ''):
+        self.name = name
+        self.tracker_name = tracker_name
+        self.default = default
+
+    @property
+    def empty(self) -> Any:
+        """
+        Value shown when the issue has no value for the field ('', 0 or [])
+        """
+        return type(self.default)()
+
+
+def _compile(name: str, source: str) -> Callable:
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, f"<schema {name}>", "exec"), namespace)
+    return namespace[name]
+
+
+def _template_expression(template: str) -> str:
+    """
+    f-string source for a template like "Сотрудник: {first_name} {last_name}" over data keys
+    """
+    parts = []
+    for literal, key, _, _ in Formatter().parse(template):
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if key is not None:
+            parts.append(f"{{data.get({key!r}, '')}}")
+    return 'f' + repr(''.join(parts))
+
+
+class Schema:
+    """
+    Mapping between an entity's data dict and a Tracker issue in one queue
+
+    build_issue(data)       full issue for creation; missing keys get the field defaults
+    to_fields(data)         customFields for the keys present in data (a patch)
+    from_fields(fields)     data dict from customFields; missing fields are empty
+    summary(data)           the issue summary for data
+    reader(names)           a from_fields limited to some data keys, for code that shows a few
+    """
+
+    def __init__(self, queue: str, summary: str, description: str, fields: Iterable[Field]):
+        self.queue = queue
+        self.fields: Tuple[Field, ...] = tuple(fields)
+        self.tracker_names: Dict[str, str] = {field.name: field.tracker_name for field in self.fields}
+        self._fields_by_name: Dict[str, Field] = {field.name: field for field in self.fields}
+        self.summary_template = summary
+        self.description_template = description
+        self.summary: Callable[[Dict], str] = _compile(
+            'summary', f"def summary(data):\n    return {_template_expression(summary)}\n")
+        self.build_issue: Callable[[Dict], Dict] = _compile('build_issue', self._build_issue_source())
+        self.to_fields: Callable[[Dict], Dict] = _compile('to_fields', self._to_fields_source())
+        self.from_fields: Callable[[Dict], Dict] = _compile('from_fields', self._from_fields_source(self.fields))
+
+    def reader(self, names: Iterable[str]) -> Callable[[Dict], Dict]:
+        """
+        Compile a from_fields that builds only the given data keys
+        """
+        return _compile('from_fields', self._from_fields_source(self._fields_by_name[name] for name in names))
+
+    def _build_issue_source(self) -> str:
+        # repr() of a list default is a literal, so every call gets a fresh list
+        entries = ''.join(f"            {field.tracker_name!r}: data.get({field.name!r}, {field.default!r}),\n"
+                          for field in self.fields)
+        return (
+            "def build_issue(data):\n"
+            "    return {\n"
+            f"        'queue': {self.queue!r},\n"
+            f"        'summary': {_template_expression(self.summary_template)},\n"
+            f"        'description': {_template_expression(self.description_template)},\n"
+            "        'type': 'task',\n"
+            "        'customFields': {\n"
+            f"{entries}"
+            "        }\n"
+            "    }\n"
+        )
+
+    def _to_fields_source(self) -> str:
+        lines = ''.join(f"    if {field.name!r} in data:\n"
+                        f"        fields[{field.tracker_name!r}] = data[{field.name!r}]\n"
+                        for field in self.fields)
+        return f"def to_fields(data):\n    fields = {{}}\n{lines}    return fields\n"
+
+    @staticmethod
+    def _from_fields_source(fields: Iterable[Field]) -> str:
+        entries = ''.join(f"        {field.name!r}: fields.get({field.tracker_name!r}, {field.empty!r}),\n"
+                          for field in fields)
+        return f"def from_fields(fields):\n    return {{\n{entries}    }}\n"
+
+
+EMPLOYEE_SCHEMA = Schema('EMP', "Сотрудник: {first_name} {last_name}", "Карточка сотрудника", [
+    Field('last_name', 'lastName'),
+    Field('first_name', 'firstName'),
+    Field('middle_name', 'middleName'),
+    Field('birth_date', 'birthDate'),
+    Field('phone', 'phone'),
+    Field('telegram', 'telegram'),
+    Field('company', 'company'),
+    Field('objects', 'objects', []),
+    Field('work_email', 'workEmail'),
+    Field('passport_series', 'passportSeries'),
+    Field('passport_number', 'passportNumber'),
+    Field('passport_division', 'passportDivision'),
+    Field('passport_issue_date', 'passportIssueDate'),
+    Field('passport_issued_by', 'passportIssuedBy'),
+    Field('birth_city', 'birthCity'),
+    Field('registration_address', 'registrationAddress'),
+    Field('registration_date', 'registrationDate'),
+    Field('education', 'education'),
+    Field('bank', 'bank'),
+    Field('account_number', 'accountNumber'),
+    Field('bic', 'bic'),
+    Field('corr_account', 'corrAccount'),
+    Field('bank_inn', 'bankInn'),
+    Field('role', 'role', 'employee'),
+    Field('status', 'status', 'active')
+])
+
+COMPANY_SCHEMA = Schema('COMP', "Компания: {full_name}", "Карточка компании", [
+    Field('director_fio', 'directorFio'),
+    Field('full_name', 'fullName'),
+    Field('short_name', 'shortName'),
+    Field('inn', 'inn'),
+    Field('actual_address', 'actualAddress'),
+    Field('legal_address', 'legalAddress'),
+    Field('ogrnip', 'ogrnip'),
+    Field('ogrn', 'ogrn'),
+    Field('okpo', 'okpo'),
+    Field('bank', 'bank'),
+    Field('bik', 'bik'),
+    Field('corr_account', 'corrAccount'),
+    Field('account', 'account'),
+    Field('email', 'email'),
+    Field('phone', 'phone'),
+    Field('okved', 'okved'),
+    Field('tax_system', 'taxSystem')
+])
+
+CITY_SCHEMA = Schema('CITY', "Город: {name}", "Карточка города", [
+    Field('name', 'name')
+])
+
+WAREHOUSE_SCHEMA = Schema('WH', "Склад: {name}", "Карточка склада", [
+    Field('name', 'name'),
+    Field('synonyms', 'synonyms', []),
+    Field('partner_chat_id', 'partnerChatId'),
+    Field('partner_chat_link', 'partnerChatLink'),
+    Field('warehouse_chat_id', 'warehouseChatId'),
+    Field('warehouse_chat_link', 'warehouseChatLink'),
+    Field('legal_entity', 'legalEntity'),
+    Field('area', 'area'),
+    Field('self_operated', 'selfOperated'),
+    Field('opening_date', 'openingDate'),
+    Field('closing_date', 'closingDate'),
+    Field('status', 'status'),
+    Field('tg_cs', 'tgCs'),
+    Field('phone', 'phone'),
+    Field('work_account', 'workAccount')
+])
+
+SHIFT_SCHEMA = Schema('SHIFT', "Смена: {date} - {employee_name}", "Карточка смены", [
+    Field('date', 'date'),
+    Field('employee', 'employee'),
+    Field('employee_name', 'employeeName'),
+    Field('start_time', 'startTime'),
+    Field('end_time', 'endTime'),
+    Field('vest_number', 'vestNumber'),
+    Field('overtime', 'overtime'),
+    Field('non_profile_hours', 'nonProfileHours'),
+    Field('equipment_taken', 'equipmentTaken', []),
+    Field('equipment_returned', 'equipmentReturned', []),
+    Field('status', 'status', 'planned')
+])
+
+# available_slots is set from required_employees by RequestManager.create_request
+REQUEST_SCHEMA = Schema('REQ', "Заявка: {title}", "{description}", [
+    Field('title', 'title'),
+    Field('requester', 'requester'),
+    Field('requester_name', 'requesterName'),
+    Field('object', 'object'),
+    Field('required_employees', 'requiredEmployees', 0),
+    Field('available_slots', 'availableSlots', 0),
+    Field('applied_employees', 'appliedEmployees', []),
+    Field('status', 'status', 'open')
+])
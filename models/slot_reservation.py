@@ -0,0 +1,149 @@
+"""
+Slot reservation on requests (REQ queue) that is safe under concurrent submitters
+Submissions for one request are serialized within the process, and every write is a
+versioned update, so a write based on a stale read is refused by Tracker and retried
+"""
+
+import os
+import threading
+import time
+import logging
+import weakref
+from typing import Callable, Dict, Optional, Tuple
+
+from models.resilience import IssueConflictError, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+SLOT_RESERVATION_RETRIES = int(os.getenv('YT_SLOT_RESERVATION_RETRIES', '5'))
+SLOT_RETRY_BASE = float(os.getenv('YT_SLOT_RETRY_BASE', '0.05'))
+SLOT_RETRY_CAP = 1.0
+
+
+class NoSlotsAvailableError(Exception):
+    """
+    Raised when a request has no free slots left
+    """
+
+    def __init__(self, request_id: str):
+        super().__init__(f"No available slots in {request_id}")
+        self.request_id = request_id
+
+
+class UnversionedRequestError(Exception):
+    """
+    Raised when Tracker returns a request without a version, so it cannot be updated safely
+    """
+
+    def __init__(self, request_id: str):
+        super().__init__(f"{request_id} has no version; refusing an unconditional update")
+        self.request_id = request_id
+
+
+class SlotReservation:
+    """
+    Adds employees to requests without losing updates or overbooking
+
+    Each reservation, and each direct change of the slot count, reads the request bypassing the
+    issue cache and writes appliedEmployees and availableSlots with the version it read. A 409
+    from Tracker means another process wrote in between; the write is then recomputed from a
+    fresh read and tried again, up to max_retries times.
+    """
+
+    def __init__(self, tracker, max_retries: int = SLOT_RESERVATION_RETRIES,
+                 retry_base: float = SLOT_RETRY_BASE):
+        self.tracker = tracker
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        # One lock per request being reserved; dropped once no thread holds a reference
+        self._locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+        self._locks_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.reserved = 0
+        self.conflicts = 0
+        self.full = 0
+
+    def reserve(self, request_id: str, employee_id: str) -> Dict:
+        """
+        Put employee_id on the request and take one slot; returns the updated request
+        Does nothing if the employee is already on it. Raises NoSlotsAvailableError when the
+        request is full, IssueConflictError if conflicts persist after max_retries retries, and
+        UnversionedRequestError rather than ever writing without a version.
+        """
+        def take_slot(custom_fields: Dict) -> Optional[Dict]:
+            applied = list(custom_fields.get('appliedEmployees') or [])
+            if employee_id in applied:
+                return None
+            # An unset field comes back as None
+            slots = custom_fields.get('availableSlots') or 0
+            if slots <= 0:
+                with self._stats_lock:
+                    self.full += 1
+                raise NoSlotsAvailableError(request_id)
+            return {"appliedEmployees": applied + [employee_id], "availableSlots": slots - 1}
+
+        result, written = self._update(request_id, take_slot)
+        if written:
+            with self._stats_lock:
+                self.reserved += 1
+        return result
+
+    def set_slots(self, request_id: str, slots: int) -> Dict:
+        """
+        Set the request's available slots through the same lock and versioned update as reserve()
+        Returns the updated request, or the current one if it already has that many slots.
+        """
+        def put_slots(custom_fields: Dict) -> Optional[Dict]:
+            if custom_fields.get('availableSlots') == slots:
+                return None
+            return {"availableSlots": slots}
+
+        return self._update(request_id, put_slots)[0]
+
+    def _update(self, request_id: str, change: Callable[[Dict], Optional[Dict]]) -> Tuple[Dict, bool]:
+        """
+        Read the request, apply change(custom_fields) with the version read, and retry on conflicts
+        change returns the custom fields to write, or None to leave the request alone.
+        Returns (request, whether it was written).
+        """
+        lock = self._lock_for(request_id)
+        with lock:
+            attempt = 0
+            while True:
+                request = self.tracker.get_issue(request_id, cached=False)
+                custom_fields = change(request.get('customFields', {}))
+                if custom_fields is None:
+                    return request, False
+
+                version = request.get('version')
+                if version is None:
+                    raise UnversionedRequestError(request_id)
+                try:
+                    result = self.tracker.update_issue(request_id, {"customFields": custom_fields}, version=version)
+                except IssueConflictError:
+                    with self._stats_lock:
+                        self.conflicts += 1
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = backoff_delay(attempt, base=self.retry_base, cap=SLOT_RETRY_CAP)
+                    logger.info(f"{request_id} changed while updating its slots, retrying in {delay:.2f}s")
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                return result, True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Reservations made, conflicts retried and submissions refused for lack of slots
+        """
+        with self._stats_lock:
+            return {'reserved': self.reserved, 'conflicts': self.conflicts, 'full': self.full}
+
+    def _lock_for(self, request_id: str) -> threading.Lock:
+        with self._locks_lock:
+            lock = self._locks.get(request_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[request_id] = lock
+            return lock
+
@@ -3,17 +3,115 @@ Module for Yandex Tracker integration
 This module handles all interactions with Yandex Tracker API
 """
 
+import os
 import requests
 import json
-from typing import Dict, List, Optional
+import logging
+import threading
+import time
+import weakref
+from calendar import monthrange
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from config.settings import YT_ORG_ID, YT_TOKEN, YT_PROJECT_ID
+from models.http_pool import get_shared_session, default_timeout, connection_stats, WARM_UP_CONNECTIONS
+from models.issue_cache import IssueCache, get_shared_issue_cache
+from models.reference_data import REFERENCE_QUEUES
+from models.slot_reservation import SlotReservation
+from models.write_journal import merge_patch
+from models.schemas import (
+    EMPLOYEE_SCHEMA, COMPANY_SCHEMA, CITY_SCHEMA, WAREHOUSE_SCHEMA, SHIFT_SCHEMA, REQUEST_SCHEMA
+)
+from models.resilience import (
+    TokenBucket, CircuitBreaker, TrackerUnavailableError, IssueConflictError, MAX_RETRIES,
+    backoff_delay, parse_retry_after, get_shared_rate_limiter, get_shared_circuit_breaker
+)
+
+logger = logging.getLogger(__name__)
+
+# Default page size for streamed searches; Tracker caps a scroll page at 1000 issues
+SEARCH_PAGE_SIZE = int(os.getenv('YT_SEARCH_PAGE_SIZE', '100'))
+SCROLL_TTL_MILLIS = int(os.getenv('YT_SCROLL_TTL_MILLIS', '60000'))
+DEFAULT_SEARCH_FIELDS = ["key", "summary", "description", "status", "assignee", "created", "updated"]
+# Methods that can be repeated safely after a timeout or 5xx; PATCH only ever sets field values
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "PUT", "PATCH", "DELETE"])
+# Parallel requests used by bulk operations; keep below YT_POOL_SIZE so connections are reused
+BULK_MAX_WORKERS = int(os.getenv('YT_BULK_MAX_WORKERS', '8'))
+
+
+_MISSING = object()
+
+
+def _is_unset(value) -> bool:
+    # Tracker omits unset fields or returns null; writing '' or [] there changes nothing
+    return value is _MISSING or value is None or value == '' or value == []
+
+
+def changed_fields(current: Dict, fields: Dict) -> Dict:
+    """
+    The entries of fields whose value differs from current
+    Only "unset" values are treated as equal to each other: a missing field, None, '' and [].
+    0 and False are real values, so setting them on an unset field is a change.
+    """
+    changed = {}
+    for name, value in fields.items():
+        current_value = current.get(name, _MISSING)
+        if _is_unset(current_value) and _is_unset(value):
+            continue
+        if current_value != value:
+            changed[name] = value
+    return changed
+
+
+def current_issue(tracker: "YandexTrackerClient", writer, issue_key: str) -> Dict:
+    """
+    The issue as it will be once writes still waiting in a write-behind journal reach Tracker
+    Read through the issue cache.
+    """
+    issue = tracker.get_issue(issue_key)
+    if writer is not tracker:
+        patch = writer.pending_patch(issue_key)
+        if patch:
+            issue = merge_patch(issue, patch)
+    return issue
+
+
+def query_value(value) -> str:
+    """
+    Quote a value for the Tracker query language, escaping backslashes and double quotes
+    """
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def projection(custom_fields: Iterable[str] = (), fields: Iterable[str] = ("key", "updated")) -> List[str]:
+    """
+    Build a search field list: plain issue fields plus selected custom fields
+    Custom fields are addressed as "customFields.<name>"
+    """
+    return list(fields) + [f"customFields.{name}" for name in custom_fields]
+
+
+# Projections for list screens: exactly the custom fields the format_*_info helpers render
+EMPLOYEE_LIST_FIELDS = projection(["lastName", "firstName", "middleName", "birthDate", "phone",
+                                   "telegram", "company", "role", "status"])
+COMPANY_LIST_FIELDS = projection(["fullName", "shortName", "inn", "actualAddress", "legalAddress", "directorFio"])
+SHIFT_LIST_FIELDS = projection(["date", "employeeName", "startTime", "endTime", "vestNumber", "status"])
+REQUEST_LIST_FIELDS = projection(["title", "object", "requiredEmployees", "availableSlots",
+                                  "appliedEmployees", "status"])
 
 class YandexTrackerClient:
     """
     Client for interacting with Yandex Tracker API
+    All clients share one pooled keep-alive session unless another one is passed in
     """
     
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 max_retries: int = MAX_RETRIES,
+                 issue_cache: Optional[IssueCache] = None):
         if not YT_ORG_ID or not YT_TOKEN:
             raise ValueError("YT_ORG_ID and YT_TOKEN must be set in environment variables")
         
@@ -26,335 +124,746 @@ class YandexTrackerClient:
             "X-Org-ID": self.org_id,
             "Content-Type": "application/json"
         }
+        self.session = session or get_shared_session()
+        self.timeout = default_timeout()
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.circuit_breaker = circuit_breaker or get_shared_circuit_breaker()
+        self.max_retries = max_retries
+        self.issue_cache = issue_cache or get_shared_issue_cache()
+        self.retries = 0
+        self.bytes_received = 0
+        self.responses_received = 0
+        self.writes = 0
+        self.write_bytes = 0
+        self._write_latencies = deque(maxlen=1000)
+        self._stats_lock = threading.Lock()
+        self._meters = threading.local()
+    
+    def _request(self, method: str, path: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Send a request over the pooled session and raise on HTTP errors
+        Every attempt waits for the rate limiter. A 429 is always retried after Retry-After,
+        since Tracker did not process the request. Timeouts, connection errors and 5xx
+        responses are retried with jittered backoff only for idempotent calls.
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        url = f"{self.base_url}{path}"
+        extra_headers = kwargs.pop("headers", None)
+        headers = {**self.headers, **extra_headers} if extra_headers else self.headers
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow():
+                raise TrackerUnavailableError("Yandex Tracker circuit is open")
+            self.rate_limiter.acquire()
+            
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.circuit_breaker.record_failure()
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"{method} {path} failed ({e}), retrying in {delay:.2f}s")
+            except requests.RequestException:
+                self.circuit_breaker.record_failure()
+                raise
+            else:
+                if response.status_code == 429:
+                    # Tracker is up but throttling: slow down every caller, not just this one
+                    self.circuit_breaker.record_success()
+                    delay = self._retry_delay(response, attempt)
+                    self.rate_limiter.pause(delay)
+                    if attempt >= self.max_retries:
+                        raise TrackerUnavailableError(f"Yandex Tracker is throttling {method} {path}", response=response)
+                    delay = 0
+                elif response.status_code >= 500:
+                    self.circuit_breaker.record_failure()
+                    if not idempotent or attempt >= self.max_retries:
+                        response.raise_for_status()
+                    delay = self._retry_delay(response, attempt)
+                    logger.warning(f"{method} {path} returned {response.status_code}, retrying in {delay:.2f}s")
+                else:
+                    self.circuit_breaker.record_success()
+                    response.raise_for_status()
+                    self._record_payload(len(response.content))
+                    return response
+            
+            attempt += 1
+            self.retries += 1
+            if delay:
+                time.sleep(delay)
+    
+    @staticmethod
+    def _retry_delay(response: requests.Response, attempt: int) -> float:
+        """
+        Delay before the next attempt: Retry-After when the server sent one, jittered backoff otherwise
+        """
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        return retry_after if retry_after is not None else backoff_delay(attempt)
+    
+    def _record_payload(self, size: int):
+        """
+        Add a response body size to the totals and to any open payload meters on this thread
+        """
+        with self._stats_lock:
+            self.bytes_received += size
+            self.responses_received += 1
+        for meter in getattr(self._meters, 'active', ()):
+            meter['requests'] += 1
+            meter['bytes'] += size
+    
+    @contextmanager
+    def payload_meter(self):
+        """
+        Measure the tracker traffic of one screen:
+            with client.payload_meter() as meter:
+                render_screen()
+            meter['requests'], meter['bytes']
+        """
+        meter = {'requests': 0, 'bytes': 0}
+        if not hasattr(self._meters, 'active'):
+            self._meters.active = []
+        self._meters.active.append(meter)
+        try:
+            yield meter
+        finally:
+            self._meters.active.remove(meter)
+    
+    def warm_up(self, connections: int = WARM_UP_CONNECTIONS) -> int:
+        """
+        Open keep-alive connections ahead of the first real request
+        Returns the number of connections that were established successfully
+        """
+        def ping(_):
+            try:
+                self._request("GET", "/myself")
+                return True
+            except requests.RequestException as e:
+                logger.warning(f"Tracker warm-up request failed: {e}")
+                return False
+        
+        # Concurrent requests force the pool to hold several live connections
+        with ThreadPoolExecutor(max_workers=max(1, connections)) as executor:
+            results = list(executor.map(ping, range(max(1, connections))))
+        return sum(results)
+    
+    def connection_stats(self) -> Dict[str, float]:
+        """
+        Connection reuse statistics for this client's session
+        """
+        return connection_stats(self.session)
     
     def create_issue(self, issue_data: Dict) -> Dict:
         """
         Create a new issue in Yandex Tracker
         """
-        url = f"{self.base_url}/issues"
-        response = requests.post(url, headers=self.headers, json=issue_data)
-        response.raise_for_status()
-        return response.json()
+        with self._write_timer(issue_data):
+            return self._request("POST", "/issues", json=issue_data).json()
     
-    def get_issue(self, issue_key: str) -> Dict:
+    @contextmanager
+    def _write_timer(self, issue_data: Dict):
+        """
+        Count a write's request body size and, if it succeeds, its latency
+        """
+        size = len(json.dumps(issue_data, ensure_ascii=False).encode())
+        started = time.perf_counter()
+        yield
+        with self._stats_lock:
+            self.writes += 1
+            self.write_bytes += size
+            self._write_latencies.append(time.perf_counter() - started)
+    
+    def write_stats(self) -> Dict[str, float]:
+        """
+        Issue creates and updates sent: count, mean payload size and latency percentiles
+        """
+        with self._stats_lock:
+            latencies = sorted(self._write_latencies)
+            return {
+                'writes': self.writes,
+                'write_bytes': self.write_bytes,
+                'mean_write_bytes': self.write_bytes / self.writes if self.writes else 0.0,
+                'write_latency_p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+                'write_latency_p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+            }
+    
+    def get_issue(self, issue_key: str, cached: bool = True) -> Dict:
         """
         Get issue by key from Yandex Tracker
+        Served from the issue cache while fresh. A stale entry is revalidated with If-None-Match
+        when Tracker sent an ETag, otherwise by comparing its updated timestamp through a
+        key+updated search, and only downloaded again if it changed. cached=False always reads Tracker.
+        """
+        path = f"/issues/{issue_key}"
+        entry = self.issue_cache.lookup(issue_key) if cached else None
+        if entry is not None:
+            if self.issue_cache.is_fresh(entry):
+                return entry.issue()
+            if entry.etag:
+                response = self._request("GET", path, headers={"If-None-Match": entry.etag})
+                if response.status_code == 304:
+                    self.issue_cache.refresh(issue_key)
+                    return entry.issue()
+                return self._cache_issue(issue_key, response)
+            if entry.updated and self._current_updated(issue_key) == entry.updated:
+                self.issue_cache.refresh(issue_key)
+                return entry.issue()
+        return self._cache_issue(issue_key, self._request("GET", path))
+    
+    def _cache_issue(self, issue_key: str, response: requests.Response) -> Dict:
+        """
+        Store a full issue response in the issue cache and return the issue
         """
-        url = f"{self.base_url}/issues/{issue_key}"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
+        self.issue_cache.put(issue_key, response.content, response.headers.get("ETag"))
         return response.json()
     
-    def update_issue(self, issue_key: str, issue_data: Dict) -> Dict:
+    def _current_updated(self, issue_key: str) -> Optional[str]:
         """
-        Update an existing issue in Yandex Tracker
+        The issue's updated timestamp, fetched without the rest of the issue
         """
-        url = f"{self.base_url}/issues/{issue_key}"
-        response = requests.patch(url, headers=self.headers, json=issue_data)
-        response.raise_for_status()
-        return response.json()
+        issues = self._search(f"Key: {issue_key}", projection(), {}).json()
+        return issues[0].get("updated") if issues else None
     
-    def search_issues(self, query: str) -> List[Dict]:
+    def update_issue(self, issue_key: str, issue_data: Dict, version: Optional[int] = None) -> Dict:
+        """
+        Update an existing issue in Yandex Tracker
+        With version, Tracker applies the update only if the issue is still at that version and
+        IssueConflictError is raised otherwise. The response is the updated issue, which replaces
+        any cached copy.
+        """
+        self.issue_cache.invalidate(issue_key)
+        params = {"version": version} if version is not None else None
+        try:
+            with self._write_timer(issue_data):
+                response = self._request("PATCH", f"/issues/{issue_key}", json=issue_data, params=params)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 409:
+                raise IssueConflictError(f"{issue_key} changed since version {version}", response=e.response) from e
+            raise
+        return self._cache_issue(issue_key, response)
+    
+    def search_issues(self, query: str, fields: Optional[List[str]] = None,
+                      page: Optional[int] = None, per_page: Optional[int] = None) -> List[Dict]:
         """
         Search issues in Yandex Tracker
+        fields is the projection to return (see projection()); custom fields are only
+        included when selected. Pass page/per_page to fetch a single page of a larger result set
+        """
+        params = {}
+        if page is not None:
+            params["page"] = page
+        if per_page is not None:
+            params["perPage"] = per_page
+        return self._search(query, fields, params).json()
+    
+    def iter_issues(self, query: str, fields: Optional[List[str]] = None,
+                    per_page: int = SEARCH_PAGE_SIZE, limit: Optional[int] = None,
+                    scroll: bool = True) -> Iterator[Dict]:
+        """
+        Stream search results page by page, holding only one page in memory
+        Uses Tracker scrolling by default and plain page numbers with scroll=False.
+        Stops after limit issues, or whenever the caller stops iterating.
+        """
+        if limit is not None and limit <= 0:
+            return
+        yielded = 0
+        if scroll:
+            pages = self._iter_scroll_pages(query, fields, per_page)
+        else:
+            pages = self._iter_numbered_pages(query, fields, per_page)
+        
+        for issues in pages:
+            for issue in issues:
+                yield issue
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+    
+    def _search(self, query: str, fields: Optional[List[str]], params: Dict) -> requests.Response:
+        """
+        POST one search request and return the raw response (headers carry paging cursors)
         """
-        url = f"{self.base_url}/issues/_search"
         search_data = {
             "query": query,
-            "fields": ["key", "summary", "description", "status", "assignee", "created", "updated"]
+            "fields": fields or DEFAULT_SEARCH_FIELDS
         }
-        response = requests.post(url, headers=self.headers, json=search_data)
-        response.raise_for_status()
-        return response.json()
+        # Searching is read-only, so it is safe to retry despite being a POST
+        return self._request("POST", "/issues/_search", idempotent=True, json=search_data, params=params or None)
+    
+    def _iter_scroll_pages(self, query: str, fields: Optional[List[str]], per_page: int) -> Iterator[List[Dict]]:
+        """
+        Follow X-Scroll-Id / X-Scroll-Token cursors until the result set is exhausted
+        """
+        params = {
+            # Sorted scrolling is slower, so only ask for it when the query orders results
+            "scrollType": "sorted" if "Sort By" in query else "unsorted",
+            "perScroll": per_page,
+            "scrollTTLMillis": SCROLL_TTL_MILLIS
+        }
+        while True:
+            response = self._search(query, fields, params)
+            issues = response.json()
+            if not issues:
+                return
+            yield issues
+            scroll_id = response.headers.get("X-Scroll-Id")
+            if not scroll_id or len(issues) < per_page:
+                return
+            params = {"scrollId": scroll_id, "scrollTTLMillis": SCROLL_TTL_MILLIS}
+            scroll_token = response.headers.get("X-Scroll-Token")
+            if scroll_token:
+                params["scrollToken"] = scroll_token
+    
+    def _iter_numbered_pages(self, query: str, fields: Optional[List[str]], per_page: int) -> Iterator[List[Dict]]:
+        """
+        Walk page=1..N, using X-Total-Pages when Tracker reports it
+        """
+        page = 1
+        while True:
+            response = self._search(query, fields, {"page": page, "perPage": per_page})
+            issues = response.json()
+            if not issues:
+                return
+            yield issues
+            total_pages = response.headers.get("X-Total-Pages")
+            if len(issues) < per_page or (total_pages and page >= int(total_pages)):
+                return
+            page += 1
+    
+    def create_issues_bulk(self, issues: List[Dict], max_workers: int = BULK_MAX_WORKERS) -> List[Dict]:
+        """
+        Create many issues with bounded parallelism (Tracker has no bulk-create endpoint)
+        Returns one {'index', 'ok', 'result' | 'error'} entry per input, in input order
+        """
+        return self._run_bulk(self.create_issue, [(issue_data,) for issue_data in issues], max_workers)
+    
+    def update_issues_bulk(self, updates: List[Tuple[str, Dict]], max_workers: int = BULK_MAX_WORKERS) -> List[Dict]:
+        """
+        Apply a different patch to each issue with bounded parallelism
+        updates is a list of (issue_key, issue_data); results are reported per item, in input order
+        """
+        results = self._run_bulk(self.update_issue, updates, max_workers)
+        for (issue_key, _), result in zip(updates, results):
+            result['key'] = issue_key
+        return results
+    
+    def bulk_change(self, issue_keys: List[str], values: Dict) -> Dict:
+        """
+        Apply the same field values to many issues with one call to Tracker's bulk-change endpoint
+        Tracker runs the operation asynchronously; the response describes the bulk operation
+        """
+        bulk_data = {"issues": list(issue_keys), "values": values}
+        result = self._request("POST", "/bulkchange/_update", json=bulk_data).json()
+        for issue_key in issue_keys:
+            self.issue_cache.invalidate(issue_key)
+        return result
+    
+    def _run_bulk(self, call: Callable[..., Dict], arguments: List[Tuple], max_workers: int) -> List[Dict]:
+        """
+        Run call(*args) for each argument tuple on a bounded thread pool, capturing per-item failures
+        """
+        def run(item: Tuple[int, Tuple]) -> Dict[str, Any]:
+            index, args = item
+            try:
+                return {'index': index, 'ok': True, 'result': call(*args)}
+            except Exception as e:
+                logger.warning(f"Bulk item {index} failed: {e}")
+                return {'index': index, 'ok': False, 'error': str(e)}
+        
+        if not arguments:
+            return []
+        workers = max(1, min(max_workers, len(arguments)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tracker-bulk") as executor:
+            return list(executor.map(run, enumerate(arguments)))
     
     def add_comment(self, issue_key: str, comment: str) -> Dict:
         """
         Add a comment to an issue
         """
-        url = f"{self.base_url}/issues/{issue_key}/comments"
         comment_data = {"text": comment}
-        response = requests.post(url, headers=self.headers, json=comment_data)
-        response.raise_for_status()
-        return response.json()
+        result = self._request("POST", f"/issues/{issue_key}/comments", json=comment_data).json()
+        # Commenting bumps the issue's updated timestamp
+        self.issue_cache.invalidate(issue_key)
+        return result
 
 
 class EmployeeManager:
     """
     Manager for employee-related operations using Yandex Tracker
+    Single updates go through journal, when given, and return its acknowledgement; reads include
+    journaled updates not yet sent. Searches are answered by mirror, when given, once it has
+    synced the EMP queue
     """
     
-    def __init__(self):
-        self.tracker = YandexTrackerClient()
+    # Fields the role cache and the Telegram ID index depend on
+    LISTENED_FIELDS = frozenset(['telegram', 'role', 'status'])
+    
+    def __init__(self, tracker: Optional[YandexTrackerClient] = None, journal=None, mirror=None):
+        self.tracker = tracker or YandexTrackerClient()
+        self.writer = journal or self.tracker
+        self.mirror = mirror
+        self._update_listeners = []
+    
+    def add_update_listener(self, listener: Callable[[str, Dict], None]):
+        """
+        Register a callback invoked as listener(employee_id, employee_data) after an update
+        Bound methods are held weakly so short-lived owners do not leak
+        """
+        if hasattr(listener, '__self__'):
+            self._update_listeners.append(weakref.WeakMethod(listener))
+        else:
+            self._update_listeners.append(lambda: listener)
+    
+    def _notify_updated(self, employee_id: str, employee_data: Dict):
+        """
+        Call the registered update listeners, dropping ones whose owner is gone
+        """
+        alive = []
+        for ref in self._update_listeners:
+            listener = ref()
+            if listener is None:
+                continue
+            alive.append(ref)
+            try:
+                listener(employee_id, employee_data)
+            except Exception as e:
+                logger.error(f"Employee update listener failed: {e}")
+        self._update_listeners = alive
     
     def create_employee(self, employee_data: Dict) -> Dict:
         """
         Create a new employee in Yandex Tracker
         """
-        issue_data = {
-            "queue": "EMP",  # Employee queue
-            "summary": f"Сотрудник: {employee_data.get('first_name', '')} {employee_data.get('last_name', '')}",
-            "description": "Карточка сотрудника",
-            "type": "task",
-            "customFields": {
-                # Map employee data to custom fields in tracker
-                "lastName": employee_data.get('last_name', ''),
-                "firstName": employee_data.get('first_name', ''),
-                "middleName": employee_data.get('middle_name', ''),
-                "birthDate": employee_data.get('birth_date', ''),
-                "phone": employee_data.get('phone', ''),
-                "telegram": employee_data.get('telegram', ''),
-                "company": employee_data.get('company', ''),
-                "objects": employee_data.get('objects', []),
-                "workEmail": employee_data.get('work_email', ''),
-                "passportSeries": employee_data.get('passport_series', ''),
-                "passportNumber": employee_data.get('passport_number', ''),
-                "passportDivision": employee_data.get('passport_division', ''),
-                "passportIssueDate": employee_data.get('passport_issue_date', ''),
-                "passportIssuedBy": employee_data.get('passport_issued_by', ''),
-                "birthCity": employee_data.get('birth_city', ''),
-                "registrationAddress": employee_data.get('registration_address', ''),
-                "registrationDate": employee_data.get('registration_date', ''),
-                "education": employee_data.get('education', ''),
-                "bank": employee_data.get('bank', ''),
-                "accountNumber": employee_data.get('account_number', ''),
-                "bic": employee_data.get('bic', ''),
-                "corrAccount": employee_data.get('corr_account', ''),
-                "bankInn": employee_data.get('bank_inn', ''),
-                "role": employee_data.get('role', 'employee'),
-                "status": employee_data.get('status', 'active')
-            }
-        }
-        return self.tracker.create_issue(issue_data)
+        return self.writer.create_issue(self._build_create_data(employee_data))
+    
+    def create_employees_bulk(self, employees: List[Dict], max_workers: int = BULK_MAX_WORKERS) -> List[Dict]:
+        """
+        Create many employees (e.g. an import) with per-item success/failure results
+        """
+        issues = [self._build_create_data(employee_data) for employee_data in employees]
+        return self.tracker.create_issues_bulk(issues, max_workers=max_workers)
+    
+    def _build_create_data(self, employee_data: Dict) -> Dict:
+        """
+        Map employee data to a new EMP issue
+        """
+        return EMPLOYEE_SCHEMA.build_issue(employee_data)
     
     def get_employee(self, employee_id: str) -> Dict:
         """
-        Get employee by ID from Yandex Tracker
+        Get employee by ID from Yandex Tracker, with journaled updates applied
         """
-        return self.tracker.get_issue(employee_id)
+        return current_issue(self.tracker, self.writer, employee_id)
+    
+    def search_employees(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Find employees by part of their name, phone, Telegram handle or company name
+        Without a synced mirror only names in the summary are searched, through Tracker.
+        """
+        if self.mirror is not None and self.mirror.ready(EMPLOYEE_SCHEMA.queue):
+            return self.mirror.search_employees(query, limit=limit)
+        return list(self.tracker.iter_issues(f'Queue: EMP Summary: {query_value(query)}',
+                                             fields=EMPLOYEE_LIST_FIELDS, limit=limit))
+    
+    def iter_company_employees(self, company: str, per_page: int = SEARCH_PAGE_SIZE,
+                               fields: Optional[List[str]] = None) -> Iterator[Dict]:
+        """
+        Stream all employees of a company without loading the whole list
+        Rows carry the custom fields format_employee_info needs unless another projection is given
+        """
+        query = f'Queue: EMP company: "{company}" "Sort By": Key ASC'
+        return self.tracker.iter_issues(query, fields=fields or EMPLOYEE_LIST_FIELDS, per_page=per_page)
     
     def update_employee(self, employee_id: str, employee_data: Dict) -> Dict:
         """
         Update employee data in Yandex Tracker
+        Only fields that differ from the current issue are sent; keys missing from employee_data
+        are left as they are. Returns the current issue without writing if nothing changed.
+        """
+        current = current_issue(self.tracker, self.writer, employee_id)
+        issue_data = self._build_update_data(employee_data, current)
+        if not issue_data:
+            return current
+        result = self.writer.update_issue(employee_id, issue_data)
+        self._notify_changes(employee_id, employee_data, issue_data)
+        return result
+    
+    def update_employees_bulk(self, updates: Dict[str, Dict], max_workers: int = BULK_MAX_WORKERS) -> List[Dict]:
         """
-        issue_data = {
-            "summary": f"Сотрудник: {employee_data.get('first_name', '')} {employee_data.get('last_name', '')}",
-            "customFields": {
-                "lastName": employee_data.get('last_name', ''),
-                "firstName": employee_data.get('first_name', ''),
-                "middleName": employee_data.get('middle_name', ''),
-                "birthDate": employee_data.get('birth_date', ''),
-                "phone": employee_data.get('phone', ''),
-                "telegram": employee_data.get('telegram', ''),
-                "company": employee_data.get('company', ''),
-                "objects": employee_data.get('objects', []),
-                "workEmail": employee_data.get('work_email', ''),
-                "passportSeries": employee_data.get('passport_series', ''),
-                "passportNumber": employee_data.get('passport_number', ''),
-                "passportDivision": employee_data.get('passport_division', ''),
-                "passportIssueDate": employee_data.get('passport_issue_date', ''),
-                "passportIssuedBy": employee_data.get('passport_issued_by', ''),
-                "birthCity": employee_data.get('birth_city', ''),
-                "registrationAddress": employee_data.get('registration_address', ''),
-                "registrationDate": employee_data.get('registration_date', ''),
-                "education": employee_data.get('education', ''),
-                "bank": employee_data.get('bank', ''),
-                "accountNumber": employee_data.get('account_number', ''),
-                "bic": employee_data.get('bic', ''),
-                "corrAccount": employee_data.get('corr_account', ''),
-                "bankInn": employee_data.get('bank_inn', ''),
-                "role": employee_data.get('role', 'employee'),
-                "status": employee_data.get('status', 'active')
-            }
-        }
-        return self.tracker.update_issue(employee_id, issue_data)
+        Update many employees at once; updates maps employee ID to employee data
+        Each patch is diffed against the current issue like update_employee; employees with
+        nothing to change are not written and report the current issue. Returns per-item
+        results in input order; listeners are notified for the updates that succeeded.
+        """
+        employee_ids = list(updates)
+        workers = max(1, min(max_workers, len(employee_ids)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tracker-bulk") as executor:
+            currents = list(executor.map(self._current_or_none, employee_ids))
+        
+        results: List[Optional[Dict]] = [None] * len(employee_ids)
+        patches, positions = [], []
+        for index, (employee_id, current) in enumerate(zip(employee_ids, currents)):
+            issue_data = self._build_update_data(updates[employee_id], current)
+            if issue_data:
+                patches.append((employee_id, issue_data))
+                positions.append(index)
+            else:
+                results[index] = {'index': index, 'ok': True, 'result': current, 'key': employee_id}
+        
+        for position, (employee_id, issue_data), result in zip(
+                positions, patches, self.tracker.update_issues_bulk(patches, max_workers=max_workers)):
+            results[position] = {**result, 'index': position}
+            if result['ok']:
+                self._notify_changes(employee_id, updates[employee_id], issue_data)
+        return results
+    
+    def _current_or_none(self, employee_id: str) -> Optional[Dict]:
+        """
+        Current issue to diff a bulk update against; None (send every given field) if it cannot be read
+        """
+        try:
+            return current_issue(self.tracker, self.writer, employee_id)
+        except Exception as e:
+            logger.warning(f"Could not read {employee_id} before a bulk update, sending the full patch: {e}")
+            return None
+    
+    def _notify_changes(self, employee_id: str, employee_data: Dict, issue_data: Dict):
+        """
+        Notify listeners if the patch touched a field they depend on
+        """
+        sent = issue_data.get('customFields', {})
+        changed = {name: employee_data[name] for name in self.LISTENED_FIELDS
+                   if EMPLOYEE_SCHEMA.tracker_names[name] in sent}
+        if changed:
+            self._notify_updated(employee_id, changed)
+    
+    def _build_update_data(self, employee_data: Dict, current: Optional[Dict] = None) -> Dict:
+        """
+        Map employee data to an EMP issue patch holding only the given keys
+        With the current issue, fields that already have the given value are left out as well.
+        """
+        current_fields = (current or {}).get('customFields', {})
+        custom_fields = EMPLOYEE_SCHEMA.to_fields(employee_data)
+        if current is not None:
+            custom_fields = changed_fields(current_fields, custom_fields)
+        issue_data = {}
+        if custom_fields:
+            issue_data["customFields"] = custom_fields
+        # The summary shows the name, so it follows a name change
+        names = {**current_fields, **custom_fields}
+        if ('firstName' in custom_fields or 'lastName' in custom_fields) and 'firstName' in names and 'lastName' in names:
+            issue_data["summary"] = EMPLOYEE_SCHEMA.summary(EMPLOYEE_SCHEMA.from_fields(names))
+        return issue_data
+
 
+class ReferenceManager:
+    """
+    Base for the city, warehouse and company managers
+    Reads by key or name are answered from reference_data, when given, and reach Tracker only
+    on a miss; created, updated and fetched issues are applied to it so lookups see them at once.
 
-class CompanyManager:
+    Return shape: with reference_data, get_* and find_* return reference records - key,
+    summary, updated and the schema's custom fields (plus a company's status) - not the full
+    issue, whether the record came from memory or from Tracker. Without it get_* return the
+    full issue as before. Creates and updates always return Tracker's full answer.
+    """
+    
+    schema = None
+    
+    def __init__(self, tracker: Optional[YandexTrackerClient] = None, reference_data=None):
+        self.tracker = tracker or YandexTrackerClient()
+        self.reference_data = reference_data
+    
+    def _remember(self, issue: Dict) -> Dict:
+        if self.reference_data is not None:
+            self.reference_data.put(issue)
+        return issue
+    
+    def _as_record(self, issue: Dict) -> Dict:
+        if self.reference_data is None:
+            return issue
+        return self.reference_data.record(self._remember(issue))
+    
+    def _get(self, key: str) -> Dict:
+        if self.reference_data is not None:
+            record = self.reference_data.get(key)
+            if record is not None:
+                return record
+        return self._as_record(self.tracker.get_issue(key))
+    
+    def _find(self, name: str) -> Optional[Dict]:
+        queue = self.schema.queue
+        if self.reference_data is not None:
+            record = self.reference_data.find(queue, name)
+            if record is not None:
+                return record
+        conditions = ' OR '.join(f'{field}: {query_value(name)}' for field in REFERENCE_QUEUES[queue][1])
+        fields = projection(REFERENCE_QUEUES[queue][0], ("key", "summary", "updated"))
+        for issue in self.tracker.iter_issues(f'Queue: {queue} ({conditions})', fields=fields, limit=1):
+            return self._as_record(issue)
+        return None
+
+
+class CompanyManager(ReferenceManager):
     """
     Manager for company-related operations using Yandex Tracker
     """
     
-    def __init__(self):
-        self.tracker = YandexTrackerClient()
+    schema = COMPANY_SCHEMA
     
     def create_company(self, company_data: Dict) -> Dict:
         """
         Create a new company in Yandex Tracker
         """
-        issue_data = {
-            "queue": "COMP",  # Company queue
-            "summary": f"Компания: {company_data.get('full_name', '')}",
-            "description": "Карточка компании",
-            "type": "task",
-            "customFields": {
-                "directorFio": company_data.get('director_fio', ''),
-                "fullName": company_data.get('full_name', ''),
-                "shortName": company_data.get('short_name', ''),
-                "inn": company_data.get('inn', ''),
-                "actualAddress": company_data.get('actual_address', ''),
-                "legalAddress": company_data.get('legal_address', ''),
-                "ogrnip": company_data.get('ogrnip', ''),
-                "ogrn": company_data.get('ogrn', ''),
-                "okpo": company_data.get('okpo', ''),
-                "bank": company_data.get('bank', ''),
-                "bik": company_data.get('bik', ''),
-                "corrAccount": company_data.get('corr_account', ''),
-                "account": company_data.get('account', ''),
-                "email": company_data.get('email', ''),
-                "phone": company_data.get('phone', ''),
-                "okved": company_data.get('okved', ''),
-                "taxSystem": company_data.get('tax_system', '')
-            }
-        }
-        return self.tracker.create_issue(issue_data)
+        return self._remember(self.tracker.create_issue(COMPANY_SCHEMA.build_issue(company_data)))
     
     def get_company(self, company_id: str) -> Dict:
         """
-        Get company by ID from Yandex Tracker
+        Get company by ID, from reference data when it has it (as a reference record, see ReferenceManager)
+        """
+        return self._get(company_id)
+    
+    def find_company(self, name: str) -> Optional[Dict]:
+        """
+        Company by full or short name or INN, or None
+        """
+        return self._find(name)
+    
+    def iter_companies(self, per_page: int = SEARCH_PAGE_SIZE, fields: Optional[List[str]] = None) -> Iterator[Dict]:
+        """
+        Stream all companies
+        Rows carry the custom fields format_company_info needs unless another projection is given
         """
-        return self.tracker.get_issue(company_id)
+        query = 'Queue: COMP "Sort By": Key ASC'
+        return self.tracker.iter_issues(query, fields=fields or COMPANY_LIST_FIELDS, per_page=per_page)
     
     def update_company(self, company_id: str, company_data: Dict) -> Dict:
         """
         Update company data in Yandex Tracker
-        """
-        issue_data = {
-            "summary": f"Компания: {company_data.get('full_name', '')}",
-            "customFields": {
-                "directorFio": company_data.get('director_fio', ''),
-                "fullName": company_data.get('full_name', ''),
-                "shortName": company_data.get('short_name', ''),
-                "inn": company_data.get('inn', ''),
-                "actualAddress": company_data.get('actual_address', ''),
-                "legalAddress": company_data.get('legal_address', ''),
-                "ogrnip": company_data.get('ogrnip', ''),
-                "ogrn": company_data.get('ogrn', ''),
-                "okpo": company_data.get('okpo', ''),
-                "bank": company_data.get('bank', ''),
-                "bik": company_data.get('bik', ''),
-                "corrAccount": company_data.get('corr_account', ''),
-                "account": company_data.get('account', ''),
-                "email": company_data.get('email', ''),
-                "phone": company_data.get('phone', ''),
-                "okved": company_data.get('okved', ''),
-                "taxSystem": company_data.get('tax_system', '')
-            }
-        }
-        return self.tracker.update_issue(company_id, issue_data)
+        Only fields that differ from the current issue are sent; keys missing from company_data
+        are left as they are. Returns the current issue without writing if nothing changed.
+        """
+        current = self.tracker.get_issue(company_id)
+        custom_fields = changed_fields(current.get('customFields', {}), COMPANY_SCHEMA.to_fields(company_data))
+        if not custom_fields:
+            return current
+        issue_data = {"customFields": custom_fields}
+        if 'fullName' in custom_fields:
+            issue_data["summary"] = COMPANY_SCHEMA.summary(company_data)
+        return self._remember(self.tracker.update_issue(company_id, issue_data))
 
 
-class CityManager:
+class CityManager(ReferenceManager):
     """
     Manager for city-related operations using Yandex Tracker
     """
     
-    def __init__(self):
-        self.tracker = YandexTrackerClient()
+    schema = CITY_SCHEMA
     
     def create_city(self, city_data: Dict) -> Dict:
         """
         Create a new city in Yandex Tracker
         """
-        issue_data = {
-            "queue": "CITY",  # City queue
-            "summary": f"Город: {city_data.get('name', '')}",
-            "description": "Карточка города",
-            "type": "task",
-            "customFields": {
-                "name": city_data.get('name', '')
-            }
-        }
-        return self.tracker.create_issue(issue_data)
+        return self._remember(self.tracker.create_issue(CITY_SCHEMA.build_issue(city_data)))
     
     def get_city(self, city_id: str) -> Dict:
         """
-        Get city by ID from Yandex Tracker
+        Get city by ID, from reference data when it has it (as a reference record, see ReferenceManager)
         """
-        return self.tracker.get_issue(city_id)
+        return self._get(city_id)
+    
+    def find_city(self, name: str) -> Optional[Dict]:
+        """
+        City by name, or None
+        """
+        return self._find(name)
 
 
-class WarehouseManager:
+class WarehouseManager(ReferenceManager):
     """
     Manager for warehouse-related operations using Yandex Tracker
     """
     
-    def __init__(self):
-        self.tracker = YandexTrackerClient()
+    schema = WAREHOUSE_SCHEMA
     
     def create_warehouse(self, warehouse_data: Dict) -> Dict:
         """
         Create a new warehouse in Yandex Tracker
         """
-        issue_data = {
-            "queue": "WH",  # Warehouse queue
-            "summary": f"Склад: {warehouse_data.get('name', '')}",
-            "description": "Карточка склада",
-            "type": "task",
-            "customFields": {
-                "name": warehouse_data.get('name', ''),
-                "synonyms": warehouse_data.get('synonyms', []),
-                "partnerChatId": warehouse_data.get('partner_chat_id', ''),
-                "partnerChatLink": warehouse_data.get('partner_chat_link', ''),
-                "warehouseChatId": warehouse_data.get('warehouse_chat_id', ''),
-                "warehouseChatLink": warehouse_data.get('warehouse_chat_link', ''),
-                "legalEntity": warehouse_data.get('legal_entity', ''),
-                "area": warehouse_data.get('area', ''),
-                "selfOperated": warehouse_data.get('self_operated', ''),
-                "openingDate": warehouse_data.get('opening_date', ''),
-                "closingDate": warehouse_data.get('closing_date', ''),
-                "status": warehouse_data.get('status', ''),
-                "tgCs": warehouse_data.get('tg_cs', ''),
-                "phone": warehouse_data.get('phone', ''),
-                "workAccount": warehouse_data.get('work_account', '')
-            }
-        }
-        return self.tracker.create_issue(issue_data)
+        return self._remember(self.tracker.create_issue(WAREHOUSE_SCHEMA.build_issue(warehouse_data)))
     
     def get_warehouse(self, warehouse_id: str) -> Dict:
         """
-        Get warehouse by ID from Yandex Tracker
+        Get warehouse by ID, from reference data when it has it (as a reference record, see ReferenceManager)
         """
-        return self.tracker.get_issue(warehouse_id)
+        return self._get(warehouse_id)
+    
+    def find_warehouse(self, name: str) -> Optional[Dict]:
+        """
+        Warehouse by name or synonym, or None
+        """
+        return self._find(name)
 
 
 class ShiftManager:
     """
     Manager for shift-related operations using Yandex Tracker
+    Single updates go through journal, when given, and return its acknowledgement; reads include
+    journaled updates not yet sent
     """
     
-    def __init__(self):
-        self.tracker = YandexTrackerClient()
+    def __init__(self, tracker: Optional[YandexTrackerClient] = None, journal=None):
+        self.tracker = tracker or YandexTrackerClient()
+        self.writer = journal or self.tracker
     
     def create_shift(self, shift_data: Dict) -> Dict:
         """
         Create a new shift in Yandex Tracker
         """
-        issue_data = {
-            "queue": "SHIFT",  # Shift queue
-            "summary": f"Смена: {shift_data.get('date', '')} - {shift_data.get('employee_name', '')}",
-            "description": "Карточка смены",
-            "type": "task",
-            "customFields": {
-                "date": shift_data.get('date', ''),
-                "employee": shift_data.get('employee', ''),
-                "employeeName": shift_data.get('employee_name', ''),
-                "startTime": shift_data.get('start_time', ''),
-                "endTime": shift_data.get('end_time', ''),
-                "vestNumber": shift_data.get('vest_number', ''),
-                "overtime": shift_data.get('overtime', ''),
-                "nonProfileHours": shift_data.get('non_profile_hours', ''),
-                "equipmentTaken": shift_data.get('equipment_taken', []),
-                "equipmentReturned": shift_data.get('equipment_returned', []),
-                "status": shift_data.get('status', 'planned')
-            }
-        }
-        return self.tracker.create_issue(issue_data)
+        return self.writer.create_issue(self._build_create_data(shift_data))
+    
+    def update_shift(self, shift_id: str, shift_data: Dict) -> Dict:
+        """
+        Set the given shift fields (start/end time, vest number, overtime, ...), leaving the rest as they are
+        """
+        return self.writer.update_issue(shift_id, {"customFields": SHIFT_SCHEMA.to_fields(shift_data)})
+    
+    def create_shifts_bulk(self, shifts: List[Dict], max_workers: int = BULK_MAX_WORKERS) -> List[Dict]:
+        """
+        Create a whole schedule of shifts with per-item success/failure results
+        """
+        issues = [self._build_create_data(shift_data) for shift_data in shifts]
+        return self.tracker.create_issues_bulk(issues, max_workers=max_workers)
+    
+    def set_shifts_status_bulk(self, shift_ids: List[str], status: str) -> Dict:
+        """
+        Set the same status on many shifts through Tracker's bulk-change endpoint
+        """
+        return self.tracker.bulk_change(shift_ids, {"customFields": {"status": status}})
+    
+    def _build_create_data(self, shift_data: Dict) -> Dict:
+        """
+        Map shift data to a new SHIFT issue
+        """
+        return SHIFT_SCHEMA.build_issue(shift_data)
     
     def get_shift(self, shift_id: str) -> Dict:
         """
-        Get shift by ID from Yandex Tracker
+        Get shift by ID from Yandex Tracker, with journaled updates applied
+        """
+        return current_issue(self.tracker, self.writer, shift_id)
+    
+    def iter_shifts_for_month(self, year: int, month: int, per_page: int = SEARCH_PAGE_SIZE,
+                              fields: Optional[List[str]] = None) -> Iterator[Dict]:
         """
-        return self.tracker.get_issue(shift_id)
+        Stream all shifts of a calendar month in date order
+        Rows carry the custom fields format_shift_info needs unless another projection is given
+        """
+        last_day = monthrange(year, month)[1]
+        query = (f'Queue: SHIFT date: "{year:04d}-{month:02d}-01".."{year:04d}-{month:02d}-{last_day:02d}" '
+                 f'"Sort By": date ASC')
+        return self.tracker.iter_issues(query, fields=fields or SHIFT_LIST_FIELDS, per_page=per_page)
 
 
 class RequestManager:
@@ -362,30 +871,22 @@ class RequestManager:
     Manager for request-related operations using Yandex Tracker
     """
     
-    def __init__(self):
-        self.tracker = YandexTrackerClient()
+    def __init__(self, tracker: Optional[YandexTrackerClient] = None,
+                 reservations: Optional[SlotReservation] = None, journal=None):
+        self.tracker = tracker or YandexTrackerClient()
+        self.reservations = reservations or SlotReservation(self.tracker)
+        # Nothing here is journaled: the journal writes creates through, and slot changes must see
+        # Tracker's answer to avoid overbooking
+        self.writer = journal or self.tracker
     
     def create_request(self, request_data: Dict) -> Dict:
         """
         Create a new request in Yandex Tracker
         """
-        issue_data = {
-            "queue": "REQ",  # Request queue
-            "summary": f"Заявка: {request_data.get('title', '')}",
-            "description": request_data.get('description', ''),
-            "type": "task",
-            "customFields": {
-                "title": request_data.get('title', ''),
-                "requester": request_data.get('requester', ''),
-                "requesterName": request_data.get('requester_name', ''),
-                "object": request_data.get('object', ''),
-                "requiredEmployees": request_data.get('required_employees', 0),
-                "availableSlots": request_data.get('required_employees', 0),  # Initially same as required
-                "appliedEmployees": request_data.get('applied_employees', []),
-                "status": request_data.get('status', 'open')
-            }
-        }
-        return self.tracker.create_issue(issue_data)
+        # Initially every required place is available
+        issue_data = REQUEST_SCHEMA.build_issue({**request_data,
+                                                 'available_slots': request_data.get('required_employees', 0)})
+        return self.writer.create_issue(issue_data)
     
     def get_request(self, request_id: str) -> Dict:
         """
@@ -393,35 +894,26 @@ class RequestManager:
         """
         return self.tracker.get_issue(request_id)
     
+    def iter_requests(self, status: str = 'open', per_page: int = SEARCH_PAGE_SIZE,
+                      fields: Optional[List[str]] = None) -> Iterator[Dict]:
+        """
+        Stream requests with the given status, newest first
+        Rows carry the custom fields format_request_info needs unless another projection is given
+        """
+        query = f'Queue: REQ status: "{status}" "Sort By": Created DESC'
+        return self.tracker.iter_issues(query, fields=fields or REQUEST_LIST_FIELDS, per_page=per_page)
+    
     def update_request_slots(self, request_id: str, slots: int) -> Dict:
         """
         Update available slots in a request
+        Versioned and serialized with reservations, so it cannot overwrite one made concurrently
         """
-        issue_data = {
-            "customFields": {
-                "availableSlots": slots
-            }
-        }
-        return self.tracker.update_issue(request_id, issue_data)
+        return self.reservations.set_slots(request_id, slots)
     
     def add_employee_to_request(self, request_id: str, employee_id: str) -> Dict:
         """
-        Add an employee to a request
+        Add an employee to a request, taking one of its available slots
+        Returns the updated request (unchanged if the employee was already on it).
+        Raises NoSlotsAvailableError when the request is full.
         """
-        # Get current request data
-        request = self.get_request(request_id)
-        current_applied = request.get('customFields', {}).get('appliedEmployees', [])
-        
-        # Add new employee if not already in the list
-        if employee_id not in current_applied:
-            current_applied.append(employee_id)
-            
-            issue_data = {
-                "customFields": {
-                    "appliedEmployees": current_applied,
-                    "availableSlots": max(0, request.get('customFields', {}).get('availableSlots', 0) - 1)
-                }
-            }
-            return self.tracker.update_issue(request_id, issue_data)
-        
-        return request
\ No newline at end of file
+        return self.reservations.reserve(request_id, employee_id)
@@ -0,0 +1,360 @@
+"""
+Write-behind journal for Tracker mutations
+Updates are appended to a local SQLite (WAL) journal and acknowledged at once; a background
+flusher sends them to Tracker in batches, and whatever was not sent before a crash or restart
+is replayed from the journal. Creates are written through, since callers need the new key.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from models.resilience import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Send Tracker writes through the journal instead of waiting for them
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', '0') == '1'
+WRITE_JOURNAL_PATH = os.getenv('WRITE_JOURNAL_PATH', 'write_journal.db')
+WRITE_JOURNAL_FLUSH_INTERVAL = float(os.getenv('WRITE_JOURNAL_FLUSH_INTERVAL', '1'))
+WRITE_JOURNAL_BATCH_SIZE = int(os.getenv('WRITE_JOURNAL_BATCH_SIZE', '50'))
+# Attempts per entry before it is parked as failed for an operator to look at
+WRITE_JOURNAL_MAX_ATTEMPTS = int(os.getenv('WRITE_JOURNAL_MAX_ATTEMPTS', '10'))
+WRITE_JOURNAL_WORKERS = int(os.getenv('WRITE_JOURNAL_WORKERS', '4'))
+
+PENDING = 'pending'
+SENDING = 'sending'
+FAILED = 'failed'
+
+
+def merge_patch(base: Dict, patch: Dict) -> Dict:
+    """
+    Apply a later issue patch on top of an earlier one; nested objects (customFields) are merged
+    """
+    merged = dict(base)
+    for name, value in patch.items():
+        if isinstance(value, dict) and isinstance(merged.get(name), dict):
+            merged[name] = merge_patch(merged[name], value)
+        else:
+            merged[name] = value
+    return merged
+
+
+class WriteJournal:
+    """
+    Durable queue of issue creates and updates in front of a YandexTrackerClient
+
+    create_issue() and update_issue() have the client's signatures. Creates go straight to
+    Tracker and return the created issue; updates return an acknowledgement
+    ({'pending': True, 'journal_id', ...}) as soon as the entry is committed, and reads that must
+    see them merge pending_patch() in. Successive updates of one issue that have not been sent
+    yet are coalesced into a single patch. Entries are sent at least once; patches are safe to
+    repeat, and create entries left by older journals carry a 'unique' value, so Tracker
+    refuses (409) one it has already applied.
+    """
+
+    def __init__(self, tracker, path: str = WRITE_JOURNAL_PATH,
+                 batch_size: int = WRITE_JOURNAL_BATCH_SIZE,
+                 max_attempts: int = WRITE_JOURNAL_MAX_ATTEMPTS,
+                 workers: int = WRITE_JOURNAL_WORKERS):
+        self.tracker = tracker
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.workers = workers
+        self._local = threading.local()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushed = 0
+        self.coalesced = 0
+        self.retried = 0
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, issue_key TEXT, "
+            "payload TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt REAL NOT NULL DEFAULT 0, created REAL NOT NULL, last_error TEXT)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS journal_status ON journal (status, id)")
+        connection.execute("CREATE INDEX IF NOT EXISTS journal_issue ON journal (issue_key, status)")
+        self._replay()
+
+    def create_issue(self, issue_data: Dict) -> Dict:
+        """
+        Create an issue in Tracker right away
+        Not journaled: an acknowledgement without the key would break callers that go on to use
+        the new issue, such as ending a shift that was just started
+        """
+        return self.tracker.create_issue(issue_data)
+
+    def update_issue(self, issue_key: str, issue_data: Dict) -> Dict:
+        """
+        Journal a patch of an existing issue, merging it into a not yet sent patch of the same issue
+        """
+        journal_id = self._append('update', issue_key, issue_data)
+        return {**issue_data, 'key': issue_key, 'pending': True, 'journal_id': journal_id}
+
+    def flush(self) -> int:
+        """
+        Send one batch of due entries to Tracker; returns the number sent successfully
+        """
+        with self._flush_lock:
+            entries = self._claim()
+            if not entries:
+                return 0
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(entries))),
+                                    thread_name_prefix="journal-flush") as executor:
+                errors = list(executor.map(self._send, entries))
+
+            connection = self._connection()
+            sent = 0
+            for (journal_id, op, issue_key, payload, attempts), error in zip(entries, errors):
+                if error is None:
+                    connection.execute("DELETE FROM journal WHERE id = ?", (journal_id,))
+                    sent += 1
+                else:
+                    self._retry_later(journal_id, issue_key, payload, attempts + 1, error)
+            self.flushed += sent
+            return sent
+
+    def flush_all(self) -> int:
+        """
+        Flush until no entry is due; returns the number sent
+        """
+        total = 0
+        while True:
+            sent = self.flush()
+            total += sent
+            if not sent:
+                return total
+
+    def start_background_flush(self, interval: float = WRITE_JOURNAL_FLUSH_INTERVAL):
+        """
+        Flush on a daemon thread every interval seconds, or sooner when entries are appended
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.is_set():
+                self._wake.wait(interval)
+                self._wake.clear()
+                try:
+                    # Keep draining while full batches go out
+                    while self.flush() >= self.batch_size:
+                        pass
+                except Exception as e:
+                    logger.error(f"Write journal flush failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="write-journal-flush", daemon=True)
+        self._thread.start()
+
+    def stop_background_flush(self):
+        """
+        Stop the flusher thread; unsent entries stay in the journal for the next start
+        """
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def pending_patch(self, issue_key: str) -> Dict:
+        """
+        Unsent and in-flight patches of an issue merged in order; empty if there are none
+        """
+        rows = self._connection().execute(
+            "SELECT payload FROM journal WHERE op = 'update' AND issue_key = ? AND status IN (?, ?) ORDER BY id",
+            (issue_key, PENDING, SENDING)
+        ).fetchall()
+        patch = {}
+        for (payload,) in rows:
+            patch = merge_patch(patch, json.loads(payload))
+        return patch
+
+    def failed_entries(self) -> List[Dict]:
+        """
+        Entries that ran out of attempts, oldest first
+        """
+        rows = self._connection().execute(
+            "SELECT id, op, issue_key, payload, attempts, last_error FROM journal "
+            "WHERE status = ? ORDER BY id", (FAILED,)
+        ).fetchall()
+        return [{'journal_id': row[0], 'op': row[1], 'key': row[2], 'payload': json.loads(row[3]),
+                 'attempts': row[4], 'error': row[5]} for row in rows]
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Backlog by status, age of the oldest unsent entry and flush counters
+        """
+        connection = self._connection()
+        counts = dict(connection.execute("SELECT status, COUNT(*) FROM journal GROUP BY status").fetchall())
+        oldest = connection.execute(
+            "SELECT MIN(created) FROM journal WHERE status != ?", (FAILED,)
+        ).fetchone()[0]
+        return {
+            'pending': counts.get(PENDING, 0),
+            'sending': counts.get(SENDING, 0),
+            'failed': counts.get(FAILED, 0),
+            'oldest_pending_s': time.time() - oldest if oldest else 0.0,
+            'flushed': self.flushed,
+            'coalesced': self.coalesced,
+            'retried': self.retried
+        }
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _append(self, op: str, issue_key: Optional[str], payload: Dict) -> int:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = None
+            if op == 'update':
+                row = connection.execute(
+                    "SELECT id, payload FROM journal WHERE op = 'update' AND issue_key = ? AND status = ?",
+                    (issue_key, PENDING)
+                ).fetchone()
+            if row is not None:
+                journal_id = row[0]
+                merged = merge_patch(json.loads(row[1]), payload)
+                connection.execute("UPDATE journal SET payload = ? WHERE id = ?",
+                                   (json.dumps(merged, ensure_ascii=False), journal_id))
+                self.coalesced += 1
+            else:
+                cursor = connection.execute(
+                    "INSERT INTO journal (op, issue_key, payload, status, created) VALUES (?, ?, ?, ?, ?)",
+                    (op, issue_key, json.dumps(payload, ensure_ascii=False), PENDING, time.time())
+                )
+                journal_id = cursor.lastrowid
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._wake.set()
+        return journal_id
+
+    def _claim(self) -> List[Tuple[int, str, Optional[str], Dict, int]]:
+        """
+        Mark the oldest due entries as being sent and return them
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT id, op, issue_key, payload, attempts FROM journal "
+                "WHERE status = ? AND next_attempt <= ? ORDER BY id LIMIT ?",
+                (PENDING, time.time(), self.batch_size)
+            ).fetchall()
+            connection.executemany("UPDATE journal SET status = ? WHERE id = ?", [(SENDING, row[0]) for row in rows])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return [(row[0], row[1], row[2], json.loads(row[3]), row[4]) for row in rows]
+
+    def _send(self, entry: Tuple[int, str, Optional[str], Dict, int]) -> Optional[str]:
+        """
+        Apply one entry to Tracker; returns None on success or the error text
+        """
+        journal_id, op, issue_key, payload, _ = entry
+        try:
+            if op == 'create':
+                self.tracker.create_issue(payload)
+            else:
+                self.tracker.update_issue(issue_key, payload)
+            return None
+        except requests.HTTPError as e:
+            if op == 'create' and e.response is not None and e.response.status_code == 409:
+                # Same 'unique' value: created by an attempt whose answer was lost
+                return None
+            return str(e)
+        except Exception as e:
+            return str(e)
+
+    def _retry_later(self, journal_id: int, issue_key: Optional[str], payload: Dict, attempts: int, error: str):
+        """
+        Put a failed entry back, folding in patches of the same issue appended while it was in flight
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if issue_key is not None:
+                payload = self._absorb_later_patches(connection, journal_id, issue_key, payload)
+            if attempts >= self.max_attempts:
+                status, next_attempt = FAILED, 0
+                logger.error(f"Journal entry {journal_id} ({issue_key or 'create'}) failed {attempts} times, "
+                             f"giving up: {error}")
+            else:
+                status, next_attempt = PENDING, time.time() + backoff_delay(attempts - 1)
+                logger.warning(f"Journal entry {journal_id} ({issue_key or 'create'}) failed: {error}")
+            connection.execute(
+                "UPDATE journal SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, payload = ? "
+                "WHERE id = ?",
+                (status, attempts, next_attempt, error, json.dumps(payload, ensure_ascii=False), journal_id)
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self.retried += 1
+
+    def _absorb_later_patches(self, connection: sqlite3.Connection, journal_id: int, issue_key: str,
+                              payload: Dict) -> Dict:
+        # Keeps one unsent patch per issue, so later patches can never overtake earlier ones
+        rows = connection.execute(
+            "SELECT id, payload FROM journal WHERE op = 'update' AND issue_key = ? AND status = ? AND id > ? "
+            "ORDER BY id", (issue_key, PENDING, journal_id)
+        ).fetchall()
+        for row_id, later in rows:
+            payload = merge_patch(payload, json.loads(later))
+            connection.execute("DELETE FROM journal WHERE id = ?", (row_id,))
+        return payload
+
+    def _replay(self):
+        """
+        Return entries that were being sent when the process stopped to the queue
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT id, issue_key, payload FROM journal WHERE status = ? ORDER BY id", (SENDING,)
+            ).fetchall()
+            for journal_id, issue_key, payload in rows:
+                payload = json.loads(payload)
+                if issue_key is not None:
+                    payload = self._absorb_later_patches(connection, journal_id, issue_key, payload)
+                connection.execute("UPDATE journal SET status = ?, payload = ? WHERE id = ?",
+                                   (PENDING, json.dumps(payload, ensure_ascii=False), journal_id))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        pending = connection.execute("SELECT COUNT(*) FROM journal WHERE status = ?", (PENDING,)).fetchone()[0]
+        if pending:
+            logger.info(f"Write journal has {pending} unsent entries to replay")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit; writes manage their own transactions
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            # FULL: an acknowledged entry must survive a power loss, not just a process crash
+            connection.execute("PRAGMA synchronous=FULL")
+            self._local.connection = connection
+        return connection
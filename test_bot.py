@@ -2,9 +2,17 @@
 Basic tests for the Yandex Tracker Telegram Bot
 """
 
+import asyncio
+import subprocess
+import sys
+import threading
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from main_bot import get_main_menu_keyboard, handle_callback
+from models.employee_index import EmployeeIndex
+from models.slot_reservation import NoSlotsAvailableError
+from utils.message_utils import update_user_state
+from utils.role_cache import RoleCache
 from utils.user_auth import UserRoleManager
 
 
@@ -13,7 +21,10 @@ class TestBot(unittest.TestCase):
     
     def setUp(self):
         """Set up test fixtures"""
-        self.user_role_manager = UserRoleManager()
+        # A loaded, empty index keeps role lookups off the network
+        employee_index = EmployeeIndex(Mock(iter_issues=Mock(return_value=iter([]))))
+        employee_index.sync()
+        self.user_role_manager = UserRoleManager(Mock(), RoleCache(), employee_index)
     
     def test_get_main_menu_keyboard_admin(self):
         """Test that admin gets the correct menu"""
@@ -39,6 +50,70 @@ class TestBot(unittest.TestCase):
         # Manager should have permission for employee functions
         self.assertTrue(self.user_role_manager.has_permission('manager', 'employee'))
     
+    def test_import_starts_no_worker_threads(self):
+        """Importing main_bot (e.g. from a benchmark) must not start the dispatcher or outbound queue"""
+        script = "import threading, main_bot; print(sorted(t.name for t in threading.enumerate()))"
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "['MainThread']")
+    
+    def test_empty_index_and_cache_are_not_replaced(self):
+        """An empty role cache or employee index passed in is used, not swapped for the shared one"""
+        index = Mock(lookup=Mock(return_value={'key': 'EMP-1', 'role': 'manager', 'status': 'active'}))
+        index.__len__ = Mock(return_value=0)
+        role_cache = RoleCache()
+        manager = UserRoleManager(Mock(), role_cache, index)
+        self.assertIs(manager.employee_index, index)
+        self.assertIs(manager.role_cache, role_cache)
+        self.assertEqual(manager.get_user_role('100500'), 'manager')
+
+    def test_callbacks_ignore_the_role_kept_in_session_state(self):
+        """A user demoted since their last press must not keep the old role from session state"""
+        import main_bot
+        call = Mock(data='admin_cities', id='1')
+        call.message.chat.id, call.message.message_id = 4242, 7
+        update_user_state(4242, 6, {'role': 'admin'})
+        with patch.object(main_bot, 'bot') as bot, \
+                patch.object(main_bot, 'get_user_role_from_tracker', return_value='employee'):
+            handle_callback(call)
+        self.assertTrue(bot.answer_callback_query.call_args.kwargs['show_alert'])
+
+    def test_role_is_not_cached_while_the_index_loads(self):
+        """A miss during the bootstrap must not stick once the employee shows up"""
+        index = Mock(loaded=False, lookup=Mock(return_value=None))
+        manager = UserRoleManager(Mock(), RoleCache(), index)
+        self.assertEqual(manager.get_user_role('100500'), 'employee')
+        index.loaded = True
+        index.lookup.return_value = {'key': 'EMP-1', 'role': 'manager', 'status': 'active'}
+        self.assertEqual(manager.get_user_role('100500'), 'manager')
+
+    def test_inactive_employee_loses_their_role(self):
+        """A fired employee is treated as unknown, and reactivating them drops the cached answer"""
+        entry = {'key': 'EMP-1', 'role': 'manager', 'status': 'fired'}
+        employee_manager = Mock()
+        manager = UserRoleManager(employee_manager, RoleCache(), Mock(loaded=True, lookup=Mock(return_value=entry)))
+        self.assertEqual(manager.get_user_role('100500'), 'employee')
+        entry['status'] = 'active'
+        self.assertEqual(manager.get_user_role('100500'), 'employee')
+        listener = employee_manager.add_update_listener.call_args.args[0]
+        listener('EMP-1', {'status': 'active'})
+        self.assertEqual(manager.get_user_role('100500'), 'manager')
+
+    def test_empty_role_is_the_default_role_every_time(self):
+        index = Mock(loaded=True, lookup=Mock(return_value={'key': 'EMP-1', 'role': '', 'status': 'active'}))
+        manager = UserRoleManager(Mock(), RoleCache(), index)
+        self.assertEqual(manager.get_user_role('100500'), 'employee')
+        self.assertEqual(manager.get_user_role('100500'), 'employee')
+
+    def test_full_request_is_reported_to_the_user(self):
+        import main_bot
+        call = Mock(data='manager_view_requests', id='1')
+        call.message.chat.id, call.message.message_id = 4243, 7
+        with patch.object(main_bot, 'bot') as bot, \
+                patch.object(main_bot, 'get_user_role_from_tracker', return_value='manager'), \
+                patch.object(main_bot, 'handle_specific_callback', side_effect=NoSlotsAvailableError('REQ-1')):
+            handle_callback(call)
+        self.assertEqual(bot.answer_callback_query.call_args.kwargs['text'], "В заявке не осталось свободных мест")
+
     def test_get_user_role_from_tracker(self):
         """Test getting user role from tracker"""
         # This would test the actual function that gets user role from tracker
@@ -47,5 +122,38 @@ class TestBot(unittest.TestCase):
         self.assertIsNotNone(role)
 
 
+class TestAsyncBot(unittest.TestCase):
+    """Test cases for the asyncio entry point"""
+
+    def press(self, data, role='manager'):
+        import async_bot
+        call = Mock(data=data, id='1')
+        call.message.chat.id, call.message.message_id = 42, 7
+        with patch.object(async_bot, 'async_bot', AsyncMock()) as bot, \
+                patch.object(async_bot, 'resolve_role', AsyncMock(return_value=role)), \
+                patch.object(async_bot, 'update_user_state'), \
+                patch.object(async_bot, 'handle_specific_callback') as in_thread:
+            in_thread.side_effect = lambda *args: setattr(in_thread, 'thread', threading.current_thread())
+            asyncio.run(async_bot.handle_callback(call))
+        return bot, in_thread
+
+    def test_screens_render_on_the_event_loop(self):
+        bot, in_thread = self.press('manager_shift')
+        bot.edit_message_text.assert_awaited_once()
+        self.assertIn("Управление сменой", bot.edit_message_text.call_args.kwargs['text'])
+        in_thread.assert_not_called()
+
+    def test_handler_routes_run_in_a_thread(self):
+        bot, in_thread = self.press('manager_view_requests')
+        bot.edit_message_text.assert_not_called()
+        in_thread.assert_called_once()
+        self.assertIsNot(in_thread.thread, threading.main_thread())
+
+    def test_screen_role_check(self):
+        bot, _ = self.press('admin_cities', role='employee')
+        bot.edit_message_text.assert_not_called()
+        self.assertTrue(bot.answer_callback_query.call_args.kwargs['show_alert'])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,916 @@
+"""
+Tests for the Yandex Tracker client plumbing
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from aiohttp import web
+
+from fakes import FakeResponse, FakeTrackerSession
+from models.async_tracker import AsyncYandexTrackerClient
+from models import registry
+from models.http_pool import create_session, connection_stats
+from models.employee_index import EmployeeIndex
+from models.issue_cache import IssueCache
+from models.local_mirror import LocalMirror
+from models.reference_data import ReferenceData
+from models.schemas import EMPLOYEE_SCHEMA, REQUEST_SCHEMA
+from models.slot_reservation import NoSlotsAvailableError, SlotReservation, UnversionedRequestError
+from models.write_journal import WriteJournal
+from models.resilience import TokenBucket, CircuitBreaker, TrackerUnavailableError
+from models.tracker_integration import (
+    CityManager, CompanyManager, EmployeeManager, RequestManager, ShiftManager, YandexTrackerClient,
+    changed_fields, projection
+)
+
+
+def make_client(handler, **kwargs):
+    """Tracker client over a fake session with its own (unlimited) limiter and breaker"""
+    kwargs.setdefault('rate_limiter', TokenBucket(rate=0))
+    kwargs.setdefault('circuit_breaker', CircuitBreaker())
+    kwargs.setdefault('issue_cache', IssueCache())
+    return YandexTrackerClient(session=FakeTrackerSession(handler), **kwargs)
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive HTTP handler that answers every GET with an empty object"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpPool(unittest.TestCase):
+    """Test cases for the pooled tracker session"""
+
+    def setUp(self):
+        """Start a local keep-alive server"""
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _JsonHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        """Sequential requests should ride on one kept-alive connection"""
+        session = create_session(pool_size=2)
+        for _ in range(5):
+            session.get(self.url).raise_for_status()
+
+        stats = connection_stats(session)
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['reused'], 4)
+        session.close()
+
+
+class TestIterIssues(unittest.TestCase):
+    """Test cases for streamed, paginated search"""
+
+    def setUp(self):
+        self.issues = [{'key': f'SHIFT-{i}'} for i in range(1, 6)]
+        self.requests = []
+
+    def scroll_handler(self, method, path, kwargs):
+        params = kwargs.get('params') or {}
+        self.requests.append(params)
+        start = int(params.get('scrollId', 0))
+        per_page = 2
+        page = self.issues[start:start + per_page]
+        return FakeResponse(payload=page, headers={'X-Scroll-Id': str(start + per_page), 'X-Scroll-Token': 't'})
+
+    def test_scroll_follows_cursor(self):
+        client = make_client(self.scroll_handler)
+        keys = [issue['key'] for issue in client.iter_issues('Queue: SHIFT', per_page=2)]
+        self.assertEqual(keys, [issue['key'] for issue in self.issues])
+        self.assertEqual(self.requests[0]['perScroll'], 2)
+        self.assertEqual(self.requests[1]['scrollId'], '2')
+
+    def test_limit_stops_early(self):
+        client = make_client(self.scroll_handler)
+        keys = [issue['key'] for issue in client.iter_issues('Queue: SHIFT', per_page=2, limit=3)]
+        self.assertEqual(keys, ['SHIFT-1', 'SHIFT-2', 'SHIFT-3'])
+        self.assertEqual(len(self.requests), 2)
+
+    def test_numbered_pages(self):
+        def handler(method, path, kwargs):
+            page = kwargs['params']['page']
+            return FakeResponse(payload=self.issues[(page - 1) * 2:page * 2], headers={'X-Total-Pages': '3'})
+
+        client = make_client(handler)
+        self.assertEqual(len(list(client.iter_issues('Queue: SHIFT', per_page=2, scroll=False))), 5)
+        self.assertEqual(client.session.calls, 3)
+
+
+class TestProjection(unittest.TestCase):
+    """Test cases for search field projections and payload metering"""
+
+    def test_projection_selects_custom_fields(self):
+        self.assertEqual(projection(['phone'], fields=['key']), ['key', 'customFields.phone'])
+
+    def test_payload_meter_counts_screen_traffic(self):
+        sent = []
+
+        def handler(method, path, kwargs):
+            sent.append(kwargs['json']['fields'])
+            return FakeResponse(payload=[{'key': 'EMP-1', 'customFields': {'phone': '1'}}])
+
+        client = make_client(handler)
+        with client.payload_meter() as meter:
+            client.search_issues('Queue: EMP', fields=projection(['phone']))
+
+        self.assertEqual(sent[0], ['key', 'updated', 'customFields.phone'])
+        self.assertEqual(meter['requests'], 1)
+        self.assertGreater(meter['bytes'], 0)
+        self.assertEqual(client.bytes_received, meter['bytes'])
+
+
+class TestBulkOperations(unittest.TestCase):
+    """Test cases for bulk create/update"""
+
+    def test_per_item_results_in_input_order(self):
+        def handler(method, path, kwargs):
+            if kwargs['json']['summary'] == 'bad':
+                return FakeResponse(status_code=422, payload={'errors': {}})
+            return FakeResponse(payload={'key': kwargs['json']['summary']})
+
+        client = make_client(handler)
+        results = client.create_issues_bulk([{'summary': 'A'}, {'summary': 'bad'}, {'summary': 'C'}], max_workers=3)
+
+        self.assertEqual([r['index'] for r in results], [0, 1, 2])
+        self.assertEqual([r['ok'] for r in results], [True, False, True])
+        self.assertEqual(results[2]['result']['key'], 'C')
+        self.assertIn('422', results[1]['error'])
+
+
+class TestIssueCache(unittest.TestCase):
+    """Test cases for the read-through issue cache"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = IssueCache(queue_ttls={'REQ': 15}, default_ttl=60, clock=lambda: self.now)
+        self.calls = []
+
+    def client(self, handler):
+        def recording(method, path, kwargs):
+            self.calls.append((method, path, kwargs.get('headers', {}).get('If-None-Match')))
+            return handler(method, path, kwargs)
+        return make_client(recording, issue_cache=self.cache)
+
+    def test_fresh_hit_skips_tracker(self):
+        client = self.client(lambda m, p, k: FakeResponse(payload={'key': 'REQ-1', 'updated': 'u1'}))
+        first = client.get_issue('REQ-1')
+        first['summary'] = 'mutated by caller'
+
+        self.assertEqual(client.get_issue('REQ-1'), {'key': 'REQ-1', 'updated': 'u1'})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_stale_entry_revalidated_with_etag(self):
+        def handler(method, path, kwargs):
+            if kwargs.get('headers', {}).get('If-None-Match') == '"v1"':
+                return FakeResponse(status_code=304)
+            return FakeResponse(payload={'key': 'REQ-1', 'updated': 'u1'}, headers={'ETag': '"v1"'})
+
+        client = self.client(handler)
+        client.get_issue('REQ-1')
+        self.now = 16
+        self.assertEqual(client.get_issue('REQ-1')['key'], 'REQ-1')
+        client.get_issue('REQ-1')
+
+        self.assertEqual([c[2] for c in self.calls], [None, '"v1"'])
+        self.assertEqual(self.cache.stats()['revalidated'], 1)
+
+    def test_stale_entry_without_etag_compares_updated(self):
+        state = {'updated': 'u1'}
+
+        def handler(method, path, kwargs):
+            if path == '/issues/_search':
+                self.assertEqual(kwargs['json']['fields'], ['key', 'updated'])
+                return FakeResponse(payload=[{'key': 'REQ-1', 'updated': state['updated']}])
+            return FakeResponse(payload={'key': 'REQ-1', 'updated': state['updated']})
+
+        client = self.client(handler)
+        client.get_issue('REQ-1')
+        self.now = 16
+        client.get_issue('REQ-1')
+        self.assertEqual([c[1] for c in self.calls], ['/issues/REQ-1', '/issues/_search'])
+
+        state['updated'] = 'u2'
+        self.now = 32
+        self.assertEqual(client.get_issue('REQ-1')['updated'], 'u2')
+        self.assertEqual(self.calls[-1][1], '/issues/REQ-1')
+
+    def test_writes_invalidate(self):
+        def handler(method, path, kwargs):
+            if method == 'PATCH':
+                return FakeResponse(payload={'key': 'REQ-1', 'updated': 'u2', 'status': 'closed'})
+            if path.endswith('/comments') or path.startswith('/bulkchange'):
+                return FakeResponse(payload={})
+            return FakeResponse(payload={'key': path.rsplit('/', 1)[-1], 'updated': 'u1'})
+
+        client = self.client(handler)
+        client.get_issue('REQ-1')
+        client.update_issue('REQ-1', {'status': 'closed'})
+        self.assertEqual(client.get_issue('REQ-1')['status'], 'closed')
+        self.assertEqual(len(self.calls), 2)
+
+        client.add_comment('REQ-1', 'note')
+        client.get_issue('REQ-2')
+        client.bulk_change(['REQ-2'], {'status': 'open'})
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_queue_ttl_and_lru_bound(self):
+        cache = IssueCache(max_size=2, queue_ttls={'CITY': 3600}, default_ttl=60, clock=lambda: self.now)
+        for key in ('CITY-1', 'REQ-1', 'REQ-2'):
+            cache.put(key, b'{"updated": "u"}')
+        self.assertIsNone(cache.lookup('CITY-1'))
+
+        cache.put('CITY-1', b'{}')
+        self.now = 120
+        self.assertTrue(cache.is_fresh(cache.lookup('CITY-1')))
+        self.assertFalse(cache.is_fresh(cache.lookup('REQ-2')))
+
+
+class TestSlotReservation(unittest.TestCase):
+    """Test cases for versioned slot reservation on requests"""
+
+    def setUp(self):
+        self.issue = {'key': 'REQ-1', 'version': 3,
+                      'customFields': {'availableSlots': 2, 'appliedEmployees': ['EMP-1']}}
+        self.patches = []
+        self.conflicts_left = 0
+
+    def handler(self, method, path, kwargs):
+        if method == 'PATCH':
+            self.patches.append(kwargs)
+            if self.conflicts_left:
+                # Another process took a slot in between
+                self.conflicts_left -= 1
+                self.issue['version'] += 1
+                self.issue['customFields']['availableSlots'] -= 1
+                self.issue['customFields']['appliedEmployees'].append('EMP-OTHER')
+                return FakeResponse(status_code=409, payload={'errors': {}})
+            self.issue['customFields'].update(kwargs['json']['customFields'])
+            self.issue['version'] += 1
+        return FakeResponse(payload=json.loads(json.dumps(self.issue)))
+
+    def manager(self, max_retries=5):
+        client = make_client(self.handler)
+        return RequestManager(client, SlotReservation(client, max_retries=max_retries, retry_base=0))
+
+    def test_versioned_update_takes_slot(self):
+        result = self.manager().add_employee_to_request('REQ-1', 'EMP-2')
+
+        self.assertEqual(self.patches[0]['params'], {'version': 3})
+        self.assertEqual(result['customFields'], {'availableSlots': 1, 'appliedEmployees': ['EMP-1', 'EMP-2']})
+
+    def test_conflict_rereads_and_retries(self):
+        self.conflicts_left = 1
+        manager = self.manager()
+        manager.add_employee_to_request('REQ-1', 'EMP-2')
+
+        self.assertEqual([p['params'] for p in self.patches], [{'version': 3}, {'version': 4}])
+        self.assertEqual(self.issue['customFields']['appliedEmployees'], ['EMP-1', 'EMP-OTHER', 'EMP-2'])
+        self.assertEqual(self.issue['customFields']['availableSlots'], 0)
+        self.assertEqual(manager.reservations.stats()['conflicts'], 1)
+
+    def test_full_request_refused_and_duplicates_ignored(self):
+        self.conflicts_left = 2
+        manager = self.manager()
+        with self.assertRaises(NoSlotsAvailableError):
+            manager.add_employee_to_request('REQ-1', 'EMP-2')
+
+        self.assertEqual(manager.add_employee_to_request('REQ-1', 'EMP-1')['version'], 5)
+        self.assertEqual(len(self.patches), 2)
+
+    def test_unset_slots_count_as_full(self):
+        self.issue['customFields']['availableSlots'] = None
+        with self.assertRaises(NoSlotsAvailableError):
+            self.manager().add_employee_to_request('REQ-1', 'EMP-2')
+        self.assertEqual(self.patches, [])
+
+    def test_setting_slots_is_versioned_and_retried(self):
+        self.conflicts_left = 1
+        manager = self.manager()
+        result = manager.update_request_slots('REQ-1', 5)
+
+        self.assertEqual([p['params'] for p in self.patches], [{'version': 3}, {'version': 4}])
+        self.assertEqual(result['customFields']['availableSlots'], 5)
+        # The employee that reserved in between is kept
+        self.assertIn('EMP-OTHER', result['customFields']['appliedEmployees'])
+
+    def test_request_without_version_is_never_patched(self):
+        del self.issue['version']
+        with self.assertRaises(UnversionedRequestError):
+            self.manager().add_employee_to_request('REQ-1', 'EMP-2')
+        self.assertEqual(self.patches, [])
+
+
+class TestSchemas(unittest.TestCase):
+    """Test cases for the compiled issue schemas"""
+
+    def test_build_issue_uses_defaults_and_fresh_lists(self):
+        first = EMPLOYEE_SCHEMA.build_issue({'first_name': 'Иван', 'last_name': 'Петров'})
+        second = EMPLOYEE_SCHEMA.build_issue({})
+        first['customFields']['objects'].append('WH-1')
+
+        self.assertEqual(first['summary'], 'Сотрудник: Иван Петров')
+        self.assertEqual(first['queue'], 'EMP')
+        self.assertEqual(second['customFields']['objects'], [])
+        self.assertEqual(second['customFields']['role'], 'employee')
+        self.assertEqual(len(second['customFields']), 25)
+
+    def test_patch_and_reverse_mapping(self):
+        self.assertEqual(EMPLOYEE_SCHEMA.to_fields({'bank_inn': '1', 'unknown': 2}), {'bankInn': '1'})
+
+        request = REQUEST_SCHEMA.from_fields({'requiredEmployees': 3, 'appliedEmployees': ['EMP-1']})
+        self.assertEqual(request['required_employees'], 3)
+        self.assertEqual(request['available_slots'], 0)
+        self.assertEqual(request['title'], '')
+        self.assertEqual(REQUEST_SCHEMA.build_issue({'description': 'Срочно'})['description'], 'Срочно')
+
+    def test_reader_builds_only_the_named_keys(self):
+        read = EMPLOYEE_SCHEMA.reader(['phone', 'objects'])
+        self.assertEqual(read({'phone': '+7', 'bankInn': '1'}), {'phone': '+7', 'objects': []})
+
+
+class TestPartialUpdates(unittest.TestCase):
+    """Test cases for diff-based employee and company updates"""
+
+    def setUp(self):
+        self.issue = {'key': 'EMP-1', 'summary': 'Сотрудник: Иван Петров',
+                      'customFields': {'firstName': 'Иван', 'lastName': 'Петров', 'phone': '+7900',
+                                       'passportNumber': '123456', 'role': 'employee'}}
+        self.patches = []
+
+        def handler(method, path, kwargs):
+            if method == 'PATCH':
+                self.patches.append(kwargs['json'])
+                self.issue = {**self.issue, 'customFields': {**self.issue['customFields'],
+                                                             **kwargs['json'].get('customFields', {})}}
+            return FakeResponse(payload=self.issue)
+
+        self.client = make_client(handler)
+        self.manager = EmployeeManager(self.client)
+        self.notified = []
+        self.manager.add_update_listener(lambda employee_id, data: self.notified.append(data))
+
+    def test_only_changed_fields_sent(self):
+        self.manager.update_employee('EMP-1', {'phone': '+7911', 'first_name': 'Иван', 'education': ''})
+
+        self.assertEqual(self.patches, [{'customFields': {'phone': '+7911'}}])
+        self.assertEqual(self.issue['customFields']['passportNumber'], '123456')
+        self.assertEqual(self.notified, [])
+
+    def test_unchanged_update_skips_write(self):
+        result = self.manager.update_employee('EMP-1', {'phone': '+7900', 'role': 'employee'})
+
+        self.assertEqual(self.patches, [])
+        self.assertEqual(result['key'], 'EMP-1')
+
+    def test_role_change_notifies_and_name_change_updates_summary(self):
+        self.manager.update_employee('EMP-1', {'role': 'manager', 'last_name': 'Сидоров'})
+
+        self.assertEqual(self.patches[0]['summary'], 'Сотрудник: Иван Сидоров')
+        self.assertEqual(self.notified, [{'role': 'manager'}])
+        stats = self.client.write_stats()
+        self.assertEqual(stats['writes'], 1)
+        self.assertEqual(stats['write_bytes'], len(json.dumps(self.patches[0], ensure_ascii=False).encode()))
+
+    def test_zero_on_unset_field_is_a_change(self):
+        self.assertEqual(changed_fields({'overtime': None}, {'overtime': 0, 'vestNumber': ''}), {'overtime': 0})
+        self.assertEqual(changed_fields({}, {'selfOperated': False, 'objects': []}), {'selfOperated': False})
+        self.assertEqual(changed_fields({'overtime': 0}, {'overtime': 0}), {})
+
+    def test_bulk_update_diffs_each_employee(self):
+        issues = {'EMP-1': self.issue, 'EMP-2': {'key': 'EMP-2', 'customFields': {'role': 'manager'}}}
+
+        def handler(method, path, kwargs):
+            key = path.rsplit('/', 1)[-1]
+            if method == 'PATCH':
+                self.patches.append((key, kwargs['json']))
+            return FakeResponse(payload=issues[key])
+
+        manager = EmployeeManager(make_client(handler))
+        results = manager.update_employees_bulk({'EMP-1': {'phone': '+7900', 'role': 'manager'},
+                                                 'EMP-2': {'role': 'manager'}})
+
+        self.assertEqual(self.patches, [('EMP-1', {'customFields': {'role': 'manager'}})])
+        self.assertEqual([(r['index'], r['key'], r['ok']) for r in results], [(0, 'EMP-1', True), (1, 'EMP-2', True)])
+        self.assertEqual(results[1]['result']['customFields'], {'role': 'manager'})
+
+    def test_company_diff(self):
+        self.issue = {'key': 'COMP-1', 'customFields': {'fullName': 'ООО Ромашка', 'inn': '7701'}}
+        CompanyManager(self.client).update_company('COMP-1', {'full_name': 'ООО Ромашка', 'inn': '7702'})
+
+        self.assertEqual(self.patches, [{'customFields': {'inn': '7702'}}])
+
+
+class RecordingTracker:
+    """Tracker double that records writes and can be told to fail them"""
+
+    def __init__(self):
+        self.writes = []
+        self.failing = False
+
+    def create_issue(self, issue_data):
+        return self._write('create', None, issue_data)
+
+    def update_issue(self, issue_key, issue_data):
+        return self._write('update', issue_key, issue_data)
+
+    def _write(self, op, issue_key, issue_data):
+        if self.failing:
+            raise ConnectionError("tracker down")
+        self.writes.append((op, issue_key, issue_data))
+        return {'key': issue_key or 'SHIFT-1'}
+
+
+class TestRegistryJournal(unittest.TestCase):
+    """Test cases for the registry's write-behind journal"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = RecordingTracker()
+        path = os.path.join(self.directory.name, 'journal.db')
+        self.patches = [
+            patch.object(registry, 'WRITE_BEHIND', True),
+            patch.object(registry, 'get_tracker_client', lambda: self.tracker),
+            patch.object(registry, 'WriteJournal', lambda tracker: WriteJournal(tracker, path))
+        ]
+        for patcher in self.patches:
+            patcher.start()
+        registry.reset_registry()
+
+    def tearDown(self):
+        journal = registry.get_write_journal()
+        journal.stop_background_flush()
+        journal.close()
+        registry.reset_registry()
+        for patcher in self.patches:
+            patcher.stop()
+        self.directory.cleanup()
+
+    def test_journal_flushes_without_an_entry_point(self):
+        registry.get_shift_manager().update_shift('SHIFT-1', {'start_time': '09:00'})
+
+        deadline = time.monotonic() + 5
+        while not self.tracker.writes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.tracker.writes, [('update', 'SHIFT-1', {'customFields': {'startTime': '09:00'}})])
+
+
+class TestWriteJournal(unittest.TestCase):
+    """Test cases for the write-behind journal"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'journal.db')
+        self.tracker = RecordingTracker()
+        self.journal = WriteJournal(self.tracker, self.path, max_attempts=2)
+
+    def tearDown(self):
+        self.journal.close()
+        self.directory.cleanup()
+
+    def test_acknowledges_then_coalesces_patches(self):
+        manager = ShiftManager(make_client(lambda m, p, k: FakeResponse()), journal=self.journal)
+        ack = manager.update_shift('SHIFT-1', {'start_time': '09:00'})
+        manager.update_shift('SHIFT-1', {'vest_number': '12'})
+        manager.update_shift('SHIFT-1', {'start_time': '09:15'})
+
+        self.assertTrue(ack['pending'])
+        self.assertEqual(self.tracker.writes, [])
+        self.assertEqual(self.journal.flush_all(), 1)
+        self.assertEqual(self.tracker.writes, [('update', 'SHIFT-1', {'customFields': {'startTime': '09:15',
+                                                                                       'vestNumber': '12'}})])
+        self.assertEqual(self.journal.stats()['coalesced'], 2)
+
+    def test_creates_are_written_through_with_their_key(self):
+        manager = ShiftManager(make_client(lambda m, p, k: FakeResponse()), journal=self.journal)
+        created = manager.create_shift({'date': '2024-06-01'})
+        self.assertEqual(created['key'], 'SHIFT-1')
+        self.assertEqual(self.tracker.writes[0][0], 'create')
+        self.assertEqual(self.journal.stats()['pending'], 0)
+
+    def test_reads_see_journaled_updates(self):
+        client = make_client(lambda m, p, k: FakeResponse(payload={'key': 'SHIFT-1',
+                                                                   'customFields': {'startTime': '08:00'}}))
+        manager = ShiftManager(client, journal=self.journal)
+        self.assertEqual(manager.get_shift('SHIFT-1')['customFields']['startTime'], '08:00')
+        manager.update_shift('SHIFT-1', {'start_time': '09:00'})
+        self.assertEqual(manager.get_shift('SHIFT-1')['customFields']['startTime'], '09:00')
+        # The cached issue itself is left as Tracker sent it
+        self.assertEqual(client.get_issue('SHIFT-1')['customFields']['startTime'], '08:00')
+
+    def test_unsent_entries_replayed_after_restart(self):
+        self.journal.update_issue('REQ-1', {'customFields': {'status': 'closed'}})
+        # Simulate a crash in the middle of a flush
+        self.journal._claim()
+        self.journal.close()
+
+        reopened = WriteJournal(self.tracker, self.path)
+        self.assertEqual(reopened.stats()['pending'], 1)
+        self.assertEqual(reopened.flush(), 1)
+        self.assertEqual(self.tracker.writes, [('update', 'REQ-1', {'customFields': {'status': 'closed'}})])
+        reopened.close()
+
+    def test_diff_sees_journaled_patches(self):
+        client = make_client(lambda m, p, k: FakeResponse(payload={'key': 'EMP-1', 'customFields': {'phone': '+7900'}}))
+        manager = EmployeeManager(client, journal=self.journal)
+        manager.update_employee('EMP-1', {'phone': '+7911'})
+        manager.update_employee('EMP-1', {'phone': '+7900'})
+
+        self.journal.flush_all()
+        self.assertEqual(self.tracker.writes, [('update', 'EMP-1', {'customFields': {'phone': '+7900'}})])
+
+    def test_failed_entries_retried_then_parked(self):
+        self.tracker.failing = True
+        self.journal.update_issue('EMP-1', {'customFields': {'role': 'manager'}})
+        self.journal.flush()
+        self.assertEqual(self.journal.stats()['pending'], 1)
+
+        # A patch queued while the first was failing is folded into it
+        self.journal.update_issue('EMP-1', {'customFields': {'status': 'fired'}})
+        self.journal._connection().execute("UPDATE journal SET next_attempt = 0")
+        self.journal.flush()
+
+        failed = self.journal.failed_entries()
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(failed[0]['payload'], {'customFields': {'role': 'manager', 'status': 'fired'}})
+
+
+class TestResilience(unittest.TestCase):
+    """Test cases for retries, throttling and the circuit breaker"""
+
+    def test_retry_after_is_honoured_on_429(self):
+        responses = [FakeResponse(status_code=429, headers={'Retry-After': '0'}), FakeResponse(payload={'key': 'A'})]
+        client = make_client(lambda method, path, kwargs: responses.pop(0))
+        self.assertEqual(client.create_issue({})['key'], 'A')
+        self.assertEqual(client.retries, 1)
+
+    def test_5xx_not_retried_for_create(self):
+        client = make_client(lambda method, path, kwargs: FakeResponse(status_code=503))
+        with self.assertRaises(Exception):
+            client.create_issue({})
+        self.assertEqual(client.session.calls, 1)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        client = make_client(lambda method, path, kwargs: FakeResponse(status_code=500),
+                             circuit_breaker=CircuitBreaker(threshold=2, reset_timeout=60), max_retries=0)
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                client.get_issue('EMP-1')
+        with self.assertRaises(TrackerUnavailableError):
+            client.get_issue('EMP-1')
+        self.assertEqual(client.session.calls, 2)
+
+    def test_unrecorded_trial_expires(self):
+        now = [0.0]
+        breaker = CircuitBreaker(threshold=1, reset_timeout=30, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 30
+        # The trial call is let through but its outcome is never recorded, e.g. it was cancelled
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        now[0] = 60
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_token_bucket_waits_when_empty(self):
+        now = [0.0]
+        slept = []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2, capacity=1, clock=lambda: now[0], sleep=sleep)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertAlmostEqual(sum(slept), 0.5)
+
+
+class TestAsyncClient(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the asyncio tracker client against a local server"""
+
+    async def asyncSetUp(self):
+        self.failures_left = 1
+        app = web.Application()
+        app.router.add_get('/v2/issues/{key}', self.get_issue)
+        app.router.add_post('/v2/issues/_search', self.search)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.client = AsyncYandexTrackerClient(rate_limiter=TokenBucket(rate=0), circuit_breaker=CircuitBreaker())
+        self.client.base_url = f"http://127.0.0.1:{port}/v2"
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.runner.cleanup()
+
+    async def get_issue(self, request):
+        if self.failures_left:
+            self.failures_left -= 1
+            return web.json_response({}, status=503, headers={'Retry-After': '0'})
+        return web.json_response({'key': request.match_info['key']})
+
+    async def search(self, request):
+        offset = int(request.query.get('scrollId', 0))
+        page = [{'key': f'EMP-{i}'} for i in range(offset, min(offset + 2, 5))]
+        return web.json_response(page, headers={'X-Scroll-Id': str(offset + 2)})
+
+    async def test_get_issue_retries_5xx(self):
+        issue = await self.client.get_issue('EMP-1')
+        self.assertEqual(issue['key'], 'EMP-1')
+        self.assertEqual(self.client.retries, 1)
+
+    async def test_iter_issues_follows_scroll(self):
+        keys = [issue['key'] async for issue in self.client.iter_issues('Queue: EMP', per_page=2)]
+        self.assertEqual(keys, [f'EMP-{i}' for i in range(5)])
+
+
+class FakeSearchTracker:
+    """Tracker double that streams a fixed list of issues"""
+
+    def __init__(self, issues):
+        self.issues = issues
+        self.queries = []
+
+    def iter_issues(self, query, fields=None, per_page=None):
+        self.queries.append(query)
+        return iter(self.issues)
+
+
+def _employee(key, telegram, role, updated):
+    return {'key': key, 'updated': updated, 'customFields': {'telegram': telegram, 'role': role}}
+
+
+class TestEmployeeIndex(unittest.TestCase):
+    """Test cases for the Telegram ID -> employee index"""
+
+    def test_bootstrap_indexes_queue(self):
+        tracker = FakeSearchTracker([
+            _employee('EMP-1', '@Alice', 'manager', '2024-01-01T10:00:00.000+0000'),
+            _employee('EMP-2', '200', 'brigadier', '2024-01-02T10:00:00.000+0000'),
+            _employee('EMP-3', '300', 'employee', '2024-01-03T10:00:00.000+0000'),
+        ])
+        index = EmployeeIndex(tracker, page_size=2)
+        index.sync()
+
+        self.assertEqual(index.lookup('alice')['key'], 'EMP-1')
+        self.assertEqual(index.lookup(200)['role'], 'brigadier')
+        self.assertEqual(len(tracker.queries), 1)
+
+    def test_lookup_before_bootstrap_loads_in_the_background(self):
+        release = threading.Event()
+
+        class SlowTracker(FakeSearchTracker):
+            def iter_issues(self, query, fields=None, per_page=None):
+                release.wait(5)
+                return super().iter_issues(query, fields, per_page)
+
+        index = EmployeeIndex(SlowTracker([_employee('EMP-1', '100', 'manager', '2024-01-01T10:00:00.000+0000')]))
+        # Misses while loading instead of waiting for the queue on the caller's thread
+        self.assertIsNone(index.lookup('100'))
+        self.assertIsNone(index.lookup('100'))
+        release.set()
+        for _ in range(500):
+            if index.loaded:
+                break
+            time.sleep(0.01)
+        self.assertEqual(index.lookup('100')['role'], 'manager')
+        self.assertEqual(len(index.tracker.queries), 1)
+
+    def test_incremental_sync_moves_telegram(self):
+        tracker = FakeSearchTracker([_employee('EMP-1', '100', 'employee', '2024-01-01T10:00:00.000+0000')])
+        index = EmployeeIndex(tracker, page_size=10)
+        index.sync()
+
+        tracker.issues = [_employee('EMP-1', '101', 'manager', '2024-01-05T10:00:00.000+0000')]
+        index.sync()
+
+        self.assertIn('Updated: >= "2024-01-01 10:00:00"', tracker.queries[-1])
+        self.assertIsNone(index.lookup('100'))
+        self.assertEqual(index.lookup('101')['role'], 'manager')
+
+
+
+class QueueSearchTracker(FakeSearchTracker):
+    """Search double that filters its issues by the queried queue"""
+
+    def iter_issues(self, query, fields=None, per_page=None):
+        self.queries.append(query)
+        queue = query.split()[1]
+        return iter([issue for issue in self.issues if issue['key'].startswith(queue + '-')])
+
+
+class TestReferenceData(unittest.TestCase):
+    """Test cases for the in-memory city, warehouse and company data"""
+
+    def setUp(self):
+        self.tracker = QueueSearchTracker([
+            {'key': 'CITY-1', 'summary': 'Город: Москва', 'customFields': {'name': 'Москва'}},
+            {'key': 'WH-1', 'customFields': {'name': 'Склад  Север', 'synonyms': ['North'], 'note': 'ворота 3'}},
+            {'key': 'COMP-2', 'customFields': {'fullName': 'ООО Ромашка', 'shortName': 'Ромашка', 'inn': '7701'}},
+        ])
+        self.data = ReferenceData(self.tracker)
+
+    def test_lazy_load_per_queue(self):
+        self.assertEqual(self.data.name_of('WH-1'), 'Склад  Север')
+        self.assertIsNone(self.data.get('WH-9'))
+        self.assertEqual(len(self.tracker.queries), 1)
+        self.assertNotIn('note', self.data.get('WH-1')['customFields'])
+        self.assertEqual(list(self.data.stats()), ['WH'])
+
+    def test_lookup_by_name_synonym_and_inn(self):
+        self.assertEqual(self.data.find('WH', ' склад север ')['key'], 'WH-1')
+        self.assertEqual(self.data.find('WH', 'north')['key'], 'WH-1')
+        self.assertEqual(self.data.find('COMP', '7701')['key'], 'COMP-2')
+        self.assertEqual(self.data.name_of('COMP-2'), 'Ромашка')
+        self.assertIsNone(self.data.find('CITY', 'Казань'))
+
+    def test_put_and_reload(self):
+        self.data.load_all()
+        self.data.put({'key': 'CITY-1', 'customFields': {'name': 'Санкт-Петербург'}})
+        self.assertIsNone(self.data.find('CITY', 'Москва'))
+        self.assertEqual(self.data.find('CITY', 'санкт-петербург')['key'], 'CITY-1')
+
+        self.tracker.issues.append({'key': 'CITY-2', 'customFields': {'name': 'Казань'}})
+        self.data.reload('CITY')
+        self.assertEqual([r['key'] for r in self.data.all('CITY')], ['CITY-1', 'CITY-2'])
+        stats = self.data.stats()['CITY']
+        self.assertEqual(stats['records'], 2)
+        self.assertGreater(stats['size_bytes'], 0)
+
+    def test_managers_read_preloaded_records_without_http(self):
+        calls = []
+
+        def handler(method, path, kwargs):
+            calls.append((method, path))
+            return FakeResponse(payload={'key': 'COMP-5', 'customFields': {'fullName': 'ООО Лютик'}})
+
+        self.data.load_all()
+        client = make_client(handler)
+        companies = CompanyManager(client, reference_data=self.data)
+        self.assertEqual(companies.get_company('COMP-2')['customFields']['inn'], '7701')
+        self.assertEqual(companies.find_company('ромашка')['key'], 'COMP-2')
+        self.assertEqual(CityManager(client, reference_data=self.data).get_city('CITY-1')['summary'], 'Город: Москва')
+        self.assertEqual(calls, [])
+
+        self.assertEqual(companies.get_company('COMP-5')['customFields']['fullName'], 'ООО Лютик')
+        self.assertEqual(calls, [('GET', '/issues/COMP-5')])
+        self.assertEqual(self.data.find('COMP', 'ооо лютик')['key'], 'COMP-5')
+
+    def test_records_have_one_shape_and_names_are_escaped(self):
+        queries = []
+
+        def handler(method, path, kwargs):
+            if method == 'POST':
+                queries.append(kwargs['json']['query'])
+                return FakeResponse(payload=[{'key': 'COMP-7', 'queue': {'key': 'COMP'},
+                                              'customFields': {'fullName': 'ООО "Лютик"'}}])
+            return FakeResponse(payload={'key': 'COMP-5', 'queue': {'key': 'COMP'}, 'customFields': {}})
+
+        self.data.load_all()
+        companies = CompanyManager(make_client(handler), reference_data=self.data)
+        self.assertEqual(set(companies.get_company('COMP-5')), {'key', 'summary', 'updated', 'customFields'})
+        found = companies.find_company('ООО "Лютик"')
+        self.assertEqual(set(found), {'key', 'summary', 'updated', 'customFields'})
+        self.assertIn('fullName: "ООО \\"Лютик\\""', queries[0])
+
+    def test_put_during_reload_survives_the_swap(self):
+        self.data.load_all()
+        snapshot = list(self.tracker.issues)
+        data = self.data
+
+        class RacingTracker(QueueSearchTracker):
+            def iter_issues(self, query, fields=None, per_page=None):
+                yield from super().iter_issues(query, fields, per_page)
+                # Renamed after the snapshot was read, before it is swapped in
+                data.put({'key': 'CITY-1', 'updated': '2024-02-01T00:00:00.000+0000',
+                          'customFields': {'name': 'Санкт-Петербург'}})
+
+        self.data.tracker = RacingTracker(snapshot)
+        self.data.reload('CITY')
+        self.assertEqual(self.data.get('CITY-1')['customFields']['name'], 'Санкт-Петербург')
+        self.assertEqual(self.data.find('CITY', 'санкт-петербург')['key'], 'CITY-1')
+        self.assertIsNone(self.data.find('CITY', 'москва'))
+
+
+class TestLocalMirror(unittest.TestCase):
+    """Test cases for the SQLite mirror and its employee search"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.tracker = QueueSearchTracker([
+            {'key': 'COMP-1', 'updated': '2024-01-01T10:00:00.000+0000',
+             'customFields': {'fullName': 'ООО Ромашка', 'shortName': 'Ромашка'}},
+            {'key': 'EMP-1', 'updated': '2024-01-02T10:00:00.000+0000',
+             'customFields': {'lastName': 'Петров', 'firstName': 'Иван', 'phone': '+7 (900) 123-45-67',
+                              'telegram': '@Ivan_P', 'company': 'COMP-1'}},
+            {'key': 'EMP-2', 'updated': '2024-01-03T10:00:00.000+0000',
+             'customFields': {'lastName': 'Петровская', 'firstName': 'Анна', 'phone': '+79005554433',
+                              'telegram': '555', 'company': 'COMP-9'}},
+        ])
+        self.mirror = LocalMirror(self.tracker, os.path.join(self.directory.name, 'mirror.db'))
+
+    def tearDown(self):
+        self.mirror.close()
+        self.directory.cleanup()
+
+    def keys(self, query):
+        return [issue['key'] for issue in self.mirror.search_employees(query)]
+
+    def test_search_by_name_phone_telegram_and_company(self):
+        self.assertFalse(self.mirror.ready('EMP'))
+        self.mirror.sync()
+
+        self.assertTrue(self.mirror.ready('EMP'))
+        self.assertEqual(sorted(self.keys('петров')), ['EMP-1', 'EMP-2'])
+        self.assertEqual(self.keys('Петров Ив'), ['EMP-1'])
+        self.assertEqual(self.keys('123-45'), ['EMP-1'])
+        self.assertEqual(self.keys('+7 (900) 123'), ['EMP-1'])
+        self.assertEqual(self.keys('+7 900 555'), ['EMP-2'])
+        self.assertEqual(self.keys('@ivan'), ['EMP-1'])
+        self.assertEqual(self.keys('ромашка'), ['EMP-1'])
+        self.assertEqual(self.keys('Сидоров'), [])
+        self.assertEqual(self.mirror.get('EMP-1')['customFields']['company'], 'COMP-1')
+
+    def test_incremental_sync_updates_index(self):
+        self.mirror.sync()
+        self.tracker.issues = [
+            {'key': 'COMP-1', 'updated': '2024-02-01T10:00:00.000+0000',
+             'customFields': {'fullName': 'ООО Василёк', 'shortName': 'Василёк'}},
+            {'key': 'EMP-2', 'updated': '2024-02-02T10:00:00.000+0000',
+             'customFields': {'lastName': 'Иванова', 'firstName': 'Анна', 'company': 'COMP-1'}},
+        ]
+        counts = self.mirror.sync()
+
+        self.assertEqual(counts['EMP'], 1)
+        self.assertIn('Updated: >= "2024-01-03 10:00:00"',
+                      [query for query in self.tracker.queries if 'EMP' in query][-1])
+        self.assertEqual(sorted(self.keys('василёк')), ['EMP-1', 'EMP-2'])
+        self.assertEqual(self.keys('ромашка'), [])
+        self.assertEqual(self.keys('петровская'), [])
+        self.assertEqual(self.mirror.stats()['queues']['EMP']['issues'], 2)
+
+    def test_not_ready_until_a_full_pass_finishes(self):
+        issues = [{'key': f'EMP-{n}', 'updated': f'2024-01-0{n}T10:00:00.000+0000',
+                   'customFields': {'lastName': 'Петров'}} for n in range(1, 6)]
+        seen = []
+
+        def iter_issues(query, fields=None, per_page=None):
+            if not query.startswith('Queue: EMP '):
+                return
+            for n, issue in enumerate(issues):
+                if n == 3:
+                    # Two batches of two are already stored; ask from another thread, as a handler would
+                    checker = threading.Thread(target=lambda: seen.append(self.mirror.ready('EMP')))
+                    checker.start()
+                    checker.join()
+                yield issue
+
+        self.tracker.iter_issues = iter_issues
+        self.mirror.page_size = 2
+        self.mirror.sync()
+
+        self.assertEqual(seen, [False])
+        self.assertTrue(self.mirror.ready('EMP'))
+        self.assertEqual(len(self.mirror.search_employees('петров')), 5)
+
+    def test_manager_searches_tracker_until_mirror_is_synced(self):
+        manager = EmployeeManager(make_client(lambda m, p, k: FakeResponse()), mirror=self.mirror)
+        manager.tracker = self.tracker
+        self.tracker.iter_issues = lambda query, fields=None, limit=None: iter([{'key': 'EMP-7'}])
+        self.assertEqual([issue['key'] for issue in manager.search_employees('Петров')], ['EMP-7'])
+
+        del self.tracker.iter_issues
+        self.mirror.sync()
+        self.assertEqual([issue['key'] for issue in manager.search_employees('Петров Ив')], ['EMP-1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,573 @@
+"""
+Tests for the bot utility caches and stores
+"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from fakes import callback_update, send_update
+from utils.callback_router import CallbackNotAllowed, CallbackRouter
+from utils.dispatcher import ChatDispatcher
+from utils.keyboards import KeyboardCache, navigation_keyboard
+from telebot.apihelper import ApiTelegramException
+from utils.message_utils import RenderedMessageCache, create_navigation_keyboard
+from utils.outbound_queue import BACKGROUND, OutboundQueue
+from utils.role_cache import RoleCache, MISSING
+from utils.roles import ROLE_LEVELS, intern_role
+from utils.session import ChatSession
+from utils.state_store import MemoryStateStore, SQLiteStateStore
+from utils.webhook_server import WebhookServer
+from utils.worker_pool import BoundedWorkerPool
+
+
+class FakeClock:
+    """Manually advanced clock for expiry tests"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRoleCache(unittest.TestCase):
+    """Test cases for the Telegram ID -> role cache"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = RoleCache(max_size=2, ttl=10, negative_ttl=5, clock=self.clock)
+
+    def test_hit_and_miss_counters(self):
+        self.assertIs(self.cache.get('1'), MISSING)
+        self.cache.put('1', 'manager', 'EMP-1')
+        self.assertEqual(self.cache.get('1'), 'manager')
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_negative_entries_expire_sooner(self):
+        self.cache.put_unknown('2')
+        self.assertIsNone(self.cache.get('2'))
+        self.clock.now = 6
+        self.assertIs(self.cache.get('2'), MISSING)
+
+    def test_ttl_expiry(self):
+        self.cache.put('1', 'admin')
+        self.clock.now = 11
+        self.assertIs(self.cache.get('1'), MISSING)
+
+    def test_lru_eviction(self):
+        self.cache.put('1', 'admin')
+        self.cache.put('2', 'employee')
+        self.cache.get('1')
+        self.cache.put('3', 'brigadier')
+        self.assertIs(self.cache.get('2'), MISSING)
+        self.assertEqual(self.cache.get('1'), 'admin')
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_invalidate_by_employee_key(self):
+        self.cache.put('1', 'manager', 'EMP-1')
+        self.cache.invalidate_employee('EMP-1')
+        self.assertIs(self.cache.get('1'), MISSING)
+
+
+class TestWebhookServer(unittest.TestCase):
+    """Test cases for webhook intake and backpressure, driven by the fake Telegram sender"""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.handled = []
+        self.pool = BoundedWorkerPool(workers=1, max_queue=1)
+        self.server = WebhookServer(
+            submit_update=lambda update: self.pool.submit(self.handle, update),
+            host='127.0.0.1', port=0, secret_token='s3cret', stats_provider=self.pool.stats
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+        self.pool.shutdown()
+
+    def handle(self, update):
+        self.release.wait(5)
+        self.handled.append(update.update_id)
+
+    def wait_for(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            threading.Event().wait(0.01)
+        self.fail("condition not reached")
+
+    def test_full_pool_sheds_load(self):
+        url = self.base + '/telegram/webhook'
+        # The first update occupies the only worker, the second fills the queue
+        self.assertEqual(send_update(url, callback_update(1), 's3cret'), 200)
+        self.wait_for(lambda: self.pool.stats()['queue_depth'] == 0)
+        self.assertEqual(send_update(url, callback_update(2), 's3cret'), 200)
+        self.assertEqual(send_update(url, callback_update(3), 's3cret'), 503)
+
+        request = urllib.request.Request(self.base + '/metrics',
+                                         headers={'X-Telegram-Bot-Api-Secret-Token': 's3cret'})
+        with urllib.request.urlopen(request) as response:
+            metrics = json.loads(response.read())
+        self.assertEqual(metrics['accepted'], 2)
+        self.assertEqual(metrics['rejected'], 1)
+        self.assertEqual(metrics['queue_depth'], 1)
+
+        self.release.set()
+        self.wait_for(lambda: len(self.handled) == 2)
+
+    def test_wrong_secret_is_refused(self):
+        self.assertEqual(send_update(self.base + '/telegram/webhook', callback_update(1), 'nope'), 403)
+        self.assertEqual(send_update(self.base + '/telegram/webhook', callback_update(1)), 403)
+
+    def test_secret_is_required(self):
+        with self.assertRaises(ValueError):
+            WebhookServer(submit_update=lambda update: True, host='127.0.0.1', port=0)
+
+    def test_non_object_body_is_a_counted_bad_request(self):
+        request = urllib.request.Request(self.base + '/telegram/webhook', data=b'[1, 2]', method='POST',
+                                         headers={'X-Telegram-Bot-Api-Secret-Token': 's3cret'})
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(request)
+        self.assertEqual(raised.exception.code, 400)
+        self.assertEqual(self.server.invalid, 1)
+
+    def get_metrics(self, secret=None):
+        headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.base + '/metrics', headers=headers)) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def test_metrics_need_the_secret_even_from_loopback(self):
+        self.assertEqual(self.get_metrics(), 403)
+        self.assertEqual(self.get_metrics('nope'), 403)
+        self.assertEqual(self.get_metrics('s3cret'), 200)
+
+    def test_slow_metrics_scrape_does_not_block_updates(self):
+        scraping = threading.Event()
+
+        def slow_stats():
+            scraping.set()
+            self.release.wait(5)
+            return {}
+
+        self.server.stats_provider = slow_stats
+        scrape = threading.Thread(target=self.get_metrics, args=('s3cret',))
+        scrape.start()
+        self.assertTrue(scraping.wait(5))
+        self.assertEqual(send_update(self.base + '/telegram/webhook', callback_update(1), 's3cret', timeout=1), 200)
+        self.release.set()
+        scrape.join(5)
+
+
+
+class TestChatDispatcher(unittest.TestCase):
+    """Test cases for per-chat ordering and cross-chat parallelism"""
+
+    def setUp(self):
+        self.dispatcher = ChatDispatcher(workers=4, max_pending=10)
+
+    def tearDown(self):
+        self.dispatcher.shutdown()
+
+    def wait_for(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            threading.Event().wait(0.01)
+        self.fail("condition not reached")
+
+    def test_same_chat_runs_in_order_one_at_a_time(self):
+        seen, running = [], []
+
+        def handle(n):
+            running.append(n)
+            self.assertEqual(len(running), 1)
+            threading.Event().wait(0.005)
+            seen.append(n)
+            running.remove(n)
+
+        for n in range(5):
+            self.assertTrue(self.dispatcher.submit(1, handle, n))
+        self.wait_for(lambda: len(seen) == 5)
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+
+    def test_slow_chat_does_not_block_other_chats(self):
+        release = threading.Event()
+        done = []
+        self.dispatcher.submit(1, release.wait, 5)
+        self.dispatcher.submit(1, done.append, 'chat 1')
+        self.dispatcher.submit(2, done.append, 'chat 2')
+        self.wait_for(lambda: done == ['chat 2'])
+        self.assertEqual(self.dispatcher.chat_queue_lengths(), [(1, 1)])
+
+        release.set()
+        self.wait_for(lambda: done == ['chat 2', 'chat 1'])
+        stats = self.dispatcher.stats()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['completed'], 3)
+        self.assertGreater(stats['worst_wait_ms'], 0)
+
+    def test_submit_from_own_chat_runs_inline(self):
+        done = []
+        self.dispatcher.submit(1, lambda: self.dispatcher.submit(1, done.append, 'nested'))
+        self.wait_for(lambda: done == ['nested'])
+
+    def test_rejects_beyond_max_pending(self):
+        release = threading.Event()
+        self.dispatcher.submit(1, release.wait, 5)
+        self.wait_for(lambda: self.dispatcher.stats()['pending'] == 0)
+        for _ in range(10):
+            self.assertTrue(self.dispatcher.submit(1, len, ()))
+        self.assertFalse(self.dispatcher.submit(2, len, ()))
+        self.assertEqual(self.dispatcher.stats()['rejected'], 1)
+        release.set()
+
+
+
+class TestCallbackRouter(unittest.TestCase):
+    """Test cases for callback data routing"""
+
+    def setUp(self):
+        self.router = CallbackRouter(prefix_roles={'manager': 'manager', 'outs_manager': 'outs_staff_manager'})
+        self.calls = []
+
+        @self.router.route('back_to_main')
+        def back(ctx):
+            self.calls.append(('back', ctx.prefix))
+
+        @self.router.route('{prefix}_requests', prefixes=('manager', 'outs_manager'))
+        def requests_menu(ctx):
+            self.calls.append(('requests', ctx.prefix))
+
+        @self.router.route('{prefix}_request_{request_id}', prefixes=('manager', 'outs_manager'))
+        def request(ctx, request_id):
+            self.calls.append(('request', ctx.prefix, request_id))
+
+        @self.router.route('page_{number:int}')
+        def page(ctx, number):
+            self.calls.append(('page', number))
+
+        @self.router.route('admin_cities', min_role='admin')
+        def cities(ctx):
+            self.calls.append(('cities',))
+
+    def dispatch(self, data, role='manager'):
+        call = type('Call', (), {'data': data})()
+        return self.router.dispatch(call, 1, 2, role)
+
+    def test_multi_word_prefixes_are_unambiguous(self):
+        self.assertTrue(self.dispatch('outs_manager_requests'))
+        self.assertTrue(self.dispatch('manager_requests'))
+        self.assertTrue(self.dispatch('back_to_main'))
+        self.assertEqual(self.calls, [('requests', 'outs_manager'), ('requests', 'manager'), ('back', None)])
+
+    def test_typed_parameters(self):
+        self.assertTrue(self.dispatch('outs_manager_request_REQ-7'))
+        self.assertTrue(self.dispatch('page_3'))
+        self.assertEqual(self.calls, [('request', 'outs_manager', 'REQ-7'), ('page', 3)])
+
+    def test_unmatched_data(self):
+        self.assertFalse(self.dispatch('page_three'))
+        self.assertFalse(self.dispatch('admin_requests'))
+        self.assertFalse(self.dispatch('manager_request_'))
+        self.assertEqual(self.router.unmatched, 3)
+        self.assertEqual(self.calls, [])
+
+    def test_routes_require_the_role_level(self):
+        with self.assertRaises(CallbackNotAllowed):
+            self.dispatch('admin_cities')
+        with self.assertRaises(CallbackNotAllowed):
+            self.dispatch('manager_request_REQ-1', role='brigadier')
+        self.assertTrue(self.dispatch('admin_cities', role='admin'))
+        self.assertTrue(self.dispatch('outs_manager_requests', role='manager'))
+        self.assertTrue(self.dispatch('back_to_main', role='outs_employee'))
+        self.assertEqual(self.router.stats()['rejected'], 2)
+        self.assertEqual(self.calls, [('cities',), ('requests', 'outs_manager'), ('back', None)])
+        self.assertFalse(self.router.allowed('admin_cities', 'manager'))
+
+    def test_duplicate_route_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.router.add('manager_requests', print)
+        with self.assertRaises(ValueError):
+            self.router.add('{a}_x_{b}', print)
+
+
+
+class TestKeyboardCache(unittest.TestCase):
+    """Test cases for prebuilt, cached inline keyboards"""
+
+    def setUp(self):
+        self.cache = KeyboardCache(max_size=2)
+
+    def rows(self, *callbacks):
+        return tuple(((data.title(), data),) for data in callbacks)
+
+    def test_same_content_reuses_serialised_keyboard(self):
+        keyboard = self.cache.get(self.rows('shift', 'back_to_main'))
+        self.assertIs(self.cache.get(self.rows('shift', 'back_to_main')), keyboard)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_matches_telebot_serialisation(self):
+        expected = create_navigation_keyboard([('Смена', 'manager_shift')]).to_json()
+        self.assertEqual(navigation_keyboard([('Смена', 'manager_shift')]).to_json(), expected)
+
+    def test_prebuilt_keyboards_are_frozen(self):
+        keyboard = self.cache.get(self.rows('shift'))
+        with self.assertRaises(TypeError):
+            keyboard.row()
+
+    def test_least_recently_used_is_evicted(self):
+        first = self.cache.get(self.rows('a'))
+        self.cache.get(self.rows('b'))
+        self.cache.get(self.rows('a'))
+        self.cache.get(self.rows('c'))
+        self.assertIs(self.cache.get(self.rows('a')), first)
+        self.assertEqual(self.cache.stats()['size'], 2)
+        self.assertEqual(self.cache.stats()['misses'], 3)
+
+
+
+class FakeEditBot:
+    """Records edit_message_text calls; can fail the next one with a Telegram error"""
+
+    def __init__(self):
+        self.edits = []
+        self.error = None
+
+    def edit_message_text(self, **kwargs):
+        if self.error:
+            error, self.error = self.error, None
+            raise ApiTelegramException('editMessageText', None, {'error_code': 400, 'description': error})
+        self.edits.append(kwargs)
+
+
+class TestRenderedMessageCache(unittest.TestCase):
+    """Test cases for skipping edits that would not change a message"""
+
+    def setUp(self):
+        self.bot = FakeEditBot()
+        self.cache = RenderedMessageCache(max_size=10)
+        self.keyboard = navigation_keyboard([('Смена', 'manager_shift')])
+
+    def test_identical_edit_is_skipped(self):
+        self.assertTrue(self.cache.edit(self.bot, 1, 10, 'menu', self.keyboard))
+        self.assertFalse(self.cache.edit(self.bot, 1, 10, 'menu', self.keyboard))
+        self.assertTrue(self.cache.edit(self.bot, 1, 10, 'other', self.keyboard))
+        self.assertTrue(self.cache.edit(self.bot, 2, 10, 'menu', self.keyboard))
+        self.assertEqual(len(self.bot.edits), 3)
+        self.assertEqual(self.cache.stats()['saved_calls'], 1)
+
+    def test_not_modified_error_is_absorbed(self):
+        self.bot.error = 'Bad Request: message is not modified'
+        self.assertTrue(self.cache.edit(self.bot, 1, 10, 'menu'))
+        self.assertFalse(self.cache.edit(self.bot, 1, 10, 'menu'))
+        self.assertEqual(self.cache.stats()['not_modified'], 1)
+
+    def test_other_errors_forget_the_message(self):
+        self.cache.remember(1, 10, 'menu')
+        self.bot.error = 'Bad Request: message to edit not found'
+        with self.assertRaises(ApiTelegramException):
+            self.cache.edit(self.bot, 1, 10, 'other')
+        self.assertTrue(self.cache.edit(self.bot, 1, 10, 'menu'))
+
+
+
+class FakeSendBot:
+    """Records sends; the first call can be held until released or answered with a 429"""
+
+    def __init__(self):
+        self.sent = []
+        self.hold = None
+        self.throttle_once = False
+
+    def send_message(self, chat_id, text, **kwargs):
+        if self.hold is not None:
+            hold, self.hold = self.hold, None
+            hold.wait(5)
+        if self.throttle_once:
+            self.throttle_once = False
+            raise ApiTelegramException('sendMessage', None, {
+                'error_code': 429, 'description': 'Too Many Requests', 'parameters': {'retry_after': 0.01}})
+        self.sent.append((chat_id, text))
+        return len(self.sent)
+
+    def edit_message_text(self, text=None, chat_id=None, message_id=None, **kwargs):
+        self.sent.append((chat_id, text))
+        return text
+
+
+class TestOutboundQueue(unittest.TestCase):
+    """Test cases for the rate-limited Telegram send queue"""
+
+    def setUp(self):
+        self.bot = FakeSendBot()
+        self.queues = []
+
+    def tearDown(self):
+        for outbound in self.queues:
+            outbound.shutdown()
+
+    def make_queue(self, **kwargs):
+        options = dict(global_rate=0, chat_rate=0, workers=1)
+        options.update(kwargs)
+        outbound = OutboundQueue(self.bot, **options)
+        self.queues.append(outbound)
+        return outbound
+
+    def test_pending_edits_of_a_message_are_coalesced(self):
+        outbound = self.make_queue()
+        self.bot.hold = threading.Event()
+        first = outbound.send_message(1, 'busy', wait=False)
+        edits = [outbound.edit_message_text(f'v{n}', chat_id=1, message_id=5, wait=False) for n in range(3)]
+        self.bot.hold.set()
+
+        self.assertEqual(first.result(5), 1)
+        self.assertEqual([edit.result(5) for edit in edits], ['v2', 'v2', 'v2'])
+        self.assertEqual(self.bot.sent, [(1, 'busy'), (1, 'v2')])
+        self.assertEqual(outbound.stats()['coalesced'], 2)
+
+    def test_interactive_overtakes_background(self):
+        outbound = self.make_queue(global_rate=50, global_burst=1)
+        background = [outbound.send_message(chat, 'notice', priority=BACKGROUND, wait=False) for chat in range(1, 6)]
+        reply = outbound.send_message(99, 'reply', wait=False)
+        reply.result(5)
+        for future in background:
+            future.result(5)
+        self.assertLess(self.bot.sent.index((99, 'reply')), 3)
+
+    def test_per_chat_limit_and_order(self):
+        outbound = self.make_queue(chat_rate=20, chat_burst=1)
+        futures = [outbound.send_message(1, f'm{n}', wait=False) for n in range(3)]
+        futures.append(outbound.send_message(2, 'other', wait=False))
+        for future in futures:
+            future.result(5)
+        own = [text for chat_id, text in self.bot.sent if chat_id == 1]
+        self.assertEqual(own, ['m0', 'm1', 'm2'])
+        self.assertLess(self.bot.sent.index((2, 'other')), 3)
+        self.assertGreater(outbound.stats()['queue_delay_max_ms'], 0)
+
+    def test_throttled_send_is_retried(self):
+        outbound = self.make_queue()
+        self.bot.throttle_once = True
+        self.assertEqual(outbound.send_message(1, 'hello'), 1)
+        self.assertEqual(outbound.stats()['throttled'], 1)
+
+
+
+class TestChatSession(unittest.TestCase):
+    """Test cases for the compact per-chat session record"""
+
+    def test_round_trips_state_dict(self):
+        state = {'last_message_id': 7, 'role': 'manager', 'draft': {'step': 2}}
+        session = ChatSession.from_dict(state)
+        self.assertEqual(session.to_dict(), state)
+        self.assertEqual(session.role_level, ROLE_LEVELS['manager'])
+        self.assertIsNone(ChatSession(7, 'manager').extra)
+
+    def test_role_decodes_to_shared_string(self):
+        role = ''.join(['man', 'ager'])
+        self.assertIs(ChatSession(role=role).role, intern_role('manager'))
+
+    def test_role_outside_hierarchy_is_kept(self):
+        session = ChatSession(role='auditor')
+        self.assertEqual(session.role_level, 0)
+        self.assertEqual(session.role, 'auditor')
+        session.role = 'admin'
+        self.assertEqual(session.to_dict(), {'role': 'admin'})
+
+
+class TestMemoryStateStore(unittest.TestCase):
+    """Test cases for the bounded in-memory user state store"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = MemoryStateStore(max_size=2, ttl=10, clock=self.clock)
+
+    def test_update_merges_and_get_returns_copy(self):
+        self.store.update(1, {'role': 'manager'})
+        self.store.update(1, {'last_message_id': 5})
+        state = self.store.get(1)
+        state['role'] = 'admin'
+        self.assertEqual(self.store.get(1), {'role': 'manager', 'last_message_id': 5})
+
+    def test_least_recently_used_chat_is_evicted(self):
+        self.store.update(1, {'role': 'a'})
+        self.store.update(2, {'role': 'b'})
+        self.store.get(1)
+        self.store.update(3, {'role': 'c'})
+        self.assertEqual(self.store.get(2), {})
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.evictions, 1)
+
+    def test_idle_state_expires(self):
+        self.store.update(1, {'role': 'a'})
+        self.clock.now = 10
+        self.assertEqual(self.store.get(1), {})
+        self.store.update(1, {'last_message_id': 2})
+        self.assertEqual(self.store.get(1), {'last_message_id': 2})
+
+
+class TestSQLiteStateStore(unittest.TestCase):
+    """Test cases for the persistent SQLite user state store"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'state.db')
+        self.clock = FakeClock()
+        self.store = SQLiteStateStore(self.path, ttl=10, clock=self.clock)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_state_survives_reopening(self):
+        self.store.update(1, {'role': 'manager'})
+        self.store.update(1, {'last_message_id': 5})
+        self.store.close()
+        reopened = SQLiteStateStore(self.path, ttl=10, clock=self.clock)
+        self.assertEqual(reopened.get(1), {'role': 'manager', 'last_message_id': 5})
+        reopened.close()
+
+    def test_concurrent_updates_keep_every_key(self):
+        threads = [threading.Thread(target=self.store.update, args=(1, {f'key{n}': n})) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.store.get(1)), 8)
+
+    def test_expired_state_is_purged(self):
+        self.store.update(1, {'role': 'a'})
+        self.store.update(2, {'role': 'b'})
+        self.clock.now = 10
+        self.assertEqual(self.store.get(1), {})
+        self.assertEqual(self.store.purge_expired(), 2)
+        self.assertEqual(len(self.store), 0)
+
+    def test_updates_purge_expired_state(self):
+        store = SQLiteStateStore(self.path, ttl=10, clock=self.clock, purge_every=3)
+        store.update(1, {'role': 'a'})
+        store.update(2, {'role': 'b'})
+        self.clock.now = 10
+        self.assertEqual(len(store), 2)
+        store.update(3, {'role': 'c'})
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.purged, 2)
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+Declarative routing of inline keyboard callbacks
+Routes are compiled into dictionaries when handlers are decorated, so dispatch costs
+at most two dict lookups regardless of how many routes are registered
+"""
+
+import re
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.roles import UNKNOWN_LEVEL, role_level
+
+logger = logging.getLogger(__name__)
+
+# Converters for typed route parameters, e.g. "{prefix}_request_{request_id}" or "{page:int}"
+PARAM_CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    'str': str,
+    'int': int
+}
+
+_PARAM_PATTERN = re.compile(r'^(?P<head>.+)_\{(?P<name>\w+)(?::(?P<type>\w+))?\}$')
+
+
+class CallbackNotAllowed(PermissionError):
+    """
+    Raised when the user's role is below the level a callback route requires
+    """
+
+
+class CallbackContext:
+    """
+    Everything a route handler needs about the button press being handled
+    prefix is the role prefix the route was expanded for ("manager", "outs_manager", ...)
+    """
+
+    __slots__ = ('call', 'chat_id', 'message_id', 'user_role', 'prefix')
+
+    def __init__(self, call, chat_id: int, message_id: int, user_role: str, prefix: Optional[str] = None):
+        self.call = call
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.user_role = user_role
+        self.prefix = prefix
+
+
+class CallbackRouter:
+    """
+    Maps callback_data to handlers
+
+    A pattern is either a literal ("back_to_main") or a literal followed by one trailing
+    parameter ("{prefix}_request_{request_id}"). Parameter values are the text after the last
+    underscore, so they must not contain underscores themselves. "{prefix}" is expanded once
+    per entry of prefixes at registration time.
+
+    Every route also records the minimum role level allowed to use it: min_role when given,
+    otherwise the role that owns the route's prefix in prefix_roles, otherwise no restriction.
+    """
+
+    def __init__(self, prefix_roles: Optional[Dict[str, str]] = None):
+        self.prefix_levels = {prefix: role_level(role) for prefix, role in (prefix_roles or {}).items()}
+        self._exact: Dict[str, Tuple[Callable, Optional[str], int]] = {}
+        self._param: Dict[str, Tuple[Callable, Optional[str], int, str, Callable[[str], Any]]] = {}
+        self.unmatched = 0
+        self.rejected = 0
+
+    def route(self, pattern: str, prefixes: Sequence[str] = (), min_role: Optional[str] = None):
+        """
+        Decorator registering a handler for pattern; may be stacked for aliases
+        """
+        def decorator(handler: Callable) -> Callable:
+            self.add(pattern, handler, prefixes, min_role)
+            return handler
+        return decorator
+
+    def add(self, pattern: str, handler: Callable, prefixes: Sequence[str] = (), min_role: Optional[str] = None):
+        """
+        Register handler for pattern, once per prefix if the pattern contains {prefix}
+        """
+        if '{prefix}' in pattern:
+            if not prefixes:
+                raise ValueError(f"Route {pattern!r} needs prefixes")
+            for prefix in prefixes:
+                self._add_one(pattern.replace('{prefix}', prefix), handler, prefix, min_role)
+        else:
+            self._add_one(pattern, handler, None, min_role)
+
+    def resolve(self, data: str) -> Optional[Tuple[Callable, Optional[str], int, Dict[str, Any]]]:
+        """
+        Find the handler for callback data: (handler, prefix, min_level, params) or None
+        """
+        target = self._exact.get(data)
+        if target is not None:
+            return target[0], target[1], target[2], {}
+
+        head, _, value = data.rpartition('_')
+        target = self._param.get(head)
+        if target is None or not value:
+            return None
+        handler, prefix, min_level, name, convert = target
+        try:
+            return handler, prefix, min_level, {name: convert(value)}
+        except ValueError:
+            return None
+
+    def match(self, call, chat_id: int, message_id: int,
+              user_role: str) -> Optional[Tuple[Callable, CallbackContext, Dict[str, Any]]]:
+        """
+        Find and authorize the route for call.data without running it
+        Returns (handler, context, params), or None when no route matches. Raises
+        CallbackNotAllowed if the role is below the route's level.
+        """
+        resolved = self.resolve(call.data)
+        if resolved is None:
+            self.unmatched += 1
+            logger.debug(f"No route for callback {call.data!r}")
+            return None
+        handler, prefix, min_level, params = resolved
+        if role_level(user_role) < min_level:
+            self.rejected += 1
+            raise CallbackNotAllowed(f"Role {user_role!r} may not use {call.data!r}")
+        return handler, CallbackContext(call, chat_id, message_id, user_role, prefix), params
+
+    def dispatch(self, call, chat_id: int, message_id: int, user_role: str) -> bool:
+        """
+        Run the handler for call.data; returns False when no route matches
+        Raises CallbackNotAllowed, before the handler runs, if the role is below the route's level.
+        """
+        matched = self.match(call, chat_id, message_id, user_role)
+        if matched is None:
+            return False
+        handler, ctx, params = matched
+        handler(ctx, **params)
+        return True
+
+    def allowed(self, data: str, user_role: str) -> bool:
+        """
+        Whether a route exists for data and the role may use it
+        """
+        resolved = self.resolve(data)
+        return resolved is not None and role_level(user_role) >= resolved[2]
+
+    def routes(self) -> List[str]:
+        """
+        Every registered (prefix-expanded) pattern
+        """
+        return list(self._exact) + [f"{head}_{{{target[3]}}}" for head, target in self._param.items()]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Route count and dispatch failures
+        """
+        return {'routes': len(self), 'unmatched': self.unmatched, 'rejected': self.rejected}
+
+    def __len__(self) -> int:
+        return len(self._exact) + len(self._param)
+
+    def _add_one(self, pattern: str, handler: Callable, prefix: Optional[str], min_role: Optional[str]):
+        if min_role is not None:
+            min_level = role_level(min_role)
+            if min_level == UNKNOWN_LEVEL:
+                raise ValueError(f"Unknown role {min_role!r} for route {pattern!r}")
+        else:
+            min_level = self.prefix_levels.get(prefix, UNKNOWN_LEVEL)
+
+        if '{' not in pattern:
+            if pattern in self._exact:
+                raise ValueError(f"Duplicate route {pattern!r}")
+            self._exact[pattern] = (handler, prefix, min_level)
+            return
+
+        match = _PARAM_PATTERN.match(pattern)
+        if match is None or '{' in match.group('head'):
+            raise ValueError(f"Route {pattern!r} may only have one trailing parameter")
+        head, name = match.group('head'), match.group('name')
+        type_name = match.group('type') or 'str'
+        if type_name not in PARAM_CONVERTERS:
+            raise ValueError(f"Unknown parameter type {type_name!r} in route {pattern!r}")
+        if head in self._param:
+            raise ValueError(f"Duplicate route {pattern!r}")
+        self._param[head] = (handler, prefix, min_level, name, PARAM_CONVERTERS[type_name])
@@ -0,0 +1,133 @@
+"""
+Per-chat ordered, cross-chat parallel update dispatcher
+Updates from one chat run strictly one after another; different chats run in parallel
+"""
+
+import os
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from utils.worker_pool import BoundedWorkerPool
+
+logger = logging.getLogger(__name__)
+
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '8'))
+BOT_MAX_PENDING = int(os.getenv('BOT_MAX_PENDING', '1000'))
+
+
+def chat_id_of(update) -> Optional[int]:
+    """
+    Chat an incoming telebot Update belongs to, if any
+    """
+    if update.message is not None:
+        return update.message.chat.id
+    if update.callback_query is not None and update.callback_query.message is not None:
+        return update.callback_query.message.chat.id
+    return None
+
+
+class ChatDispatcher:
+    """
+    Keeps a FIFO per chat and lets at most one task per chat run at a time on a shared worker pool.
+    A chat that still has work after a task goes to the back of the pool queue, so a busy chat
+    cannot starve the others.
+    """
+
+    def __init__(self, workers: int = BOT_WORKERS, max_pending: int = BOT_MAX_PENDING,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_pending = max_pending
+        self._clock = clock
+        # The pool only ever holds one drain task per runnable chat; max_pending bounds the total
+        self._pool = BoundedWorkerPool(workers=workers, max_queue=0, name="chat-worker")
+        self._queues: Dict[object, Deque[Tuple[float, Callable, tuple]]] = {}
+        self._scheduled = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self.worst_wait = 0.0
+
+    def submit(self, chat_id, fn: Callable, *args) -> bool:
+        """
+        Queue fn(*args) behind earlier work for the same chat
+        Returns False when max_pending tasks are already waiting. A task that submits work
+        for its own chat runs it inline, since it already holds that chat's turn.
+        """
+        if chat_id is not None and getattr(self._local, 'chat_id', None) == chat_id:
+            fn(*args)
+            return True
+
+        # Updates without a chat have no ordering constraint
+        key = chat_id if chat_id is not None else object()
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._queues.setdefault(key, deque()).append((self._clock(), fn, args))
+            self.pending += 1
+            if key in self._scheduled:
+                return True
+            self._scheduled.add(key)
+        self._pool.submit(self._run_next, key)
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Backlog, rejection and worst-case wait statistics
+        """
+        with self._lock:
+            longest = max((len(tasks) for tasks in self._queues.values()), default=0)
+            return {
+                'pending': self.pending,
+                'max_pending': self.max_pending,
+                'active_chats': len(self._scheduled),
+                'longest_chat_queue': longest,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'worst_wait_ms': self.worst_wait * 1000,
+                'queue_depth': self._pool.stats()['queue_depth']
+            }
+
+    def chat_queue_lengths(self, top: int = 10) -> List[Tuple[object, int]]:
+        """
+        Chats with the most queued updates, longest first
+        """
+        with self._lock:
+            lengths = [(chat_id, len(tasks)) for chat_id, tasks in self._queues.items()
+                       if isinstance(chat_id, (int, str))]
+        return sorted(lengths, key=lambda item: item[1], reverse=True)[:top]
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the worker pool
+        """
+        self._pool.shutdown(wait=wait)
+
+    def _run_next(self, key):
+        with self._lock:
+            enqueued_at, fn, args = self._queues[key].popleft()
+            self.pending -= 1
+            self.worst_wait = max(self.worst_wait, self._clock() - enqueued_at)
+
+        self._local.chat_id = key
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Update handler for chat {key} failed: {e}")
+        finally:
+            self._local.chat_id = None
+
+        with self._lock:
+            self.completed += 1
+            if self._queues[key]:
+                reschedule = True
+            else:
+                del self._queues[key]
+                self._scheduled.discard(key)
+                reschedule = False
+        if reschedule:
+            self._pool.submit(self._run_next, key)
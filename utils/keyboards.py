@@ -0,0 +1,108 @@
+"""
+Prebuilt inline keyboards
+Keyboards are built and serialised to Telegram's JSON once; dynamic keyboards are kept in an
+LRU keyed by their content so repeated screens reuse the same serialised markup
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Sequence, Tuple
+
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+KEYBOARD_CACHE_SIZE = int(os.getenv('KEYBOARD_CACHE_SIZE', '1024'))
+
+# One keyboard row: (button text, callback data) pairs
+Row = Tuple[Tuple[str, str], ...]
+
+
+class PrebuiltKeyboard(InlineKeyboardMarkup):
+    """
+    InlineKeyboardMarkup that is serialised once at construction
+    Instances are shared between chats and must not be modified after they are built.
+    """
+
+    def __init__(self, rows: Sequence[Row]):
+        self._frozen = False
+        super().__init__()
+        for row in rows:
+            self.row(*(InlineKeyboardButton(text, callback_data=data) for text, data in row))
+        self.rows = tuple(rows)
+        self._json = super().to_json()
+        self._frozen = True
+
+    def to_json(self) -> str:
+        return self._json
+
+    def add(self, *args, **kwargs):
+        if self._frozen:
+            raise TypeError("Prebuilt keyboards are shared and cannot be modified")
+        return super().add(*args, **kwargs)
+
+
+class KeyboardCache:
+    """
+    LRU of PrebuiltKeyboard instances keyed by their rows
+    """
+
+    def __init__(self, max_size: int = KEYBOARD_CACHE_SIZE):
+        self.max_size = max_size
+        self._keyboards: "OrderedDict[Tuple[Row, ...], PrebuiltKeyboard]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, rows: Sequence[Row]) -> PrebuiltKeyboard:
+        """
+        Keyboard for rows, built and serialised only on a miss
+        """
+        key = tuple(rows)
+        with self._lock:
+            keyboard = self._keyboards.get(key)
+            if keyboard is not None:
+                self._keyboards.move_to_end(key)
+                self.hits += 1
+                return keyboard
+            self.misses += 1
+
+        keyboard = PrebuiltKeyboard(key)
+        with self._lock:
+            self._keyboards[key] = keyboard
+            if len(self._keyboards) > self.max_size:
+                self._keyboards.popitem(last=False)
+        return keyboard
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Size and hit statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._keyboards),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+
+_cache = KeyboardCache()
+
+
+def get_keyboard_cache() -> KeyboardCache:
+    """
+    Process-wide keyboard cache
+    """
+    return _cache
+
+
+def navigation_keyboard(buttons: Sequence[Tuple[str, str]], back_callback: str = "back_to_main") -> PrebuiltKeyboard:
+    """
+    Cached equivalent of create_navigation_keyboard: one button per row plus a back button
+    """
+    rows = tuple(((text, data),) for text, data in buttons) + ((("Назад", back_callback),),)
+    return _cache.get(rows)
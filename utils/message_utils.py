@@ -3,38 +3,156 @@ Message utilities for the Telegram bot
 Handles message editing, user states, and interactive elements
 """
 
-from telebot.types import InlineKeyboardMarkup
-from typing import Dict, Any
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InlineKeyboardMarkup, JsonSerializable
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
+from models.schemas import EMPLOYEE_SCHEMA, COMPANY_SCHEMA, SHIFT_SCHEMA, REQUEST_SCHEMA
+from utils.state_store import get_state_store
+import os
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Store user states globally (in production, use a database)
-user_states: Dict[int, Dict[str, Any]] = {}
+RENDERED_CACHE_SIZE = int(os.getenv('RENDERED_CACHE_SIZE', '10000'))
 
 def update_user_state(chat_id: int, message_id: int, data: Dict[str, Any]):
     """
     Update user state with new information
     """
-    if chat_id not in user_states:
-        user_states[chat_id] = {}
-    
-    user_states[chat_id].update({
+    get_state_store().update(chat_id, {
         'last_message_id': message_id,
         **data
     })
 
 def get_user_state(chat_id: int) -> Dict[str, Any]:
     """
-    Get user state
+    Get a copy of the user state; change it through update_user_state
     """
-    return user_states.get(chat_id, {})
+    return get_state_store().get(chat_id)
 
 def get_last_message_id(chat_id: int) -> int:
     """
     Get the last message ID for a user
     """
-    return user_states.get(chat_id, {}).get('last_message_id', None)
+    return get_state_store().get(chat_id).get('last_message_id', None)
+
+class RenderedMessageCache:
+    """
+    Remembers a hash of the text and keyboard last rendered into each (chat, message)
+    so that edits which would not change anything can be skipped locally
+    """
+
+    def __init__(self, max_size: int = RENDERED_CACHE_SIZE):
+        self.max_size = max_size
+        self._rendered: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.edits = 0
+        self.saved_calls = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def fingerprint(text: str, reply_markup=None) -> int:
+        if isinstance(reply_markup, JsonSerializable):
+            reply_markup = reply_markup.to_json()
+        return hash((text, reply_markup))
+
+    def is_current(self, chat_id: int, message_id: int, text: str, reply_markup=None) -> bool:
+        """
+        True (and counted as a saved call) if the message already shows this text and keyboard
+        """
+        fingerprint = self.fingerprint(text, reply_markup)
+        with self._lock:
+            if self._rendered.get((chat_id, message_id)) == fingerprint:
+                self._rendered.move_to_end((chat_id, message_id))
+                self.saved_calls += 1
+                return True
+            return False
+
+    def remember(self, chat_id: int, message_id: int, text: str, reply_markup=None):
+        """
+        Record what a message shows after it was sent or edited
+        """
+        fingerprint = self.fingerprint(text, reply_markup)
+        with self._lock:
+            self._rendered[(chat_id, message_id)] = fingerprint
+            self._rendered.move_to_end((chat_id, message_id))
+            if len(self._rendered) > self.max_size:
+                self._rendered.popitem(last=False)
+
+    def edit(self, bot, chat_id: int, message_id: int, text: str, reply_markup=None) -> bool:
+        """
+        bot.edit_message_text, short-circuited when the message would not change
+        """
+        if self.is_current(chat_id, message_id, text, reply_markup):
+            return False
+        try:
+            bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=reply_markup)
+            modified = True
+        except ApiTelegramException as e:
+            # Telegram rejects edits that change nothing; the message already shows what we want
+            if 'message is not modified' not in str(e.description):
+                self.forget(chat_id, message_id)
+                raise
+            modified = False
+        with self._lock:
+            if modified:
+                self.edits += 1
+            else:
+                self.not_modified += 1
+        self.remember(chat_id, message_id, text, reply_markup)
+        return True
+
+    async def edit_async(self, bot, chat_id: int, message_id: int, text: str, reply_markup=None) -> bool:
+        """
+        edit() for AsyncTeleBot, awaited on the event loop
+        """
+        if self.is_current(chat_id, message_id, text, reply_markup):
+            return False
+        try:
+            await bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, reply_markup=reply_markup)
+            modified = True
+        except ApiTelegramException as e:
+            if 'message is not modified' not in str(e.description):
+                self.forget(chat_id, message_id)
+                raise
+            modified = False
+        with self._lock:
+            if modified:
+                self.edits += 1
+            else:
+                self.not_modified += 1
+        self.remember(chat_id, message_id, text, reply_markup)
+        return True
+
+    def forget(self, chat_id: int, message_id: int):
+        """
+        Drop a message whose content was changed by code that bypasses the cache
+        """
+        with self._lock:
+            self._rendered.pop((chat_id, message_id), None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Edits sent, edits skipped locally and "message is not modified" replies
+        """
+        with self._lock:
+            return {
+                'tracked_messages': len(self._rendered),
+                'edits': self.edits,
+                'saved_calls': self.saved_calls,
+                'not_modified': self.not_modified
+            }
+
+rendered_messages = RenderedMessageCache()
+
+def edit_message(bot, chat_id: int, message_id: int, text: str, reply_markup=None) -> bool:
+    """
+    Edit a message unless it already shows exactly this text and keyboard
+    Returns True if an edit was sent to Telegram
+    """
+    return rendered_messages.edit(bot, chat_id, message_id, text, reply_markup)
 
 def create_back_button_keyboard() -> InlineKeyboardMarkup:
     """
@@ -63,59 +181,69 @@ def create_navigation_keyboard(buttons: list, back_callback: str = "back_to_main
     
     return keyboard
 
+# Readers for just the fields each card shows
+_read_employee_info = EMPLOYEE_SCHEMA.reader(['last_name', 'first_name', 'middle_name', 'birth_date', 'phone',
+                                              'telegram', 'company', 'role', 'status'])
+_read_company_info = COMPANY_SCHEMA.reader(['full_name', 'short_name', 'inn', 'actual_address', 'legal_address',
+                                            'director_fio'])
+_read_shift_info = SHIFT_SCHEMA.reader(['date', 'employee_name', 'start_time', 'end_time', 'vest_number', 'status'])
+_read_request_info = REQUEST_SCHEMA.reader(['title', 'object', 'required_employees', 'applied_employees',
+                                            'available_slots', 'status'])
+
 def format_employee_info(employee_data: Dict) -> str:
     """
-    Format employee information for display
+    Format employee information (the issue's customFields) for display
     """
+    employee = _read_employee_info(employee_data)
     return f"""
-ФИО: {employee_data.get('lastName', '')} {employee_data.get('firstName', '')} {employee_data.get('middleName', '')}
-Дата рождения: {employee_data.get('birthDate', '')}
-Телефон: {employee_data.get('phone', '')}
-Telegram: {employee_data.get('telegram', '')}
-Компания: {employee_data.get('company', '')}
-Роль: {employee_data.get('role', '')}
-Статус: {employee_data.get('status', '')}
+ФИО: {employee['last_name']} {employee['first_name']} {employee['middle_name']}
+Дата рождения: {employee['birth_date']}
+Телефон: {employee['phone']}
+Telegram: {employee['telegram']}
+Компания: {employee['company']}
+Роль: {employee['role']}
+Статус: {employee['status']}
     """.strip()
 
 def format_company_info(company_data: Dict) -> str:
     """
-    Format company information for display
+    Format company information (the issue's customFields) for display
     """
+    company = _read_company_info(company_data)
     return f"""
-Полное наименование: {company_data.get('fullName', '')}
-Сокращенное наименование: {company_data.get('shortName', '')}
-ИНН: {company_data.get('inn', '')}
-Фактический адрес: {company_data.get('actualAddress', '')}
-Юридический адрес: {company_data.get('legalAddress', '')}
-Руководитель: {company_data.get('directorFio', '')}
+Полное наименование: {company['full_name']}
+Сокращенное наименование: {company['short_name']}
+ИНН: {company['inn']}
+Фактический адрес: {company['actual_address']}
+Юридический адрес: {company['legal_address']}
+Руководитель: {company['director_fio']}
     """.strip()
 
 def format_shift_info(shift_data: Dict) -> str:
     """
-    Format shift information for display
+    Format shift information (the issue's customFields) for display
     """
+    shift = _read_shift_info(shift_data)
     return f"""
-Дата: {shift_data.get('date', '')}
-Сотрудник: {shift_data.get('employeeName', '')}
-Время начала: {shift_data.get('startTime', '')}
-Время окончания: {shift_data.get('endTime', '')}
-Номер жилета: {shift_data.get('vestNumber', '')}
-Статус: {shift_data.get('status', '')}
+Дата: {shift['date']}
+Сотрудник: {shift['employee_name']}
+Время начала: {shift['start_time']}
+Время окончания: {shift['end_time']}
+Номер жилета: {shift['vest_number']}
+Статус: {shift['status']}
     """.strip()
 
 def format_request_info(request_data: Dict) -> str:
     """
-    Format request information for display
+    Format request information (the issue's customFields) for display
     """
-    applied_count = len(request_data.get('appliedEmployees', []))
-    required_count = request_data.get('requiredEmployees', 0)
-    available_slots = request_data.get('availableSlots', 0)
+    request = _read_request_info(request_data)
     
     return f"""
-Заголовок: {request_data.get('title', '')}
-Объект: {request_data.get('object', '')}
-Необходимо сотрудников: {required_count}
-Заявлено сотрудников: {applied_count}
-Свободных мест: {available_slots}
-Статус: {request_data.get('status', '')}
+Заголовок: {request['title']}
+Объект: {request['object']}
+Необходимо сотрудников: {request['required_employees']}
+Заявлено сотрудников: {len(request['applied_employees'])}
+Свободных мест: {request['available_slots']}
+Статус: {request['status']}
     """.strip()
\ No newline at end of file
@@ -0,0 +1,282 @@
+"""
+Rate-limit-aware outbound queue for Telegram API calls
+Keeps sends under Telegram's global and per-chat limits, lets interactive replies overtake
+background notifications and collapses pending edits of the same message into the latest one
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from telebot.apihelper import ApiTelegramException
+
+from models.resilience import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows about 30 messages per second overall and about 1 per second in one chat
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+OUTBOUND_WORKERS = int(os.getenv('OUTBOUND_WORKERS', '4'))
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '3'))
+
+# Lower value is sent first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Idle chats whose limiter state is dropped once this many chats are tracked
+MAX_IDLE_CHATS = 10000
+
+
+class _Outbound:
+    __slots__ = ('priority', 'seq', 'chat_id', 'fn', 'args', 'kwargs', 'futures', 'enqueued_at',
+                 'coalesce_key', 'attempts')
+
+    def __init__(self, priority, seq, chat_id, fn, args, kwargs, enqueued_at, coalesce_key):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.futures: List[Future] = [Future()]
+        self.enqueued_at = enqueued_at
+        self.coalesce_key = coalesce_key
+        self.attempts = 0
+
+
+class _ChatState:
+    __slots__ = ('queue', 'bucket', 'in_flight', 'last_sent')
+
+    def __init__(self, bucket: TokenBucket):
+        self.queue: Deque[_Outbound] = deque()
+        self.bucket = bucket
+        self.in_flight = False
+        self.last_sent = 0.0
+
+
+class OutboundQueue:
+    """
+    Sends Telegram API calls through a global and a per-chat token bucket
+
+    Messages of one chat go out in order and one at a time; across chats the oldest
+    interactive message is sent first, background ones when there is spare capacity.
+    submit() returns a Future with the API call's result.
+    """
+
+    def __init__(self, bot, global_rate: float = TELEGRAM_GLOBAL_RATE, global_burst: Optional[float] = None,
+                 chat_rate: float = TELEGRAM_CHAT_RATE, chat_burst: float = TELEGRAM_CHAT_BURST,
+                 workers: int = OUTBOUND_WORKERS,
+                 max_retries: int = OUTBOUND_MAX_RETRIES, clock: Callable[[], float] = time.monotonic):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._clock = clock
+        self._global = TokenBucket(rate=global_rate, capacity=global_burst or max(1.0, global_rate), clock=clock)
+        self._chats: Dict[object, _ChatState] = {}
+        # (priority, seq, chat_id) of each chat's head message that may be sent next
+        self._ready: List[Tuple[int, int, object]] = []
+        self._pending_edits: Dict[Tuple[object, int], _Outbound] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="telegram-out")
+        self._delays: Deque[float] = deque(maxlen=1000)
+        self._running = True
+        self.pending = 0
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.max_delay = 0.0
+        self._scheduler = threading.Thread(target=self._schedule, name="telegram-out-scheduler", daemon=True)
+        self._scheduler.start()
+
+    def submit(self, chat_id, fn: Callable, /, *args, priority: int = INTERACTIVE,
+               coalesce_key: Optional[Tuple[object, int]] = None, **kwargs) -> Future:
+        """
+        Queue fn(*args, **kwargs) for chat_id
+        A call with the coalesce_key of a still-pending call replaces that call's arguments;
+        both callers then receive the result of the latest one.
+        """
+        with self._cond:
+            if coalesce_key is not None:
+                item = self._pending_edits.get(coalesce_key)
+                if item is not None:
+                    item.args, item.kwargs = args, kwargs
+                    item.priority = min(item.priority, priority)
+                    future = Future()
+                    item.futures.append(future)
+                    self.coalesced += 1
+                    return future
+
+            item = _Outbound(priority, next(self._seq), chat_id, fn, args, kwargs, self._clock(), coalesce_key)
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = _ChatState(
+                    TokenBucket(rate=self.chat_rate, capacity=self.chat_burst, clock=self._clock))
+            chat.queue.append(item)
+            if coalesce_key is not None:
+                self._pending_edits[coalesce_key] = item
+            self.pending += 1
+            if len(chat.queue) == 1 and not chat.in_flight:
+                heapq.heappush(self._ready, (item.priority, item.seq, chat_id))
+            self._cond.notify()
+            return item.futures[0]
+
+    def send_message(self, chat_id, text: str, priority: int = INTERACTIVE, wait: bool = True, **kwargs):
+        """
+        bot.send_message through the queue; returns the Message, or a Future if wait is False
+        """
+        future = self.submit(chat_id, self.bot.send_message, chat_id, text, priority=priority, **kwargs)
+        return future.result() if wait else future
+
+    def edit_message_text(self, text: str = None, chat_id=None, message_id: int = None,
+                          priority: int = INTERACTIVE, wait: bool = True, **kwargs):
+        """
+        bot.edit_message_text through the queue; pending edits of the same message are coalesced
+        """
+        future = self.submit(chat_id, self.bot.edit_message_text, priority=priority,
+                             coalesce_key=(chat_id, message_id),
+                             text=text, chat_id=chat_id, message_id=message_id, **kwargs)
+        return future.result() if wait else future
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Backlog, throughput and queue delay statistics
+        """
+        with self._cond:
+            delays = sorted(self._delays)
+            return {
+                'pending': self.pending,
+                'chats': len(self._chats),
+                'sent': self.sent,
+                'failed': self.failed,
+                'coalesced': self.coalesced,
+                'throttled': self.throttled,
+                'queue_delay_p50_ms': delays[len(delays) // 2] * 1000 if delays else 0.0,
+                'queue_delay_p99_ms': delays[int(len(delays) * 0.99)] * 1000 if delays else 0.0,
+                'queue_delay_max_ms': self.max_delay * 1000
+            }
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop scheduling; messages already handed to the senders still go out
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._scheduler.join()
+        self._executor.shutdown(wait=wait)
+
+    def _schedule(self):
+        while True:
+            with self._cond:
+                while self._running and not self._ready:
+                    self._cond.wait()
+                if not self._running:
+                    return
+            # Take the global token before choosing, so that whatever arrived meanwhile competes
+            # on priority. If every waiting chat is over its own limit the token is wasted, which
+            # costs at most one send per chat-limit wait.
+            self._global.acquire()
+            with self._cond:
+                item, wait = self._next_ready()
+                if item is None:
+                    self._cond.wait(wait)
+                    continue
+            self._executor.submit(self._deliver, item)
+
+    def _next_ready(self) -> Tuple[Optional[_Outbound], Optional[float]]:
+        """
+        Pop the first chat head whose chat limit allows sending now, or return how long to wait
+        """
+        deferred = []
+        wait = None
+        item = None
+        while self._ready:
+            entry = heapq.heappop(self._ready)
+            chat = self._chats[entry[2]]
+            delay = chat.bucket.try_acquire()
+            if delay > 0:
+                deferred.append(entry)
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            item = chat.queue.popleft()
+            chat.in_flight = True
+            if item.coalesce_key is not None:
+                self._pending_edits.pop(item.coalesce_key, None)
+            self.pending -= 1
+            delay = self._clock() - item.enqueued_at
+            self._delays.append(delay)
+            self.max_delay = max(self.max_delay, delay)
+            break
+        for entry in deferred:
+            heapq.heappush(self._ready, entry)
+        return item, wait
+
+    def _deliver(self, item: _Outbound):
+        item.attempts += 1
+        try:
+            result = item.fn(*item.args, **item.kwargs)
+        except ApiTelegramException as e:
+            if e.error_code == 429 and item.attempts <= self.max_retries:
+                retry_after = (e.result_json.get('parameters') or {}).get('retry_after', 1)
+                logger.warning(f"Telegram throttled chat {item.chat_id}, retrying in {retry_after} s")
+                self._requeue(item, retry_after)
+                return
+            self._finish(item, error=e)
+        except Exception as e:
+            self._finish(item, error=e)
+        else:
+            self._finish(item, result=result)
+
+    def _requeue(self, item: _Outbound, retry_after: float):
+        with self._cond:
+            self.throttled += 1
+            chat = self._chats[item.chat_id]
+            chat.bucket.pause(retry_after)
+            chat.queue.appendleft(item)
+            chat.in_flight = False
+            self.pending += 1
+            if item.coalesce_key is not None:
+                self._pending_edits.setdefault(item.coalesce_key, item)
+            heapq.heappush(self._ready, (item.priority, item.seq, item.chat_id))
+            self._cond.notify()
+
+    def _finish(self, item: _Outbound, result=None, error: Optional[Exception] = None):
+        with self._cond:
+            if error is None:
+                self.sent += 1
+            else:
+                self.failed += 1
+            chat = self._chats[item.chat_id]
+            chat.in_flight = False
+            chat.last_sent = self._clock()
+            if chat.queue:
+                head = chat.queue[0]
+                heapq.heappush(self._ready, (head.priority, head.seq, item.chat_id))
+                self._cond.notify()
+            elif len(self._chats) > MAX_IDLE_CHATS:
+                self._prune_idle_chats()
+
+        for future in item.futures:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _prune_idle_chats(self):
+        # A chat idle for burst / rate seconds has a full bucket again, so forgetting it is harmless
+        idle_for = self.chat_burst / self.chat_rate if self.chat_rate > 0 else 0
+        now = self._clock()
+        for chat_id in [chat_id for chat_id, chat in self._chats.items()
+                        if not chat.queue and not chat.in_flight and now - chat.last_sent >= idle_for]:
+            del self._chats[chat_id]
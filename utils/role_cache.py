@@ -0,0 +1,142 @@
+"""
+Bounded TTL + LRU cache of user roles keyed by Telegram ID
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from utils.roles import intern_role
+
+ROLE_CACHE_SIZE = int(os.getenv('ROLE_CACHE_SIZE', '10000'))
+ROLE_CACHE_TTL = float(os.getenv('ROLE_CACHE_TTL', '300'))
+# Unknown users are cached for a shorter time so that new hires are picked up quickly
+ROLE_CACHE_NEGATIVE_TTL = float(os.getenv('ROLE_CACHE_NEGATIVE_TTL', '60'))
+
+# Returned by RoleCache.get when nothing usable is cached
+MISSING = object()
+
+
+class RoleCache:
+    """
+    LRU cache of Telegram ID -> role with per-entry expiry
+    A cached role of None means "looked up, no employee found" (negative entry)
+    """
+
+    def __init__(self, max_size: int = ROLE_CACHE_SIZE, ttl: float = ROLE_CACHE_TTL,
+                 negative_ttl: float = ROLE_CACHE_NEGATIVE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        # telegram_id -> (role, employee_key, expires_at)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_employee: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, telegram_id: str):
+        """
+        Get the cached role, None for a cached unknown user, or MISSING
+        """
+        key = str(telegram_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            role, employee_key, expires_at = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            if role is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return role
+
+    def put(self, telegram_id: str, role: str, employee_key: Optional[str] = None):
+        """
+        Cache the role of a known employee
+        """
+        self._store(str(telegram_id), intern_role(role), employee_key, self.ttl)
+
+    def put_unknown(self, telegram_id: str, employee_key: Optional[str] = None):
+        """
+        Remember that no active employee matches this Telegram ID
+        employee_key names an inactive employee found for it, so an update to them drops the entry
+        """
+        self._store(str(telegram_id), None, employee_key, self.negative_ttl)
+
+    def invalidate(self, telegram_id: str):
+        """
+        Drop the cached role for a Telegram ID
+        """
+        with self._lock:
+            if self._remove(str(telegram_id)):
+                self.invalidations += 1
+
+    def invalidate_employee(self, employee_key: str):
+        """
+        Drop the cached role that was resolved from the given employee issue
+        """
+        with self._lock:
+            telegram_id = self._by_employee.get(employee_key)
+            if telegram_id is not None and self._remove(telegram_id):
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Drop every cached role
+        """
+        with self._lock:
+            self._entries.clear()
+            self._by_employee.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Hit/miss counters and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': (self.hits + self.negative_hits) / lookups if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: str, role: Optional[str], employee_key: Optional[str], ttl: float):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (role, employee_key, self._clock() + ttl)
+            if employee_key:
+                self._by_employee[employee_key] = key
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        employee_key = entry[1]
+        if employee_key and self._by_employee.get(employee_key) == key:
+            del self._by_employee[employee_key]
+        return True
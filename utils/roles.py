@@ -0,0 +1,40 @@
+"""
+Role names and their small-int levels
+Levels follow the role hierarchy used for permission checks: higher includes lower
+"""
+
+import sys
+from typing import Dict, Tuple
+
+ROLE_LEVELS: Dict[str, int] = {
+    'admin': 7,
+    'manager': 6,
+    'shift_supervisor': 5,
+    'employee': 4,
+    'outs_staff_manager': 3,
+    'brigadier': 2,
+    'outs_employee': 1
+}
+
+# Level 0 is an unknown or missing role
+UNKNOWN_LEVEL = 0
+
+# Role name by level, so a level decodes back to the one shared string object
+ROLE_NAMES: Tuple = (None,) + tuple(sorted(ROLE_LEVELS, key=ROLE_LEVELS.get))
+
+
+def role_level(role) -> int:
+    """
+    Level of a role name, UNKNOWN_LEVEL for anything not in the hierarchy
+    """
+    return ROLE_LEVELS.get(role, UNKNOWN_LEVEL)
+
+
+def intern_role(role):
+    """
+    Canonical shared string for a role name read from Tracker or storage
+    """
+    if role is None:
+        return None
+    level = ROLE_LEVELS.get(role)
+    return ROLE_NAMES[level] if level else sys.intern(str(role))
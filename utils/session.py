@@ -0,0 +1,77 @@
+"""
+Compact per-chat session record
+Replaces a free-form dict per chat with fixed slots; the role is kept as its small-int level
+"""
+
+from typing import Any, Dict, Optional
+
+from utils.roles import ROLE_NAMES, UNKNOWN_LEVEL, intern_role, role_level
+
+
+class ChatSession:
+    """
+    State remembered for one chat
+
+    last_message_id and role have dedicated slots; anything else handlers store goes to extra,
+    which is only allocated when used. expires_at belongs to the store holding the session.
+    """
+
+    __slots__ = ('last_message_id', 'role_level', 'expires_at', 'extra')
+
+    def __init__(self, last_message_id: Optional[int] = None, role: Optional[str] = None,
+                 expires_at: float = 0.0):
+        self.last_message_id = last_message_id
+        self.role_level = UNKNOWN_LEVEL
+        self.expires_at = expires_at
+        self.extra: Optional[Dict[str, Any]] = None
+        if role is not None:
+            self.role = role
+
+    @property
+    def role(self) -> Optional[str]:
+        if self.role_level:
+            return ROLE_NAMES[self.role_level]
+        return self.extra.get('role') if self.extra else None
+
+    @role.setter
+    def role(self, role: Optional[str]):
+        self.role_level = role_level(role)
+        if self.extra:
+            self.extra.pop('role', None)
+        if not self.role_level and role is not None:
+            # Roles outside the hierarchy are rare; keep their interned name as an extra field
+            self._set_extra('role', intern_role(role))
+
+    def update(self, data: Dict[str, Any]):
+        """
+        Merge a state dict into the session
+        """
+        for key, value in data.items():
+            if key == 'last_message_id':
+                self.last_message_id = value
+            elif key == 'role':
+                self.role = value
+            else:
+                self._set_extra(key, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The session as the state dict handlers work with
+        """
+        state = dict(self.extra) if self.extra else {}
+        if self.last_message_id is not None:
+            state['last_message_id'] = self.last_message_id
+        if self.role_level:
+            state['role'] = ROLE_NAMES[self.role_level]
+        return state
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ChatSession':
+        session = cls()
+        session.update(data)
+        return session
+
+    def _set_extra(self, key: str, value: Any):
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
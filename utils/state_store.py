@@ -0,0 +1,234 @@
+"""
+Per-chat user state storage
+An in-memory LRU+TTL store for a single process and a SQLite (WAL) store that survives
+restarts and can be shared by several worker processes on one host
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from utils.session import ChatSession
+
+logger = logging.getLogger(__name__)
+
+# memory or sqlite
+STATE_STORE = os.getenv('STATE_STORE', 'memory')
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'user_state.db')
+STATE_CACHE_SIZE = int(os.getenv('STATE_CACHE_SIZE', '100000'))
+# Seconds of inactivity after which a chat's state is forgotten (0 keeps it forever)
+STATE_TTL = float(os.getenv('STATE_TTL', '86400'))
+# The SQLite store deletes expired chats once every this many updates
+STATE_PURGE_EVERY = int(os.getenv('STATE_PURGE_EVERY', '1000'))
+
+
+class StateStore(ABC):
+    """
+    Key-value store of per-chat state dictionaries
+    """
+
+    @abstractmethod
+    def get(self, chat_id: int) -> Dict[str, Any]:
+        """
+        Copy of the chat's state, or an empty dict
+        """
+
+    @abstractmethod
+    def update(self, chat_id: int, data: Dict[str, Any]):
+        """
+        Merge data into the chat's state
+        """
+
+    @abstractmethod
+    def delete(self, chat_id: int):
+        """
+        Forget the chat's state
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """
+        Number of chats with stored state
+        """
+
+    def close(self):
+        """
+        Release resources held by the store
+        """
+
+
+class MemoryStateStore(StateStore):
+    """
+    Bounded in-process store: least recently used chats are evicted beyond max_size,
+    and state untouched for ttl seconds is dropped
+    Chats are kept as compact ChatSession records rather than dicts.
+    """
+
+    def __init__(self, max_size: int = STATE_CACHE_SIZE, ttl: float = STATE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._sessions: "OrderedDict[int, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, chat_id: int) -> Dict[str, Any]:
+        with self._lock:
+            session = self._sessions.get(chat_id)
+            if session is None:
+                return {}
+            if self.ttl and session.expires_at <= self._clock():
+                del self._sessions[chat_id]
+                return {}
+            self._sessions.move_to_end(chat_id)
+            return session.to_dict()
+
+    def update(self, chat_id: int, data: Dict[str, Any]):
+        with self._lock:
+            session = self._sessions.pop(chat_id, None)
+            if session is None or (self.ttl and session.expires_at <= self._clock()):
+                session = ChatSession()
+            session.update(data)
+            session.expires_at = self._clock() + self.ttl
+            self._sessions[chat_id] = session
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, chat_id: int):
+        with self._lock:
+            self._sessions.pop(chat_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Persistent store in a SQLite database in WAL mode
+    Each thread gets its own connection; WAL lets readers proceed while one writer commits.
+    Expired chats are deleted every purge_every updates, so the table stays bounded by the
+    chats active within ttl.
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH, ttl: float = STATE_TTL,
+                 clock: Callable[[], float] = time.time, purge_every: int = STATE_PURGE_EVERY):
+        self.path = path
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._clock = clock
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self.purged = 0
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS user_state ("
+            "chat_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS user_state_updated ON user_state (updated)")
+
+    def get(self, chat_id: int) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT data, updated FROM user_state WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        if row is None or (self.ttl and row[1] + self.ttl <= self._clock()):
+            return {}
+        return json.loads(row[0])
+
+    def update(self, chat_id: int, data: Dict[str, Any]):
+        connection = self._connection()
+        # IMMEDIATE takes the write lock up front, so concurrent writers never lose each other's keys
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            state = self.get(chat_id)
+            state.update(data)
+            connection.execute(
+                "INSERT OR REPLACE INTO user_state (chat_id, data, updated) VALUES (?, ?, ?)",
+                (chat_id, json.dumps(state, ensure_ascii=False), self._clock())
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        with self._writes_lock:
+            self._writes += 1
+            due = self.purge_every > 0 and self._writes % self.purge_every == 0
+        if due:
+            self.purge_expired()
+
+    def delete(self, chat_id: int):
+        self._connection().execute("DELETE FROM user_state WHERE chat_id = ?", (chat_id,))
+
+    def purge_expired(self) -> int:
+        """
+        Delete state untouched for ttl seconds; returns the number of chats removed
+        """
+        if not self.ttl:
+            return 0
+        cursor = self._connection().execute("DELETE FROM user_state WHERE updated <= ?", (self._clock() - self.ttl,))
+        with self._writes_lock:
+            self.purged += cursor.rowcount
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM user_state").fetchone()[0]
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit; update() manages its own transaction
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+
+def create_state_store(kind: str = STATE_STORE) -> StateStore:
+    """
+    Build the store selected by STATE_STORE
+    """
+    if kind == 'sqlite':
+        return SQLiteStateStore()
+    if kind != 'memory':
+        logger.warning(f"Unknown STATE_STORE {kind!r}, using memory")
+    return MemoryStateStore()
+
+
+_store: Optional[StateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """
+    Process-wide state store, created on first use
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_state_store()
+    return _store
+
+
+def set_state_store(store: Optional[StateStore]):
+    """
+    Replace the process-wide store (None recreates it from the environment on next use)
+    """
+    global _store
+    with _store_lock:
+        _store = store
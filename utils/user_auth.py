@@ -5,50 +5,87 @@ User authentication and role management utilities
 import os
 from typing import Dict, Optional
 from models.tracker_integration import EmployeeManager
+from models.employee_index import EmployeeIndex
+from models.registry import get_or_create, get_employee_manager, get_employee_index
+from utils.role_cache import RoleCache, MISSING
+from utils.roles import role_level
+
+# Employee statuses that keep their role; anyone else (fired, blocked, ...) is treated as unknown
+ACTIVE_EMPLOYEE_STATUSES = frozenset(
+    status.strip() for status in os.getenv('ACTIVE_EMPLOYEE_STATUSES', 'active').split(',') if status.strip()
+)
 
 class UserRoleManager:
     """
     Manages user roles and permissions based on Yandex Tracker data
     """
     
-    def __init__(self):
-        self.employee_manager = EmployeeManager()
+    def __init__(self, employee_manager: Optional[EmployeeManager] = None,
+                 role_cache: Optional[RoleCache] = None,
+                 employee_index: Optional[EmployeeIndex] = None):
+        self.employee_manager = employee_manager or get_employee_manager()
+        # Both define __len__, so an empty one passed in is falsy: test against None
+        self.employee_index = employee_index if employee_index is not None else get_employee_index()
+        self.role_cache = role_cache if role_cache is not None else RoleCache()
+        self.employee_manager.add_update_listener(self._on_employee_updated)
+    
+    def _on_employee_updated(self, employee_id: str, employee_data: Dict):
+        """
+        Drop cached roles affected by an employee update
+        """
+        self.role_cache.invalidate_employee(employee_id)
+        if employee_data.get('telegram'):
+            self.role_cache.invalidate(employee_data['telegram'])
     
     def get_user_role(self, telegram_id: str) -> Optional[str]:
         """
         Get user role based on their Telegram ID from Yandex Tracker
-        In a real implementation, this would search for an employee with this telegram ID
+        Looks in the role cache first, then in the EMP queue index
         """
         # Check if this is the admin user
         admin_telegram_id = os.getenv('ADMIN_TELEGRAM_ID')
         if admin_telegram_id and str(telegram_id) == str(admin_telegram_id):
             return 'admin'
         
-        # In a real implementation, we would search for an employee with this telegram ID
-        # For now, returning a default role for demonstration
-        # This is a simplified implementation - in reality, you'd search in Yandex Tracker
-        # for an employee record that has this telegram_id
+        # Serve from the role cache; a cached None means no employee was found
+        cached_role = self.role_cache.get(telegram_id)
+        if cached_role is not MISSING:
+            return cached_role or 'employee'
+        
         try:
             # Search for employee with matching telegram ID
-            # This is a placeholder implementation
             employees = self.search_employees_by_telegram_id(telegram_id)
-            if employees:
-                # Return the role of the first matching employee
-                # In real implementation, you'd get this from the employee record
-                return employees[0].get('role', 'employee')
-            return 'employee'  # Default role
         except Exception:
+            # Errors are not cached so the next callback retries the lookup
             return 'employee'  # Default role if error occurs
+        
+        if employees and employees[0].get('status') in ACTIVE_EMPLOYEE_STATUSES:
+            # Return the role of the first matching employee; an empty role field means the default
+            role = employees[0].get('role') or 'employee'
+            self.role_cache.put(telegram_id, role, employees[0].get('id'))
+            return role
+        
+        if employees:
+            # Inactive employees get no more than unknown users; keyed so reactivation drops the entry
+            self.role_cache.put_unknown(telegram_id, employees[0].get('id'))
+            return 'employee'
+        
+        if not self.employee_index.loaded:
+            # The index is still loading in the background: answer with the default, remember nothing
+            return 'employee'
+        self.role_cache.put_unknown(telegram_id)
+        return 'employee'  # Default role
     
     def search_employees_by_telegram_id(self, telegram_id: str) -> list:
         """
-        Search for employees by Telegram ID in Yandex Tracker
-        This is a placeholder method - in real implementation it would query the tracker
+        Search for employees by Telegram ID
+        Served from the local EMP queue index rather than a tracker query per lookup;
+        empty while the index is still loading
         """
-        # In a real implementation, this would query Yandex Tracker for employees
-        # with the matching telegram ID
-        # For now, returning a mock result
-        return [{'role': 'employee', 'id': f'EMP-{telegram_id}'}]
+        entry = self.employee_index.lookup(telegram_id)
+        if entry is None:
+            return []
+        return [{'role': entry['role'], 'status': entry['status'], 'id': entry['key']}]
     
     def has_permission(self, user_role: str, required_role: str) -> bool:
         """
@@ -62,24 +99,16 @@ class UserRoleManager:
         - brigadier
         - outs_employee
         """
-        role_hierarchy = {
-            'admin': 7,
-            'manager': 6,
-            'shift_supervisor': 5,
-            'employee': 4,
-            'outs_staff_manager': 3,
-            'brigadier': 2,
-            'outs_employee': 1
-        }
-        
-        user_level = role_hierarchy.get(user_role, 0)
-        required_level = role_hierarchy.get(required_role, 0)
-        
-        return user_level >= required_level
+        return role_level(user_role) >= role_level(required_role)
+
+def get_user_role_manager() -> UserRoleManager:
+    """
+    Get the shared role manager from the process-wide registry
+    """
+    return get_or_create('user_role_manager', UserRoleManager)
 
 def get_user_role_from_tracker(telegram_id: str) -> str:
     """
     Convenience function to get user role from tracker
     """
-    role_manager = UserRoleManager()
-    return role_manager.get_user_role(telegram_id)
\ No newline at end of file
+    return get_user_role_manager().get_user_role(telegram_id)
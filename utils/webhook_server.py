@@ -0,0 +1,120 @@
+"""
+Minimal Telegram webhook server
+Accepts updates over HTTP and hands them to a bounded worker pool; answers 503 when it is full
+"""
+
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from telebot.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Telegram updates are small; refuse anything suspiciously large
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    HTTP server for Telegram webhook deliveries
+
+    submit_update(update) must return quickly: True if the update was queued, False to shed load.
+    Telegram re-delivers updates that were not answered with 2xx, so a 503 is safe backpressure.
+    Every delivery must carry secret_token in X-Telegram-Bot-Api-Secret-Token; without it anyone
+    who can reach the port could post updates on behalf of any user, so the secret is required.
+    GET /metrics returns stats_provider() as JSON and needs the same secret header: behind a local
+    reverse proxy every client looks like loopback, so the peer address proves nothing.
+    Each request gets its own thread, so a slow scrape never holds up delivery.
+    """
+
+    def __init__(self, submit_update: Callable[[Update], bool], host: str = '0.0.0.0', port: int = 8443,
+                 path: str = '/telegram/webhook', secret_token: Optional[str] = None,
+                 stats_provider: Optional[Callable[[], Dict]] = None):
+        if not secret_token:
+            raise ValueError("A webhook secret token is required")
+        self.submit_update = submit_update
+        self.path = path
+        self.secret_token = secret_token
+        self.stats_provider = stats_provider or dict
+        self.accepted = 0
+        self.rejected = 0
+        self.invalid = 0
+        self._counter_lock = threading.Lock()
+        super().__init__((host, port), _WebhookRequestHandler)
+
+    def count(self, counter: str):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict:
+        """
+        Webhook counters merged with the dispatcher statistics
+        """
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'invalid': self.invalid,
+            **self.stats_provider()
+        }
+
+
+class _WebhookRequestHandler(BaseHTTPRequestHandler):
+    server: WebhookServer
+
+    def _has_secret(self) -> bool:
+        received = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        return hmac.compare_digest(received.encode(), self.server.secret_token.encode())
+
+    def do_POST(self):
+        if self.path != self.server.path:
+            self._reply(404)
+            return
+        if not self._has_secret():
+            self._reply(403)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > MAX_BODY_SIZE:
+            self.server.count('invalid')
+            self._reply(400)
+            return
+        try:
+            update = Update.de_json(self.rfile.read(length).decode('utf-8'))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # A body that is valid JSON but not an update object (e.g. an array) lands here too
+            logger.warning(f"Malformed webhook update: {e}")
+            self.server.count('invalid')
+            self._reply(400)
+            return
+
+        if self.server.submit_update(update):
+            self.server.count('accepted')
+            self._reply(200)
+        else:
+            self.server.count('rejected')
+            self._reply(503, headers={'Retry-After': '1'})
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self._reply(404)
+        elif self._has_secret():
+            self._reply(200, self.server.stats())
+        else:
+            self._reply(403)
+
+    def _reply(self, status: int, payload: Optional[Dict] = None, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload if payload is not None else {}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("webhook: " + format % args)
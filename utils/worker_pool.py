@@ -0,0 +1,85 @@
+"""
+Bounded thread worker pool with backpressure
+submit() refuses work instead of queueing without limit when the bot falls behind
+"""
+
+import queue
+import threading
+import logging
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedWorkerPool:
+    """
+    Fixed number of worker threads fed from a queue of at most max_queue pending tasks
+    """
+
+    def __init__(self, workers: int = 8, max_queue: int = 1000, name: str = "worker"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        for number in range(workers):
+            thread = threading.Thread(target=self._work, name=f"{name}-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn: Callable, *args) -> bool:
+        """
+        Queue fn(*args); returns False (and counts a rejection) when the queue is full
+        """
+        try:
+            self._queue.put_nowait((fn, args))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Queue depth and task counters
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_depth': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'failed': self.failed
+            }
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the workers once the tasks already queued have run
+        """
+        for _ in self._threads:
+            self._queue.put((None, ()))
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self):
+        while True:
+            fn, args = self._queue.get()
+            if fn is None:
+                return
+            try:
+                fn(*args)
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                logger.error(f"Worker task failed: {e}")
+                with self._lock:
+                    self.failed += 1